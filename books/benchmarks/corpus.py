@@ -0,0 +1,138 @@
+import base64
+import random
+import zipfile
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from PIL import Image
+
+
+BUNDLED_BOOK = Path(__file__).resolve().parent.parent.parent / '285627.fb2'
+
+WORDS = (
+    'книга', 'страница', 'читатель', 'время', 'город', 'дорога', 'свет', 'ночь',
+    'слово', 'история', 'письмо', 'дом', 'окно', 'море', 'ветер', 'голос',
+    'человек', 'память', 'сердце', 'улица', 'песня', 'зима', 'лето', 'огонь',
+    'тишина', 'утро', 'вечер', 'глава', 'библиотека', 'мысль', 'рука', 'земля',
+)
+
+
+@dataclass
+class CorpusSpec:
+    name: str
+    paragraphs: int = 200
+    depth: int = 1
+    images: int = 0
+    image_side: int = 400
+    encoding: str = 'utf-8'
+    zipped: bool = False
+
+
+# Стандартный набор: размеры от ~100 КБ до ~10 МБ, ZIP, глубокая
+# вложенность, много крупных <binary> и windows-1251
+DEFAULT_SPECS = (
+    CorpusSpec('small-utf8', paragraphs=300),
+    CorpusSpec('medium-utf8', paragraphs=3000),
+    CorpusSpec('large-utf8', paragraphs=30000),
+    CorpusSpec('medium-cp1251', paragraphs=3000, encoding='windows-1251'),
+    CorpusSpec('large-cp1251', paragraphs=30000, encoding='windows-1251'),
+    CorpusSpec('medium-zip', paragraphs=3000, zipped=True),
+    CorpusSpec('large-zip', paragraphs=30000, zipped=True),
+    CorpusSpec('deep-nested', paragraphs=3000, depth=64),
+    CorpusSpec('many-images', paragraphs=300, images=40, image_side=800),
+)
+
+
+def _sentence(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 24))]
+    return ' '.join(words).capitalize() + '.'
+
+
+def _paragraph(rng):
+    return ' '.join(_sentence(rng) for _ in range(rng.randint(2, 5)))
+
+
+def _noise_jpeg(side, seed):
+    # Шум плохо сжимается, поэтому размер base64 близок к худшему случаю
+    image = Image.effect_noise((side, side * 3 // 2), 64 + seed % 32).convert('RGB')
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+
+def _sections(rng, paragraphs, depth):
+    chapters = max(1, paragraphs // 50)
+    per_chapter = max(1, paragraphs // chapters)
+    parts = []
+    for chapter in range(chapters):
+        parts.append('<section>' * depth)
+        parts.append(f'<title><p>Глава {chapter + 1}</p></title>')
+        for _ in range(per_chapter):
+            parts.append(f'<p>{escape(_paragraph(rng))}</p>')
+        parts.append('</section>' * depth)
+    return ''.join(parts)
+
+
+def generate_fb2(spec, seed=0):
+    rng = random.Random(f'{spec.name}:{seed}')
+
+    binaries = []
+    coverpage = ''
+    if spec.images:
+        coverpage = '<coverpage><image l:href="#img0.jpg"/></coverpage>'
+        for index in range(spec.images):
+            data = base64.b64encode(_noise_jpeg(spec.image_side, index)).decode('ascii')
+            binaries.append(
+                f'<binary id="img{index}.jpg" content-type="image/jpeg">{data}</binary>'
+            )
+
+    # Отдельный генератор: аннотация не меняет текст уже известных корпусов
+    words = random.Random(f'{spec.name}:{seed}:annotation')
+    annotation = ' '.join(words.choice(WORDS) for _ in range(40)).capitalize()
+
+    document = (
+        f'<?xml version="1.0" encoding="{spec.encoding}"?>\n'
+        '<FictionBook xmlns="http://www.gribuser.ru/xml/fictionbook/2.0" '
+        'xmlns:l="http://www.w3.org/1999/xlink">'
+        '<description><title-info>'
+        '<genre>prose_contemporary</genre>'
+        '<author><first-name>Иван</first-name><middle-name>Петрович</middle-name>'
+        '<last-name>Синтетический</last-name></author>'
+        f'<book-title>Тестовая книга {escape(spec.name)}</book-title>'
+        f'<annotation><p>{annotation}.</p></annotation>'
+        f'{coverpage}<lang>ru</lang>'
+        '</title-info></description>'
+        f'<body>{_sections(rng, spec.paragraphs, spec.depth)}</body>'
+        f'{"".join(binaries)}'
+        '</FictionBook>'
+    )
+    content = document.encode(spec.encoding)
+
+    if spec.zipped:
+        output = BytesIO()
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr(f'{spec.name}.fb2', content)
+        content = output.getvalue()
+
+    return content
+
+
+def build_corpus(directory, specs=DEFAULT_SPECS, include_bundled=True, seed=0,
+                 regenerate=False):
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    files = []
+    for spec in specs:
+        extension = '.fb2.zip' if spec.zipped else '.fb2'
+        path = directory / f'{spec.name}{extension}'
+        if regenerate or not path.exists():
+            path.write_bytes(generate_fb2(spec, seed=seed))
+        files.append((spec.name, path))
+
+    if include_bundled and BUNDLED_BOOK.exists():
+        files.append(('bundled-285627', BUNDLED_BOOK))
+
+    return files
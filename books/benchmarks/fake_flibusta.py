@@ -0,0 +1,233 @@
+import random
+import re
+import threading
+import time
+import zipfile
+from dataclasses import dataclass
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+
+from .corpus import WORDS, CorpusSpec, generate_fb2
+
+
+@dataclass
+class FakeFlibustaConfig:
+    latency: float = 0.3
+    jitter: float = 0.1
+    failure_rate: float = 0.0
+    results: int = 50
+    book_paragraphs: int = 1500
+    book_variants: int = 4
+    book_images: int = 1
+    seed: int = 0
+    pages: int = 3
+
+
+BOOK_PATH = re.compile(r'^/b/(\d+)/fb2/?$')
+LISTING_PATH = re.compile(r'^/([as])/(\d+)/?$')
+
+
+def _title(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).capitalize()
+
+
+def _author(rng):
+    first = rng.choice(('Иван', 'Анна', 'Пётр', 'Мария', 'Сергей', 'Ольга'))
+    last = rng.choice(('Иванов', 'Петрова', 'Сидоров', 'Кузнецова', 'Смирнов'))
+    return f'{first} {last}'
+
+
+class _FlibustaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.enter()
+        try:
+            self._handle(server)
+        finally:
+            server.leave()
+
+    def _handle(self, server):
+        server.delay()
+
+        if server.should_fail():
+            self._send(503, b'Service temporarily unavailable', 'text/plain')
+            return
+
+        # FLIBUSTA_ONION в .env заканчивается на '/', отсюда '//booksearch'
+        url = urlparse(re.sub(r'^/+', '/', self.path))
+        if url.path.rstrip('/') == '/booksearch':
+            params = parse_qs(url.query)
+            query = params.get('ask', [''])[0]
+            page = int(params.get('page', ['0'])[0] or 0)
+            self._send(200, server.search_page(query, page), 'text/html; charset=utf-8')
+            return
+
+        match = LISTING_PATH.match(url.path)
+        if match:
+            kind, object_id = match.group(1), int(match.group(2))
+            body = server.author_page(object_id) if kind == 'a' else server.series_page(object_id)
+            self._send(200, body, 'text/html; charset=utf-8')
+            return
+
+        match = BOOK_PATH.match(url.path)
+        if match:
+            book_id = match.group(1)
+            self._send(
+                200,
+                server.book_payload(int(book_id)),
+                'application/zip',
+                {'Content-Disposition': f'attachment; filename="fake.{book_id}.fb2.zip"'},
+            )
+            return
+
+        self._send(404, b'Not found', 'text/plain')
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeFlibustaServer(ThreadingHTTPServer):
+    """Локальная замена Флибусты: /booksearch, /a/<id>, /s/<id> и /b/<id>/fb2.
+
+    Разметка поиска повторяет структуру настоящей страницы, книги -
+    синтетические FB2 в ZIP из books.benchmarks.corpus.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+    def __init__(self, address, config=None):
+        super().__init__(address, _FlibustaHandler)
+        self.config = config or FakeFlibustaConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._books = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def delay(self):
+        with self._lock:
+            offset = self._rng.uniform(-self.config.jitter, self.config.jitter)
+        pause = max(0.0, self.config.latency + offset)
+        if pause:
+            time.sleep(pause)
+
+    def should_fail(self):
+        with self._lock:
+            return self._rng.random() < self.config.failure_rate
+
+    def search_page(self, query, page=0):
+        rng = random.Random(f'{self.config.seed}:{query}:{page}')
+        authors = [(rng.randint(1, 99999), _author(rng)) for _ in range(3)]
+        series = [(rng.randint(1, 9999), _title(rng)) for _ in range(2)]
+
+        items = []
+        for _ in range(self.config.results):
+            book_id = rng.randint(1, 999999)
+            author_id, author = rng.choice(authors)
+            items.append(
+                f'<li><a href="/b/{book_id}">{escape(_title(rng))}</a> - '
+                f'<a href="/a/{author_id}">{escape(author)}</a></li>'
+            )
+
+        author_items = ''.join(
+            f'<li><a href="/a/{author_id}">{escape(author)}</a> ({rng.randint(1, 40)} книг)</li>'
+            for author_id, author in authors
+        )
+        series_items = ''.join(
+            f'<li><a href="/s/{series_id}">{escape(title)}</a> ({rng.randint(2, 12)} книг)</li>'
+            for series_id, title in series
+        )
+        pager = ''
+        if page + 1 < self.config.pages:
+            pager = (
+                '<ul class="pager"><li class="pager-next">'
+                f'<a href="/booksearch?ask={escape(query)}&amp;page={page + 1}">следующая ›</a>'
+                '</li></ul>'
+            )
+        return (
+            '<!DOCTYPE html><html><head><title>Поиск книг</title></head><body>'
+            '<div id="main"><h1 class="title">Поиск книг</h1>'
+            f'<h3>Найденные писатели ({len(authors)}):</h3><ul>{author_items}</ul>'
+            f'<h3>Найденные серии ({len(series)}):</h3><ul>{series_items}</ul>'
+            f'<h3>Найденные книги ({len(items)}):</h3><ul>{"".join(items)}</ul>'
+            f'{pager}<p>Запрос: {escape(query)}</p></div></body></html>'
+        ).encode('utf-8')
+
+    def author_page(self, author_id):
+        rng = random.Random(f'{self.config.seed}:a:{author_id}')
+        parts = []
+        for _ in range(rng.randint(1, 3)):
+            series_id = rng.randint(1, 9999)
+            parts.append(f'<h4><a href="/s/{series_id}">{escape(_title(rng))}</a></h4>')
+            for _ in range(rng.randint(2, 6)):
+                book_id = rng.randint(1, 999999)
+                parts.append(
+                    f'<input type="checkbox"> <a href="/b/{book_id}">{escape(_title(rng))}</a> '
+                    f'(<a href="/b/{book_id}/fb2">fb2</a>)<br>'
+                )
+        return (
+            '<!DOCTYPE html><html><body><div id="main">'
+            f'<h1 class="title">{escape(_author(rng))}</h1>'
+            f'<form>{"".join(parts)}</form></div></body></html>'
+        ).encode('utf-8')
+
+    def series_page(self, series_id):
+        rng = random.Random(f'{self.config.seed}:s:{series_id}')
+        author_id, author = rng.randint(1, 99999), _author(rng)
+        parts = [
+            f'<input type="checkbox"> {number}. <a href="/b/{rng.randint(1, 999999)}">'
+            f'{escape(_title(rng))}</a> - <a href="/a/{author_id}">{escape(author)}</a><br>'
+            for number in range(1, rng.randint(3, 8))
+        ]
+        return (
+            '<!DOCTYPE html><html><body><div id="main">'
+            f'<h1 class="title">{escape(_title(rng))}</h1>'
+            f'<form>{"".join(parts)}</form></div></body></html>'
+        ).encode('utf-8')
+
+    def book_payload(self, book_id):
+        variant = book_id % max(1, self.config.book_variants)
+        with self._lock:
+            payload = self._books.get(variant)
+        if payload is None:
+            spec = CorpusSpec(
+                f'fake-{variant}',
+                paragraphs=self.config.book_paragraphs,
+                images=self.config.book_images,
+            )
+            output = BytesIO()
+            with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr(f'fake-{variant}.fb2', generate_fb2(spec, seed=variant))
+            payload = output.getvalue()
+            with self._lock:
+                self._books[variant] = payload
+        return payload
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self.server_address
@@ -0,0 +1,256 @@
+import random
+import secrets
+import socket
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+import requests
+
+from .corpus import WORDS
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class WorkerStats:
+    """Занятость пула воркеров во времени (как у gunicorn sync)."""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._queued = 0
+        self._last = time.perf_counter()
+        self.started = self._last
+        self.busy_seconds = 0.0
+        self.saturated_seconds = 0.0
+        self.max_queue = 0
+        self.queue_waits = []
+
+    def _advance(self, now):
+        elapsed = now - self._last
+        self.busy_seconds += self._busy * elapsed
+        if self._busy >= self.workers:
+            self.saturated_seconds += elapsed
+        self._last = now
+
+    def enqueue(self):
+        with self._lock:
+            self._advance(time.perf_counter())
+            self._queued += 1
+            self.max_queue = max(self.max_queue, self._queued)
+
+    def start(self, queued_at):
+        with self._lock:
+            now = time.perf_counter()
+            self._advance(now)
+            self._queued -= 1
+            self._busy += 1
+            self.queue_waits.append(now - queued_at)
+
+    def finish(self):
+        with self._lock:
+            self._advance(time.perf_counter())
+            self._busy -= 1
+
+    def report(self):
+        with self._lock:
+            now = time.perf_counter()
+            self._advance(now)
+            wall = max(now - self.started, 1e-9)
+            return {
+                'workers': self.workers,
+                'utilization': round(self.busy_seconds / (self.workers * wall), 3),
+                'saturated_fraction': round(self.saturated_seconds / wall, 3),
+                'max_queue': self.max_queue,
+                'queue_wait_p50_ms': _ms(percentile(self.queue_waits, 50)),
+                'queue_wait_p95_ms': _ms(percentile(self.queue_waits, 95)),
+                'queue_wait_p99_ms': _ms(percentile(self.queue_waits, 99)),
+            }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+class _QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGI-сервер с фиксированным числом воркеров и очередью перед ними."""
+
+    request_queue_size = 256
+
+    def __init__(self, address, app, workers):
+        super().__init__(address, _QuietHandler)
+        self.set_app(app)
+        self.stats = WorkerStats(workers)
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self.stats.enqueue()
+        self._pool.submit(self._process, request, client_address, time.perf_counter())
+
+    def _process(self, request, client_address, queued_at):
+        self.stats.start(queued_at)
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.stats.finish()
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self.server_address
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class UvicornServer:
+    """ASGI-приложение под uvicorn в фоновом потоке: один процесс, один event loop."""
+
+    def __init__(self, address, app):
+        import uvicorn
+
+        self.socket = socket.create_server(address, backlog=1024)
+        self.server = uvicorn.Server(uvicorn.Config(
+            app, lifespan='off', log_level='warning', access_log=False,
+            backlog=1024, timeout_keep_alive=30,
+        ))
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.server.run, kwargs={'sockets': [self.socket]}, daemon=True
+        )
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return self.socket.getsockname()[:2]
+
+    def shutdown(self):
+        # Цикл uvicorn сам закрывает соединения - ждём его выхода
+        self.server.should_exit = True
+        self.thread.join()
+
+    def server_close(self):
+        # Сокет закрывается только после остановки цикла, иначе uvicorn падает на нём
+        self.socket.close()
+
+
+class LoadGenerator:
+
+    def __init__(self, base_url, session_id, concurrency=8, search_ratio=0.8,
+                 library_ratio=0.0, htmx=True, seed=0):
+        self.base_url = base_url.rstrip('/')
+        self.session_id = session_id
+        self.concurrency = concurrency
+        self.search_ratio = search_ratio
+        # Доля дешёвых локальных запросов (библиотека) среди всех
+        self.library_ratio = library_ratio
+        self.htmx = htmx
+        self.seed = seed
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def _session(self):
+        csrf_token = secrets.token_hex(16)
+        session = requests.Session()
+        session.cookies.set('sessionid', self.session_id)
+        session.cookies.set('csrftoken', csrf_token)
+        session.headers['X-CSRFToken'] = csrf_token
+        if self.htmx:
+            session.headers['HX-Request'] = 'true'
+        return session
+
+    def _one(self, session, rng):
+        if rng.random() < self.library_ratio:
+            endpoint = 'library'
+            call = lambda: session.get(f'{self.base_url}/')
+        elif rng.random() < self.search_ratio:
+            endpoint = 'search'
+            query = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 2)))
+            call = lambda: session.get(f'{self.base_url}/search/', params={'q': query})
+        else:
+            endpoint = 'download'
+            data = {
+                'book_id': str(rng.randint(1, 999999)),
+                'title': 'Нагрузочный тест',
+                'author': 'Нагрузочный тест',
+            }
+            call = lambda: session.post(f'{self.base_url}/download/', data=data)
+
+        started = time.perf_counter()
+        try:
+            response = call()
+            status = response.status_code
+            # HTMX-ответ «сервер занят» приходит с кодом 200
+            if response.headers.get('HX-Reswap') == 'none' and 'Retry-After' in response.headers:
+                status = 'busy'
+        except requests.RequestException:
+            status = 'error'
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.latencies[endpoint].append(elapsed)
+            self.statuses[endpoint][status] += 1
+
+    def run(self, total_requests=None, duration=None):
+        deadline = time.perf_counter() + duration if duration else None
+        remaining = [total_requests or 0]
+        counter_lock = threading.Lock()
+
+        def take():
+            if deadline is not None:
+                return time.perf_counter() < deadline
+            with counter_lock:
+                if remaining[0] <= 0:
+                    return False
+                remaining[0] -= 1
+                return True
+
+        def client(index):
+            rng = random.Random(f'{self.seed}:{index}')
+            session = self._session()
+            while take():
+                self._one(session, rng)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(client, range(self.concurrency)))
+        return time.perf_counter() - started
+
+    def report(self, wall):
+        endpoints = {}
+        for endpoint, values in self.latencies.items():
+            endpoints[endpoint] = {
+                'requests': len(values),
+                'p50_ms': _ms(percentile(values, 50)),
+                'p95_ms': _ms(percentile(values, 95)),
+                'p99_ms': _ms(percentile(values, 99)),
+                'max_ms': _ms(max(values)),
+                'statuses': {str(k): v for k, v in self.statuses[endpoint].items()},
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {
+            'wall_s': round(wall, 3),
+            'requests': total,
+            'throughput_rps': round(total / wall, 2) if wall else None,
+            'endpoints': endpoints,
+        }
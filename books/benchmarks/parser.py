@@ -0,0 +1,141 @@
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import lxml
+import PIL
+
+from ..services.fb2_parser import FB2Parser
+
+
+def _full(parser):
+    parser.parse()
+
+
+def _metadata(parser):
+    parser.parse_metadata()
+
+
+def _cover(parser):
+    parser._get_cover(parser._load_tree())
+
+
+def _text(parser):
+    parser._get_text(parser._load_tree())
+
+
+OPERATIONS = {
+    'full': _full,
+    'metadata': _metadata,
+    'cover': _cover,
+    'text': _text,
+}
+
+
+def _status_kb(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    # Linux позволяет сбросить VmHWM; ru_maxrss наследуется через fork/exec
+    # и показал бы пик родительского процесса
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_kb():
+    peak = _status_kb('VmHWM')
+    if peak is not None:
+        return peak
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS отдаёт байты, Linux - килобайты
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+
+def _measure(path, operation, repeat):
+    # Выполняется в отдельном процессе, чтобы пик RSS не зависел
+    # от предыдущих замеров
+    run = OPERATIONS[operation]
+    _reset_peak_rss()
+    rss_before = _status_kb('VmRSS') or _peak_rss_kb()
+
+    timings = []
+    for _ in range(repeat):
+        parser = FB2Parser(path)
+        started = time.perf_counter()
+        run(parser)
+        timings.append(time.perf_counter() - started)
+
+    peak_rss_kb = max(0, _peak_rss_kb() - rss_before)
+
+    tracemalloc.start()
+    run(FB2Parser(path))
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'timings': timings,
+        'peak_rss_mb': round(peak_rss_kb / 1024, 2),
+        'peak_traced_mb': round(traced_peak / 1024 / 1024, 2),
+        'xml_bytes': len(FB2Parser(path)._read_content()),
+    }
+
+
+def run_benchmark(files, operations=None, repeat=3, progress=None):
+    operations = operations or list(OPERATIONS)
+    context = multiprocessing.get_context('spawn')
+
+    results = []
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        for name, path in files:
+            for operation in operations:
+                measured = pool.apply(_measure, (str(path), operation, repeat))
+                timings = measured['timings']
+                best = min(timings)
+                xml_mb = measured['xml_bytes'] / 1024 / 1024
+
+                result = {
+                    'case': name,
+                    'operation': operation,
+                    'file_bytes': os.path.getsize(path),
+                    'xml_bytes': measured['xml_bytes'],
+                    'repeat': repeat,
+                    'wall_min_s': round(best, 6),
+                    'wall_median_s': round(statistics.median(timings), 6),
+                    'throughput_mb_s': round(xml_mb / best, 2) if best else None,
+                    'peak_rss_mb': measured['peak_rss_mb'],
+                    'peak_traced_mb': measured['peak_traced_mb'],
+                }
+                results.append(result)
+                if progress:
+                    progress(result)
+
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'lxml': lxml.__version__,
+            'pillow': PIL.__version__,
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
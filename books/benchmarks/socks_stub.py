@@ -0,0 +1,130 @@
+import selectors
+import socket
+import socketserver
+import struct
+import threading
+from collections import defaultdict
+
+
+class _SocksHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        sock = self.request
+        try:
+            username = self._negotiate(sock)
+            if username is None:
+                return
+            if not self._read_connect(sock):
+                return
+            upstream = socket.create_connection(self.server.upstream, timeout=30)
+        except (OSError, struct.error):
+            return
+
+        self.server.record_connect(username)
+        # Ответ: успех, привязанный адрес 0.0.0.0:0
+        sock.sendall(b'\x05\x00\x00\x01' + b'\x00' * 6)
+        try:
+            self._pipe(sock, upstream)
+        finally:
+            upstream.close()
+
+    def _recv_exact(self, sock, size):
+        data = b''
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise OSError('SOCKS client closed connection')
+            data += chunk
+        return data
+
+    def _negotiate(self, sock):
+        version, count = self._recv_exact(sock, 2)
+        if version != 5:
+            return None
+        methods = self._recv_exact(sock, count)
+
+        if 2 in methods:
+            # Username/password (RFC 1929) - его использует IsolateSOCKSAuth
+            sock.sendall(b'\x05\x02')
+            _, ulen = self._recv_exact(sock, 2)
+            username = self._recv_exact(sock, ulen).decode('utf-8', 'replace')
+            (plen,) = self._recv_exact(sock, 1)
+            self._recv_exact(sock, plen)
+            sock.sendall(b'\x01\x00')
+            return username
+
+        if 0 in methods:
+            sock.sendall(b'\x05\x00')
+            return ''
+
+        sock.sendall(b'\x05\xff')
+        return None
+
+    def _read_connect(self, sock):
+        version, command, _, address_type = self._recv_exact(sock, 4)
+        if version != 5 or command != 1:
+            sock.sendall(b'\x05\x07\x00\x01' + b'\x00' * 6)
+            return False
+
+        if address_type == 1:
+            self._recv_exact(sock, 4)
+        elif address_type == 3:
+            (length,) = self._recv_exact(sock, 1)
+            self._recv_exact(sock, length)
+        elif address_type == 4:
+            self._recv_exact(sock, 16)
+        else:
+            sock.sendall(b'\x05\x08\x00\x01' + b'\x00' * 6)
+            return False
+
+        self._recv_exact(sock, 2)
+        return True
+
+    def _pipe(self, client, upstream):
+        # selectors, а не select.select: под ASGI-тестом дескрипторов больше 1024
+        with selectors.DefaultSelector() as selector:
+            try:
+                selector.register(client, selectors.EVENT_READ)
+                selector.register(upstream, selectors.EVENT_READ)
+            except ValueError:
+                # Клиент уже закрыл соединение
+                return
+            while True:
+                events = selector.select(60)
+                if not events:
+                    return
+                for key, _ in events:
+                    try:
+                        data = key.fileobj.recv(65536)
+                    except OSError:
+                        return
+                    if not data:
+                        return
+                    (upstream if key.fileobj is client else client).sendall(data)
+
+
+class SocksStub(socketserver.ThreadingTCPServer):
+    """Минимальный SOCKS5 вместо Tor: любое CONNECT уходит на upstream.
+
+    Имя хоста (в том числе .onion при socks5h) игнорируется, поэтому
+    FlibustaService работает с заглушкой без изменения FLIBUSTA_ONION.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+    def __init__(self, address, upstream):
+        super().__init__(address, _SocksHandler)
+        self.upstream = upstream
+        self._lock = threading.Lock()
+        self.connections = defaultdict(int)
+
+    def record_connect(self, username):
+        with self._lock:
+            self.connections[username] += 1
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self.server_address
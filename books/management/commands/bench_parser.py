@@ -0,0 +1,83 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books.benchmarks.corpus import DEFAULT_SPECS, build_corpus
+from books.benchmarks.parser import OPERATIONS, run_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк FB2Parser на синтетическом корпусе и 285627.fb2'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='parser-benchmark.json',
+            help='Куда записать результаты в JSON',
+        )
+        parser.add_argument(
+            '--corpus-dir', default=str(Path(tempfile.gettempdir()) / 'fl-reader-bench'),
+            help='Каталог для сгенерированных книг',
+        )
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument(
+            '--case', action='append', dest='cases',
+            choices=[spec.name for spec in DEFAULT_SPECS] + ['bundled-285627'],
+            help='Запустить только выбранные случаи (можно повторять)',
+        )
+        parser.add_argument(
+            '--operation', action='append', dest='operations',
+            choices=list(OPERATIONS),
+        )
+        parser.add_argument('--no-bundled', action='store_true')
+        parser.add_argument('--regenerate', action='store_true')
+        parser.add_argument(
+            '--compare', help='JSON предыдущего запуска для сравнения',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть не меньше 1')
+
+        files = build_corpus(
+            options['corpus_dir'],
+            include_bundled=not options['no_bundled'],
+            regenerate=options['regenerate'],
+        )
+        if options['cases']:
+            files = [(name, path) for name, path in files if name in options['cases']]
+
+        baseline = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                for row in json.load(f)['results']:
+                    baseline[(row['case'], row['operation'])] = row
+
+        def progress(result):
+            # Слишком быстрый прогон (0 с по таймеру) - пропускная способность не определена
+            throughput = result['throughput_mb_s']
+            throughput = f'{throughput:8.1f}' if throughput is not None else f'{"-":>8}'
+            line = (
+                f"{result['case']:<16} {result['operation']:<9} "
+                f"{result['wall_min_s'] * 1000:9.1f} ms "
+                f"{throughput} MB/s "
+                f"rss {result['peak_rss_mb']:7.1f} MB"
+            )
+            previous = baseline.get((result['case'], result['operation']))
+            if previous and previous['wall_min_s']:
+                ratio = result['wall_min_s'] / previous['wall_min_s']
+                line += f"  x{ratio:.2f}"
+            self.stdout.write(line)
+
+        report = run_benchmark(
+            files,
+            operations=options['operations'],
+            repeat=options['repeat'],
+            progress=progress,
+        )
+
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(f"Результаты сохранены в {options['output']}"))
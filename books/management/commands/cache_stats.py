@@ -0,0 +1,38 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from books.services.sqlite_cache import SQLiteCache
+
+
+class Command(BaseCommand):
+    help = 'Записи, объём, попадания и промахи общего кэша по пространствам имён'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Обнулить счётчики попаданий')
+
+    def handle(self, *args, **options):
+        cache = caches['default']
+        if not isinstance(cache, SQLiteCache):
+            raise CommandError(f'Метрики есть только у SQLiteCache, сейчас {type(cache).__name__}')
+
+        stats = cache.stats()
+        self.stdout.write(
+            f'{"пространство":28} {"записей":>8} {"МБ":>8} {"попаданий":>10} {"промахов":>9} {"доля":>6}'
+        )
+        for name, item in sorted(stats.items(), key=lambda pair: -pair[1]['bytes']):
+            requests = item['hits'] + item['misses']
+            ratio = f'{item["hits"] / requests:.0%}' if requests else '-'
+            self.stdout.write(
+                f'{name:28} {item["entries"]:8} {item["bytes"] / 1024 / 1024:8.2f} '
+                f'{item["hits"]:10} {item["misses"]:9} {ratio:>6}'
+            )
+        entries = sum(item['entries'] for item in stats.values())
+        size = sum(item['bytes'] for item in stats.values())
+        self.stdout.write(
+            f'Всего {entries} из {cache._max_entries} записей, '
+            f'{size / 1024 / 1024:.1f} из {cache._max_size / 1024 / 1024:.0f} МБ'
+        )
+
+        if options['reset']:
+            cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Счётчики обнулены'))
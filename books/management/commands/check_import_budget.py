@@ -0,0 +1,79 @@
+import re
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+# То же, что делает воркер gunicorn после preload: приложение и все маршруты
+LOAD_APP = (
+    "import importlib, os\n"
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')\n"
+    "importlib.import_module({module!r})\n"
+    "from django.urls import get_resolver\n"
+    "get_resolver().url_patterns\n"
+)
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def _importtime(code):
+    """[(имя, собственное мкс, суммарное мкс, глубина)] из python -X importtime."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True,
+    )
+    if result.returncode:
+        raise CommandError(result.stderr.strip().splitlines()[-1])
+
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Профиль импорта (-X importtime) загрузки приложения: бюджет времени и запрещённые модули'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget-ms', type=float, default=800)
+        parser.add_argument(
+            '--forbid', default='requests,httpx,lxml,PIL',
+            help='Пакеты, которые не должны загружаться вместе с приложением (через запятую)',
+        )
+        parser.add_argument('--asgi', action='store_true', help='config.asgi вместо config.wsgi')
+        parser.add_argument('--top', type=int, default=10, help='Показать N самых долгих модулей')
+
+    def handle(self, *args, **options):
+        # Модули, которые интерпретатор грузит сам (site, .pth) - не наша забота
+        baseline = {name for name, *_ in _importtime('pass')}
+        module = 'config.asgi' if options['asgi'] else 'config.wsgi'
+        modules = [
+            item for item in _importtime(LOAD_APP.format(module=module))
+            if item[0] not in baseline
+        ]
+
+        total_ms = sum(cumulative for _, _, cumulative, depth in modules if depth == 0) / 1000
+        forbidden = {name.strip() for name in options['forbid'].split(',') if name.strip()}
+        loaded = sorted({
+            name.split('.')[0] for name, *_ in modules if name.split('.')[0] in forbidden
+        })
+
+        self.stdout.write(f'Загрузка {module}: {total_ms:.0f} мс импорта, модулей {len(modules)}')
+        slowest = sorted(modules, key=lambda item: item[1], reverse=True)[:options['top']]
+        for name, self_us, cumulative_us, _ in slowest:
+            self.stdout.write(
+                f'  {self_us / 1000:7.1f} мс свой, {cumulative_us / 1000:7.1f} мс всего  {name}'
+            )
+
+        errors = []
+        if total_ms > options['budget_ms']:
+            errors.append(f'импорт {total_ms:.0f} мс больше бюджета {options["budget_ms"]:g} мс')
+        if loaded:
+            errors.append(f'загружены тяжёлые модули: {", ".join(loaded)}')
+        if errors:
+            raise CommandError('; '.join(errors))
+        self.stdout.write(self.style.SUCCESS('Бюджет импорта соблюдён'))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from books.benchmarks.fake_flibusta import FakeFlibustaConfig, FakeFlibustaServer
+from books.benchmarks.socks_stub import SocksStub
+
+
+class Command(BaseCommand):
+    help = 'Локальная заглушка Флибусты с SOCKS5-входом вместо Tor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8081, help='HTTP порт заглушки')
+        parser.add_argument(
+            '--socks-port', type=int, default=9051,
+            help='Порт SOCKS5; укажите его в TOR_PROXY_PORT',
+        )
+        parser.add_argument('--latency', type=float, default=0.3, help='Секунды')
+        parser.add_argument('--jitter', type=float, default=0.1, help='Секунды')
+        parser.add_argument('--failure-rate', type=float, default=0.0)
+        parser.add_argument('--results', type=int, default=50)
+        parser.add_argument('--book-paragraphs', type=int, default=1500)
+
+    def handle(self, *args, **options):
+        config = FakeFlibustaConfig(
+            latency=options['latency'],
+            jitter=options['jitter'],
+            failure_rate=options['failure_rate'],
+            results=options['results'],
+            book_paragraphs=options['book_paragraphs'],
+        )
+        http_address = FakeFlibustaServer((options['host'], options['port']), config).start()
+        socks_address = SocksStub(
+            (options['host'], options['socks_port']), http_address
+        ).start()
+
+        self.stdout.write(f'HTTP:   http://{http_address[0]}:{http_address[1]}/')
+        self.stdout.write(f'SOCKS5: {socks_address[0]}:{socks_address[1]}')
+        self.stdout.write(
+            f'Запустите Django с TOR_PROXY_HOST={socks_address[0]} '
+            f'TOR_PROXY_PORT={socks_address[1]} (FLIBUSTA_ONION можно не менять)'
+        )
+
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
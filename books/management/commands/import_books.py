@@ -0,0 +1,48 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from books.services.bulk_import import BulkImporter
+
+
+class Command(BaseCommand):
+    help = 'Параллельный импорт FB2/ZIP из локальных каталогов и архивов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Каталоги, .fb2, .fb2.zip или архивы-сборники')
+        parser.add_argument('--user', required=True, help='Владелец импортируемых книг')
+        parser.add_argument('--workers', type=int, help='По умолчанию - число ядер')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--chunk-size', type=int, default=32, help='Книг из архива на задание')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Пользователь {options['user']} не найден")
+
+        importer = BulkImporter(
+            user,
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            chunk_size=options['chunk_size'],
+        )
+
+        def progress(stats):
+            self.stdout.write(
+                f'\r{stats.processed}/{stats.total} '
+                f'(+{stats.imported} ={stats.skipped} !{stats.failed}) '
+                f'{stats.rate:.1f} книг/с',
+                ending='',
+            )
+            self.stdout.flush()
+
+        stats = importer.run(options['paths'], progress=progress)
+        self.stdout.write('')
+
+        for source, error in stats.errors[:20]:
+            self.stderr.write(f'{source}: {error}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано {stats.imported}, пропущено {stats.skipped}, '
+            f'ошибок {stats.failed}'
+        ))
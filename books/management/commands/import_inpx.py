@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from books.services.catalog_service import CatalogService
+
+
+class Command(BaseCommand):
+    help = 'Загрузка каталога Флибусты из INPX в локальный поисковый индекс'
+
+    def add_arguments(self, parser):
+        parser.add_argument('inpx', help='Путь к .inpx файлу')
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Переимпортировать все .inp, даже неизменённые',
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        service = CatalogService(batch_size=options['batch_size'])
+
+        def progress(name, records):
+            self.stdout.write(f'{name}: {records}')
+
+        try:
+            stats = service.ingest(options['inpx'], full=options['full'], progress=progress)
+        except Exception as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Обработано файлов: {stats['files']}, без изменений: {stats['skipped']}, "
+            f"записей: {stats['records']}"
+        ))
@@ -0,0 +1,177 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.test import Client
+from django.utils import timezone
+
+from books.benchmarks.fake_flibusta import FakeFlibustaConfig, FakeFlibustaServer
+from books.benchmarks.loadtest import LoadGenerator, PooledWSGIServer, UvicornServer
+from books.benchmarks.socks_stub import SocksStub
+from books.models import Book
+from books.services.mirror_pool import get_mirror_pool
+from books.services.rate_limit import get_rate_limiter
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест search_view/download_book_view/library_view через WSGI и заглушку Флибусты'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--duration', type=float, help='Секунды вместо --requests')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--workers', type=int, default=8, help='Потоки одного воркера gunicorn gthread')
+        parser.add_argument('--search-ratio', type=float, default=0.8)
+        parser.add_argument(
+            '--library-ratio', type=float, default=0.0,
+            help='Доля запросов к библиотеке (локальный быстрый маршрут)',
+        )
+        parser.add_argument('--latency', type=float, default=0.3)
+        parser.add_argument('--jitter', type=float, default=0.1)
+        parser.add_argument('--failure-rate', type=float, default=0.0)
+        parser.add_argument('--book-paragraphs', type=int, default=1500)
+        parser.add_argument(
+            '--external', action='store_true',
+            help='Не поднимать заглушку: использовать текущие FLIBUSTA_ONION/TOR_PROXY_*',
+        )
+        parser.add_argument(
+            '--rate-limits',
+            help="Лимиты в формате FLIBUSTA_RATE_LIMITS; 'off' - без лимитов",
+        )
+        parser.add_argument(
+            '--asgi', action='store_true',
+            help='config.asgi под uvicorn вместо WSGI с пулом потоков (--workers не учитывается)',
+        )
+        parser.add_argument(
+            '--no-admission', action='store_true',
+            help='Отключить AdmissionControlMiddleware (для сравнения)',
+        )
+        parser.add_argument('--slow-limit', type=int, help='ADMISSION_SLOW_LIMIT на время теста')
+        parser.add_argument('--username', default='loadtest')
+        parser.add_argument('--keep-books', action='store_true')
+        parser.add_argument('--output', help='Записать отчёт в JSON')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--workers и --concurrency должны быть больше 0')
+
+        stub = None
+        if not options['external']:
+            config = FakeFlibustaConfig(
+                latency=options['latency'],
+                jitter=options['jitter'],
+                failure_rate=options['failure_rate'],
+                book_paragraphs=options['book_paragraphs'],
+            )
+            upstream = FakeFlibustaServer(('127.0.0.1', 0), config)
+            http_address = upstream.start()
+            stub = SocksStub(('127.0.0.1', 0), http_address)
+            socks_host, socks_port = stub.start()
+            # FLIBUSTA_ONION не трогаем: socks5h отдаёт имя хоста заглушке
+            settings.TOR_PROXY_HOST = socks_host
+            settings.TOR_PROXY_PORT = str(socks_port)
+
+        if options['rate_limits']:
+            limits = options['rate_limits']
+            settings.FLIBUSTA_RATE_LIMITS = [] if limits == 'off' else limits.split(',')
+        # Свои корзины: тест не должен съедать лимиты работающего сервера
+        rate_dir = tempfile.mkdtemp(prefix='loadtest-')
+        settings.FLIBUSTA_RATE_LIMIT_DB = os.path.join(rate_dir, 'ratelimit.sqlite3')
+
+        # Middleware читает настройки при создании приложения ниже
+        if options['no_admission']:
+            settings.ADMISSION_CONTROL = False
+        if options['slow_limit']:
+            settings.ADMISSION_SLOW_LIMIT = options['slow_limit']
+
+        user, _ = User.objects.get_or_create(username=options['username'])
+        # Удаляются только книги этого прогона - аккаунт может быть чужим
+        run_start = timezone.now()
+        client = Client()
+        client.force_login(user)
+        session_id = client.cookies[settings.SESSION_COOKIE_NAME].value
+
+        if options['asgi']:
+            server = UvicornServer(('127.0.0.1', 0), get_asgi_application())
+        else:
+            server = PooledWSGIServer(('127.0.0.1', 0), get_wsgi_application(), options['workers'])
+        host, port = server.start()
+
+        generator = LoadGenerator(
+            f'http://{host}:{port}',
+            session_id,
+            concurrency=options['concurrency'],
+            search_ratio=options['search_ratio'],
+            library_ratio=options['library_ratio'],
+        )
+        try:
+            wall = generator.run(
+                total_requests=options['requests'], duration=options['duration']
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        report = generator.report(wall)
+        if not options['asgi']:
+            report['server'] = server.stats.report()
+        report['circuits'] = get_mirror_pool().status()['circuits']
+        report['rate_limit'] = get_rate_limiter().status()
+        shutil.rmtree(rate_dir, ignore_errors=True)
+        if stub is not None:
+            report['socks_connections'] = dict(stub.connections)
+            report['upstream_max_in_flight'] = upstream.max_in_flight
+        report['config'] = {
+            key: options[key]
+            for key in ('concurrency', 'workers', 'search_ratio', 'library_ratio',
+                        'latency', 'jitter', 'failure_rate', 'external', 'asgi')
+        }
+        report['config']['admission'] = settings.ADMISSION_CONTROL
+        report['config']['slow_limit'] = settings.ADMISSION_SLOW_LIMIT
+
+        if not options['keep_books']:
+            for book in Book.objects.filter(user=user, created_at__gte=run_start):
+                book.file.delete(save=False)
+                if book.cover:
+                    book.cover.delete(save=False)
+                book.delete()
+
+        for endpoint, row in report['endpoints'].items():
+            self.stdout.write(
+                f"{endpoint:<9} n={row['requests']:<5} p50={row['p50_ms']}ms "
+                f"p95={row['p95_ms']}ms p99={row['p99_ms']}ms {row['statuses']}"
+            )
+        if options['asgi']:
+            self.stdout.write(f"{report['throughput_rps']} rps (ASGI, один event loop)")
+        else:
+            stats = report['server']
+            self.stdout.write(
+                f"{report['throughput_rps']} rps, воркеры заняты {stats['utilization']:.0%}, "
+                f"все заняты {stats['saturated_fraction']:.0%} времени, "
+                f"очередь до {stats['max_queue']}, ожидание p95={stats['queue_wait_p95_ms']}ms"
+            )
+        if 'upstream_max_in_flight' in report:
+            self.stdout.write(
+                f"одновременно запросов к Флибусте: до {report['upstream_max_in_flight']}"
+            )
+        for slot in report['circuits']:
+            self.stdout.write(
+                f"цепочка {slot['slot']}: запросов {slot['requests']}, "
+                f"{slot['throughput_kbps']} КБ/с, задержка {slot['latency_ms']}ms, "
+                f"заменена {slot['retired']} раз"
+            )
+
+        limiter = report['rate_limit']
+        self.stdout.write(
+            f"лимитер: в очереди {limiter['waiting']}, токены {limiter['buckets']}"
+        )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
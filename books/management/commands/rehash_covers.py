@@ -0,0 +1,73 @@
+import os
+import re
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from books.models import Book
+from books.services.fb2_parser import cover_file, cover_placeholder
+
+
+HASHED_NAME = re.compile(r'^covers/[0-9a-f]{20}(_[A-Za-z0-9]{7})?\.[a-z]+$')
+
+
+class Command(BaseCommand):
+    help = 'Переименовывает обложки по хэшу содержимого и строит заглушки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        books = (
+            Book.objects.exclude(cover='')
+            .exclude(cover__isnull=True)
+            .only('id', 'cover', 'cover_placeholder')
+        )
+        updated, missing, batch, stale = 0, 0, [], []
+
+        for book in books.iterator(chunk_size=options['batch_size']):
+            renamed = HASHED_NAME.match(book.cover.name)
+            if renamed and book.cover_placeholder:
+                continue
+
+            try:
+                with default_storage.open(book.cover.name, 'rb') as f:
+                    data = f.read()
+            except (FileNotFoundError, OSError):
+                missing += 1
+                continue
+
+            if not renamed:
+                old_name = book.cover.name
+                extension = os.path.splitext(old_name)[1].lstrip('.').upper()
+                image_format = 'JPEG' if extension in ('JPG', 'JPEG') else extension or 'JPEG'
+                new_file = cover_file(data, image_format)
+                book.cover.name = default_storage.save(f'covers/{new_file.name}', new_file)
+                # Старый файл удаляется только после записи пачки в БД
+                stale.append(old_name)
+
+            book.cover_placeholder = cover_placeholder(data)
+            book.updated_at = timezone.now()
+            batch.append(book)
+            if len(batch) >= options['batch_size']:
+                updated += self._save(batch, stale)
+
+        updated += self._save(batch, stale)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено обложек: {updated}, файлов не найдено: {missing}'
+        ))
+
+    def _save(self, batch, stale):
+        Book.objects.bulk_update(batch, ['cover', 'cover_placeholder', 'updated_at'])
+        # Одна обложка могла достаться нескольким книгам только в старых
+        # данных с совпадающими именами - удаляем, когда ссылок не осталось
+        referenced = set(
+            Book.objects.filter(cover__in=stale).values_list('cover', flat=True)
+        )
+        for name in set(stale) - referenced:
+            default_storage.delete(name)
+        count = len(batch)
+        batch.clear()
+        stale.clear()
+        return count
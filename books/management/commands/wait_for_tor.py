@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from books.services.health import wait_for_tor
+
+
+class Command(BaseCommand):
+    help = 'Ждёт, пока SOCKS-порт Tor ответит на приветствие (для entrypoint.sh)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=float, default=60)
+
+    def handle(self, *args, **options):
+        address = f'{settings.TOR_PROXY_HOST}:{settings.TOR_PROXY_PORT}'
+        if not wait_for_tor(timeout=options['timeout']):
+            raise CommandError(f'Tor не отвечает на {address} за {options["timeout"]:g} сек')
+        self.stdout.write(f'Tor отвечает на {address}')
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.urls import Resolver404, resolve
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .utils import is_htmx
+
+
+class AdmissionControlMiddleware:
+    """Раздельные лимиты одновременных запросов для медленных и быстрых маршрутов.
+
+    Медленные (поиск и скачивание через Tor) держат поток десятки
+    секунд. Их лимит ниже числа потоков воркера, поэтому сохранение
+    прогресса, учёт времени и библиотека всегда находят свободный поток.
+    Лишний медленный запрос сразу получает 503 с Retry-After, HTMX - тост
+    «сервер занят» без замены содержимого.
+
+    Под ASGI медленный запрос - корутина, а не поток, поэтому его лимит
+    отдельный и намного выше (ADMISSION_ASYNC_SLOW_LIMIT).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.ADMISSION_CONTROL
+        self.slow_routes = set(settings.ADMISSION_SLOW_ROUTES)
+        self.exempt_routes = set(settings.ADMISSION_EXEMPT_ROUTES)
+        self.fast_wait = settings.ADMISSION_FAST_WAIT
+        self.retry_after = settings.ADMISSION_RETRY_AFTER
+
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            # Все корутины процесса в одном event loop: хватает счётчика
+            self.slow_limit = settings.ADMISSION_ASYNC_SLOW_LIMIT
+            self.slow_in_flight = 0
+            # Семафор привязывается к loop при первом запросе
+            self.fast = asyncio.Semaphore(settings.ADMISSION_FAST_LIMIT)
+        else:
+            self.slow = threading.BoundedSemaphore(settings.ADMISSION_SLOW_LIMIT)
+            self.fast = threading.BoundedSemaphore(settings.ADMISSION_FAST_LIMIT)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        route = self._route_class(request)
+        if not self.enabled or route is None:
+            return self.get_response(request)
+
+        if route == "slow":
+            # Медленный запрос не ждёт: очередь из них и есть проблема
+            admitted = self.slow.acquire(blocking=False)
+            budget = self.slow
+        else:
+            admitted = self.fast.acquire(timeout=self.fast_wait)
+            budget = self.fast
+
+        if not admitted:
+            return self._busy(request)
+        try:
+            return self.get_response(request)
+        finally:
+            budget.release()
+
+    async def __acall__(self, request):
+        route = self._route_class(request)
+        if not self.enabled or route is None:
+            return await self.get_response(request)
+
+        if route == "slow":
+            if self.slow_in_flight >= self.slow_limit:
+                return self._busy(request)
+            self.slow_in_flight += 1
+            try:
+                return await self.get_response(request)
+            finally:
+                self.slow_in_flight -= 1
+
+        try:
+            await asyncio.wait_for(self.fast.acquire(), self.fast_wait)
+        except asyncio.TimeoutError:
+            return self._busy(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            self.fast.release()
+
+    def _route_class(self, request):
+        """"slow", "fast" или None - маршрут вне лимитов (проверки здоровья)."""
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return "fast"
+        if match.view_name in self.exempt_routes:
+            return None
+        if match.view_name in self.slow_routes:
+            return "slow"
+        # Поиск из библиотеки тоже может уйти на Флибусту
+        if match.view_name == "books:library" and request.GET.get("q"):
+            return "slow"
+        return "fast"
+
+    def _busy(self, request):
+        if is_htmx(request):
+            response = HttpResponse(
+                render_to_string("books/partials/busy.html", {"retry_after": self.retry_after})
+            )
+            # Текущее содержимое не трогаем - только показываем тост
+            response["HX-Reswap"] = "none"
+        else:
+            response = HttpResponse(
+                "Сервер занят, повторите запрос позже",
+                status=503,
+                content_type="text/plain; charset=utf-8",
+            )
+        response["Retry-After"] = str(self.retry_after)
+        return response
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise, который не разрывает async-цепочку под ASGI.
+
+    Синхронный middleware заставил бы Django держать поток на весь
+    запрос, включая ожидание Tor в async-представлениях. Статику в
+    продакшене раздаёт Caddy, здесь - только поиск файла и отдача.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_bookmark_dailyreadingstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='file_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True, verbose_name='SHA-256 файла'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 6.0 on 2026-10-19 12:30
+
+from django.db import migrations, models
+
+
+def create_fts(apps, schema_editor):
+    # FTS5 есть только в SQLite; на других СУБД поиск идёт через icontains
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE books_catalogbook_fts USING fts5("
+        "title, authors, series, genres, tokenize='unicode61 remove_diacritics 2')"
+    )
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS books_catalogbook_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_book_file_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogBook',
+            fields=[
+                ('lib_id', models.IntegerField(primary_key=True, serialize=False, verbose_name='ID Флибусты')),
+                ('title', models.CharField(max_length=500, verbose_name='Атауы')),
+                ('authors', models.CharField(blank=True, max_length=500, verbose_name='Авторлар')),
+                ('series', models.CharField(blank=True, max_length=300, verbose_name='Серия')),
+                ('series_number', models.IntegerField(blank=True, null=True, verbose_name='Сериядағы нөмірі')),
+                ('genres', models.CharField(blank=True, max_length=300, verbose_name='Жанрлар')),
+                ('lang', models.CharField(blank=True, max_length=16, verbose_name='Тілі')),
+                ('file_size', models.IntegerField(default=0, verbose_name='Файл өлшемі')),
+                ('ext', models.CharField(default='fb2', max_length=16, verbose_name='Форматы')),
+                ('added', models.DateField(blank=True, null=True, verbose_name='Қосылған күні')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Өшірілген')),
+                ('source', models.CharField(max_length=200, verbose_name='INP файлы')),
+            ],
+            options={
+                'verbose_name': 'Каталог кітабы',
+                'verbose_name_plural': 'Каталог кітаптары',
+            },
+        ),
+        migrations.CreateModel(
+            name='CatalogSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True, verbose_name='INP файлы')),
+                ('crc', models.BigIntegerField(verbose_name='CRC32')),
+                ('records', models.IntegerField(default=0, verbose_name='Жазбалар саны')),
+                ('imported_at', models.DateTimeField(auto_now=True, verbose_name='Импорт уақыты')),
+            ],
+            options={
+                'verbose_name': 'Каталог көзі',
+                'verbose_name_plural': 'Каталог көздері',
+            },
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
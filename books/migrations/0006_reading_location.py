@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_catalog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='reading_location',
+            field=models.CharField(blank=True, default='', max_length=32, verbose_name='Позиция чтения (раздел.абзац.символ)'),
+        ),
+        migrations.AddField(
+            model_name='bookmark',
+            name='location',
+            field=models.CharField(blank=True, default='', max_length=32, verbose_name='Позиция (бөлім.абзац.символ)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='cover_placeholder',
+            field=models.CharField(blank=True, default='', max_length=512, verbose_name='Мұқаба нобайы (data URI)'),
+        ),
+    ]
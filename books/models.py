@@ -17,12 +17,22 @@ class Book(models.Model):
     cover = models.ImageField(
         upload_to="covers/", null=True, blank=True, verbose_name="Обложка"
     )
+    cover_placeholder = models.CharField(
+        max_length=512, blank=True, default="", verbose_name="Мұқаба нобайы (data URI)"
+    )
     file = models.FileField(upload_to="books/", verbose_name="Файл книги")
     flibusta_id = models.CharField(
         max_length=100, null=True, blank=True, verbose_name="ID Флибусты"
     )
+    file_hash = models.CharField(
+        max_length=64, null=True, blank=True, db_index=True, verbose_name="SHA-256 файла"
+    )
     reading_progress = models.IntegerField(default=0, verbose_name="Прогресс чтения")
+    reading_location = models.CharField(
+        max_length=32, blank=True, default="", verbose_name="Позиция чтения (раздел.абзац.символ)"
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата добавления")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Өзгертілген уақыты")
     last_read = models.DateTimeField(
         null=True, blank=True, verbose_name="Последнее чтение"
     )
@@ -40,6 +50,11 @@ class Book(models.Model):
         verbose_name = "Книга"
         verbose_name_plural = "Книги"
         ordering = ["-created_at"]
+        indexes = [
+            # OPDS каталогының keyset-беттеуі (барлығы / соңғы оқылғандар)
+            models.Index(fields=["user", "created_at", "id"], name="book_user_created_idx"),
+            models.Index(fields=["user", "last_read", "id"], name="book_user_last_read_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.author}"
@@ -85,7 +100,11 @@ class Bookmark(models.Model):
     )
     title = models.CharField(max_length=200, verbose_name="Атауы")
     scroll_position = models.FloatField(verbose_name="Прокрутка позициясы (%)")
+    location = models.CharField(
+        max_length=32, blank=True, default="", verbose_name="Позиция (бөлім.абзац.символ)"
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Күні")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Өзгертілген уақыты")
 
     class Meta:
         verbose_name = "Бетбелгі"
@@ -115,3 +134,60 @@ class DailyReadingStats(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.date}: {self.seconds_read}s"
+
+
+class DeletedRecord(models.Model):
+    """Өшірілген жазба - синхрондау клиенттерге жоюды жеткізу үшін"""
+
+    # ForeignKey емес: пайдаланушы өшірілгенде каскад кезінде де жазуға болады
+    user_id = models.IntegerField(db_index=True, verbose_name="Пайдаланушы ID")
+    model = models.CharField(max_length=32, verbose_name="Модель")
+    object_id = models.UUIDField(verbose_name="Объект ID")
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Өшірілген уақыты")
+
+    class Meta:
+        verbose_name = "Өшірілген жазба"
+        verbose_name_plural = "Өшірілген жазбалар"
+
+    def __str__(self):
+        return f"{self.model} {self.object_id}"
+
+
+class CatalogBook(models.Model):
+    """Флибуста каталогындағы кітап (INPX файлынан)"""
+
+    lib_id = models.IntegerField(primary_key=True, verbose_name="ID Флибусты")
+    title = models.CharField(max_length=500, verbose_name="Атауы")
+    authors = models.CharField(max_length=500, blank=True, verbose_name="Авторлар")
+    series = models.CharField(max_length=300, blank=True, verbose_name="Серия")
+    series_number = models.IntegerField(null=True, blank=True, verbose_name="Сериядағы нөмірі")
+    genres = models.CharField(max_length=300, blank=True, verbose_name="Жанрлар")
+    lang = models.CharField(max_length=16, blank=True, verbose_name="Тілі")
+    file_size = models.IntegerField(default=0, verbose_name="Файл өлшемі")
+    ext = models.CharField(max_length=16, default="fb2", verbose_name="Форматы")
+    added = models.DateField(null=True, blank=True, verbose_name="Қосылған күні")
+    deleted = models.BooleanField(default=False, verbose_name="Өшірілген")
+    source = models.CharField(max_length=200, verbose_name="INP файлы")
+
+    class Meta:
+        verbose_name = "Каталог кітабы"
+        verbose_name_plural = "Каталог кітаптары"
+
+    def __str__(self):
+        return f"{self.title} - {self.authors}"
+
+
+class CatalogSource(models.Model):
+    """Импортталған INP файлы (өзгермесе қайта өңделмейді)"""
+
+    name = models.CharField(max_length=200, unique=True, verbose_name="INP файлы")
+    crc = models.BigIntegerField(verbose_name="CRC32")
+    records = models.IntegerField(default=0, verbose_name="Жазбалар саны")
+    imported_at = models.DateTimeField(auto_now=True, verbose_name="Импорт уақыты")
+
+    class Meta:
+        verbose_name = "Каталог көзі"
+        verbose_name_plural = "Каталог көздері"
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,226 @@
+"""Пакетное скачивание книг с Флибусты по списку ID.
+
+Задание выполняется в фоне; ход по каждой книге пишется в общий кэш,
+откуда его читает опрос со страницы. Параллельность ограничена
+межпроцессными слотами: общим на сервер и отдельным на пользователя.
+"""
+
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+
+from ..models import Book
+from ..utils import file_sha256
+from .flibusta_service import FlibustaService
+from .model_cache import ModelCache
+from .parser_pool import get_parser_pool
+from .prefetch import get_prefetcher
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# Сколько хранится состояние задания после последнего обновления
+JOB_TTL = 3600
+
+
+class SlotLimiter:
+    """Семафор на N слотов, общий для всех процессов gunicorn.
+
+    Слот - файл-замок (flock): ядро снимает его, даже если процесс
+    упал, поэтому слоты не «утекают».
+    """
+
+    def __init__(self, directory, name, slots, poll_interval=0.2):
+        self.paths = [os.path.join(str(directory), f'{name}-{index}.lock') for index in range(slots)]
+        self.poll_interval = poll_interval
+        self._local = threading.BoundedSemaphore(slots)
+
+    @contextmanager
+    def acquire(self):
+        if fcntl is None:
+            with self._local:
+                yield
+            return
+
+        os.makedirs(os.path.dirname(self.paths[0]), exist_ok=True)
+        while True:
+            for path in self.paths:
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    os.close(fd)
+                    continue
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
+                return
+            time.sleep(self.poll_interval)
+
+
+class BulkDownload:
+
+    def __init__(self, user, book_ids, job_id=None):
+        self.user = user
+        self.book_ids = book_ids
+        self.job_id = job_id or uuid.uuid4().hex
+        self.global_slots = SlotLimiter(
+            settings.LOCK_ROOT, 'flibusta-download', settings.BULK_IMPORT_GLOBAL_LIMIT
+        )
+        self.user_slots = SlotLimiter(
+            settings.LOCK_ROOT, f'flibusta-download-user-{user.pk}', settings.BULK_IMPORT_USER_LIMIT
+        )
+        self._lock = threading.Lock()
+        self.state = {
+            'id': self.job_id,
+            'user_id': user.pk,
+            'items': [{'id': book_id, 'status': 'queued', 'title': '', 'error': ''} for book_id in book_ids],
+            'created': [],
+            'finished': False,
+        }
+        self._items = {item['id']: item for item in self.state['items']}
+
+    @staticmethod
+    def cache_key(job_id):
+        return f'flibusta:bulk:{job_id}'
+
+    @classmethod
+    def load(cls, job_id):
+        return cache.get(cls.cache_key(job_id))
+
+    def start(self):
+        self._save()
+        threading.Thread(target=self.run, daemon=True, name=f'bulk-{self.job_id[:8]}').start()
+        return self.job_id
+
+    def _save(self):
+        cache.set(self.cache_key(self.job_id), self.state, JOB_TTL)
+
+    def _update(self, book_id, **fields):
+        with self._lock:
+            self._items[book_id].update(fields)
+            self._save()
+
+    def run(self):
+        try:
+            existing = set(
+                Book.objects.filter(user=self.user, flibusta_id__in=self.book_ids)
+                .values_list('flibusta_id', flat=True)
+            )
+            known_hashes = set(
+                Book.objects.filter(user=self.user, file_hash__isnull=False)
+                .values_list('file_hash', flat=True)
+            )
+
+            queue = []
+            for book_id in self.book_ids:
+                if book_id in existing:
+                    self._update(book_id, status='skipped')
+                else:
+                    queue.append(book_id)
+
+            batch_size = settings.BULK_IMPORT_BATCH_SIZE
+            with ThreadPoolExecutor(max_workers=settings.BULK_IMPORT_USER_LIMIT) as executor:
+                for start in range(0, len(queue), batch_size):
+                    batch = queue[start:start + batch_size]
+                    books = []
+                    for book_id, book in zip(batch, executor.map(self._fetch, batch)):
+                        if book is None:
+                            continue
+                        # Одна и та же книга под разными ID
+                        if book.file_hash in known_hashes:
+                            self._discard(book)
+                            self._update(book_id, status='skipped')
+                            continue
+                        known_hashes.add(book.file_hash)
+                        books.append(book)
+
+                    # Одна транзакция на пачку вместо INSERT на каждую книгу.
+                    # bulk_create не шлёт post_save - кэш сбрасываем сами
+                    try:
+                        with transaction.atomic():
+                            Book.objects.bulk_create(books)
+                            user_id = self.user.pk
+                            transaction.on_commit(lambda: ModelCache.invalidate('book', user_id))
+                    except BaseException:
+                        # Пачка не записана - её файлы не должны остаться на диске
+                        for book in books:
+                            self._discard(book)
+                        raise
+                    with self._lock:
+                        for book in books:
+                            self._items[book.flibusta_id]['status'] = 'done'
+                            self.state['created'].append(str(book.id))
+                        self._save()
+        except Exception as e:
+            with self._lock:
+                for item in self.state['items']:
+                    if item['status'] not in ('done', 'skipped', 'failed'):
+                        item.update(status='failed', error=str(e))
+        finally:
+            with self._lock:
+                self.state['finished'] = True
+                self._save()
+            connection.close()
+
+    def _fetch(self, book_id):
+        """Скачивание и разбор одной книги; модель не сохраняется."""
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(self.user_slots.acquire())
+                stack.enter_context(self.global_slots.acquire())
+
+                prefetched = get_prefetcher().get(book_id)
+                if prefetched:
+                    return self._build(book_id, prefetched['file'], prefetched)
+
+                self._update(book_id, status='downloading')
+                temp_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix='bulk-'))
+                file_path = FlibustaService(self.user).download_book(
+                    book_id, directory=temp_dir, endpoint='bulk'
+                )
+
+                self._update(book_id, status='parsing')
+                return self._build(book_id, file_path, get_parser_pool().run('metadata', file_path))
+        except Exception as e:
+            self._update(book_id, status='failed', error=str(e))
+            return None
+
+    def _build(self, book_id, file_path, metadata):
+        book = Book(
+            user=self.user,
+            title=metadata['title'][:500],
+            author=metadata['author'][:300],
+            flibusta_id=book_id,
+            file_hash=file_sha256(file_path),
+        )
+        with open(file_path, 'rb') as f:
+            book.file.name = default_storage.save(f'books/{os.path.basename(file_path)}', File(f))
+        if metadata.get('cover'):
+            cover_name, cover_data = metadata['cover']
+            book.cover.name = default_storage.save(f'covers/{cover_name}', ContentFile(cover_data))
+            book.cover_placeholder = metadata['cover_placeholder']
+
+        self._update(book_id, status='saving', title=book.title)
+        return book
+
+    def _discard(self, book):
+        default_storage.delete(book.file.name)
+        if book.cover:
+            default_storage.delete(book.cover.name)
@@ -0,0 +1,190 @@
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from ..models import Book
+from .import_worker import import_task, init_worker
+from .model_cache import ModelCache
+
+
+BOOK_EXTENSIONS = ('.fb2', '.fb2.zip')
+
+# Файлы пачки держатся в памяти до записи - пачка сбрасывается и по объёму
+BATCH_MAX_BYTES = 64 * 1024 * 1024
+
+
+@dataclass
+class ImportStats:
+    total: int = 0
+    imported: int = 0
+    skipped: int = 0
+    failed: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    errors: list = field(default_factory=list)
+
+    @property
+    def processed(self):
+        return self.imported + self.skipped + self.failed
+
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.processed / elapsed if elapsed else 0.0
+
+
+def discover(paths, chunk_size=32):
+    """Разбивает файлы и архивы на задания для пула процессов.
+
+    ZIP с одной книгой хранится как есть (FB2Parser читает его сам),
+    из архива-сборника каждая .fb2 извлекается отдельной книгой.
+    """
+    for root in paths:
+        if os.path.isfile(root):
+            files = [root]
+        else:
+            files = (
+                os.path.join(directory, name)
+                for directory, _, names in os.walk(root)
+                for name in sorted(names)
+            )
+
+        for path in files:
+            lower = path.lower()
+            if lower.endswith(BOOK_EXTENSIONS):
+                yield (path, None)
+            elif lower.endswith('.zip'):
+                try:
+                    with zipfile.ZipFile(path) as zf:
+                        members = [
+                            name for name in zf.namelist()
+                            if name.lower().endswith('.fb2')
+                        ]
+                except zipfile.BadZipFile:
+                    continue
+                for start in range(0, len(members), chunk_size):
+                    yield (path, members[start:start + chunk_size])
+
+
+def count_books(task):
+    _, members = task
+    return 1 if members is None else len(members)
+
+
+class BulkImporter:
+
+    def __init__(self, user, workers=None, batch_size=500, chunk_size=32):
+        self.user = user
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+
+    def run(self, paths, progress=None):
+        tasks = list(discover(paths, chunk_size=self.chunk_size))
+        stats = ImportStats(total=sum(count_books(task) for task in tasks))
+
+        # Уже импортированные файлы пропускаются по хэшу - так повторный
+        # запуск после прерывания продолжает с места остановки
+        known_hashes = frozenset(
+            Book.objects.filter(user=self.user, file_hash__isnull=False)
+            .values_list('file_hash', flat=True)
+        )
+        seen = set(known_hashes)
+        pending = []
+        self._pending_bytes = 0
+
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings'), known_hashes),
+        )
+        try:
+            queue = iter(tasks)
+            in_flight = set()
+            while True:
+                # Ограничиваем число заданий в полёте, чтобы не держать
+                # в памяти результаты всего архива
+                while len(in_flight) < self.workers * 2:
+                    task = next(queue, None)
+                    if task is None:
+                        break
+                    in_flight.add(executor.submit(import_task, task))
+                if not in_flight:
+                    break
+
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for result in future.result():
+                        self._collect(result, stats, seen, pending)
+                    if len(pending) >= self.batch_size or self._pending_bytes >= BATCH_MAX_BYTES:
+                        self._flush(pending)
+                    if progress:
+                        progress(stats)
+        finally:
+            executor.shutdown(cancel_futures=True)
+            self._flush(pending)
+
+        return stats
+
+    def _collect(self, result, stats, seen, pending):
+        status = result['status']
+        if status == 'failed':
+            stats.failed += 1
+            stats.errors.append((result['source'], result['error']))
+            return
+
+        # Уже в библиотеке или дубликат внутри одного запуска
+        if status == 'skipped' or result['hash'] in seen:
+            stats.skipped += 1
+            return
+
+        seen.add(result['hash'])
+        book = Book(
+            user=self.user,
+            title=result['title'],
+            author=result['author'],
+            file_hash=result['hash'],
+        )
+        if result['cover']:
+            book.cover_placeholder = result['cover_placeholder']
+        pending.append((book, result))
+        self._pending_bytes += len(result['data']) + len(result['cover_data'] or b'')
+        stats.imported += 1
+
+    def _flush(self, pending):
+        """Пишет файлы пачки и её книги вместе: без строк в БД файлы не остаются."""
+        if not pending:
+            return
+        saved = []
+        try:
+            with transaction.atomic():
+                for book, result in pending:
+                    book.file.name = default_storage.save(
+                        f"books/{result['file']}", ContentFile(result['data'])
+                    )
+                    saved.append(book.file.name)
+                    if result['cover']:
+                        book.cover.name = default_storage.save(
+                            f"covers/{result['cover']}", ContentFile(result['cover_data'])
+                        )
+                        saved.append(book.cover.name)
+                Book.objects.bulk_create([book for book, _ in pending], batch_size=self.batch_size)
+                # bulk_create не шлёт post_save - кэш пользователя сбрасываем сами
+                user_id = self.user.pk
+                transaction.on_commit(lambda: ModelCache.invalidate('book', user_id))
+        except BaseException:
+            # Пачка откатилась (ошибка или Ctrl+C) - удаляем её файлы,
+            # повторный запуск запишет их заново под теми же именами
+            for name in saved:
+                default_storage.delete(name)
+            raise
+        finally:
+            pending.clear()
+            self._pending_bytes = 0
@@ -0,0 +1,40 @@
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+
+# Меняется вместе с разметкой book_card.html
+CARD_TEMPLATE_VERSION = 2
+CARD_TIMEOUT = 60 * 60 * 24 * 30
+
+
+class CardCache:
+    """Кэш отрендеренных карточек книг.
+
+    Ключ - id книги и updated_at: прогресс, избранное и рейтинг меняют
+    updated_at, поэтому старые фрагменты просто перестают запрашиваться.
+    """
+
+    @staticmethod
+    def key(book):
+        version = int(book.updated_at.timestamp() * 1_000_000)
+        return f'book-card:{CARD_TEMPLATE_VERSION}:{book.id}:{version}'
+
+    @classmethod
+    def render(cls, books):
+        books = list(books)
+        keys = [cls.key(book) for book in books]
+        cached = cache.get_many(keys)
+
+        missing = {}
+        fragments = []
+        for book, key in zip(books, keys):
+            fragment = cached.get(key)
+            if fragment is None:
+                fragment = render_to_string('books/partials/book_card.html', {'book': book})
+                missing[key] = fragment
+            fragments.append(fragment)
+
+        if missing:
+            cache.set_many(missing, timeout=CARD_TIMEOUT)
+        return mark_safe(''.join(fragments))
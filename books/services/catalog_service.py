@@ -0,0 +1,212 @@
+import re
+import zipfile
+from datetime import date
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from ..models import CatalogBook, CatalogSource
+
+
+DEFAULT_STRUCTURE = (
+    'AUTHOR', 'GENRE', 'TITLE', 'SERIES', 'SERNO', 'FILE', 'SIZE',
+    'LIBID', 'DEL', 'EXT', 'DATE', 'LANG', 'LIBRATE', 'KEYWORDS',
+)
+
+FTS_TABLE = 'books_catalogbook_fts'
+
+UPDATE_FIELDS = [
+    'title', 'authors', 'series', 'series_number', 'genres', 'lang',
+    'file_size', 'ext', 'added', 'deleted', 'source',
+]
+
+
+def _fold(text):
+    # unicode61 не приравнивает ё к е, а пользователи почти всегда пишут "е"
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _authors(value):
+    names = []
+    for author in value.split(':'):
+        parts = [part.strip() for part in author.split(',')]
+        if not any(parts):
+            continue
+        last, rest = parts[0], [part for part in parts[1:] if part]
+        names.append(' '.join(rest + [last]).strip())
+    return ', '.join(names)
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value.strip())
+    except ValueError:
+        return None
+
+
+class CatalogService:
+
+    def __init__(self, batch_size=2000):
+        self.batch_size = batch_size
+        self.flibusta_onion = settings.FLIBUSTA_ONION.rstrip('/')
+
+    @staticmethod
+    def is_available():
+        return CatalogBook.objects.exists()
+
+    def search(self, query, limit=50, offset=0):
+        terms = re.findall(r'\w+', _fold(query.lower()))
+        if not terms:
+            return []
+
+        if connection.vendor == 'sqlite':
+            match = ' '.join(f'"{term}"*' for term in terms)
+            books = CatalogBook.objects.raw(
+                f'SELECT b.* FROM {FTS_TABLE} f '
+                'JOIN books_catalogbook b ON b.lib_id = f.rowid '
+                f'WHERE {FTS_TABLE} MATCH %s AND b.deleted = 0 '
+                f'ORDER BY bm25({FTS_TABLE}, 10.0, 5.0, 2.0, 1.0) LIMIT %s OFFSET %s',
+                [match, limit, offset],
+            )
+        else:
+            books = CatalogBook.objects.filter(deleted=False)
+            for term in terms:
+                books = books.filter(
+                    Q(title__icontains=term)
+                    | Q(authors__icontains=term)
+                    | Q(series__icontains=term)
+                )
+            books = books[offset:offset + limit]
+
+        return [self._to_result(book) for book in books]
+
+    def _to_result(self, book):
+        return {
+            'id': str(book.lib_id),
+            'title': book.title,
+            'author': book.authors or 'Неизвестный автор',
+            'series': book.series,
+            'series_number': book.series_number,
+            'genres': book.genres,
+            'url': f"{self.flibusta_onion}/b/{book.lib_id}",
+        }
+
+    def ingest(self, inpx_path, full=False, progress=None):
+        """Загружает INPX в каталог; неизменённые .inp пропускаются по CRC."""
+        try:
+            archive = zipfile.ZipFile(inpx_path)
+        except (OSError, zipfile.BadZipFile) as e:
+            raise Exception(f"Ошибка чтения INPX: {str(e)}")
+
+        stats = {'files': 0, 'skipped': 0, 'records': 0}
+        with archive:
+            structure = self._structure(archive)
+            known = dict(CatalogSource.objects.values_list('name', 'crc'))
+
+            for info in archive.infolist():
+                if not info.filename.lower().endswith('.inp'):
+                    continue
+                if not full and known.get(info.filename) == info.CRC:
+                    stats['skipped'] += 1
+                    continue
+
+                records = self._ingest_member(archive, info, structure)
+                stats['files'] += 1
+                stats['records'] += records
+                if progress:
+                    progress(info.filename, records)
+
+        return stats
+
+    def _structure(self, archive):
+        try:
+            raw = archive.read('structure.info').decode('utf-8-sig')
+        except KeyError:
+            return DEFAULT_STRUCTURE
+        fields = tuple(field.strip().upper() for field in raw.split(';') if field.strip())
+        return fields or DEFAULT_STRUCTURE
+
+    def _ingest_member(self, archive, info, structure):
+        records = 0
+        # Один .inp - одна транзакция: прерванный импорт не оставит
+        # CatalogSource без соответствующих книг
+        with transaction.atomic():
+            batch = []
+            with archive.open(info) as f:
+                for raw_line in f:
+                    book = self._parse_line(raw_line, structure, info.filename)
+                    if book is None:
+                        continue
+                    batch.append(book)
+                    if len(batch) >= self.batch_size:
+                        records += self._save(batch)
+                        batch = []
+            records += self._save(batch)
+
+            CatalogSource.objects.update_or_create(
+                name=info.filename, defaults={'crc': info.CRC, 'records': records}
+            )
+        return records
+
+    def _parse_line(self, raw_line, structure, source):
+        line = raw_line.decode('utf-8', 'replace').rstrip('\r\n')
+        if not line:
+            return None
+        row = dict(zip(structure, line.split('\x04')))
+
+        lib_id = _int(row.get('LIBID'))
+        if lib_id is None:
+            return None
+
+        return CatalogBook(
+            lib_id=lib_id,
+            title=row.get('TITLE', '').strip()[:500] or 'Без названия',
+            authors=_authors(row.get('AUTHOR', ''))[:500],
+            series=row.get('SERIES', '').strip()[:300],
+            series_number=_int(row.get('SERNO')),
+            genres=', '.join(g for g in row.get('GENRE', '').split(':') if g)[:300],
+            lang=row.get('LANG', '').strip()[:16],
+            file_size=_int(row.get('SIZE')) or 0,
+            ext=row.get('EXT', '').strip()[:16] or 'fb2',
+            added=_date(row.get('DATE', '')),
+            deleted=row.get('DEL', '').strip() == '1',
+            source=source[:200],
+        )
+
+    def _save(self, batch):
+        if not batch:
+            return 0
+        # Повтор LIBID в одной пачке сломал бы уникальный rowid в FTS
+        batch = list({book.lib_id: book for book in batch}.values())
+
+        CatalogBook.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['lib_id'],
+            update_fields=UPDATE_FIELDS,
+        )
+
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                    [(book.lib_id,) for book in batch],
+                )
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, title, authors, series, genres) '
+                    'VALUES (%s, %s, %s, %s, %s)',
+                    [
+                        (book.lib_id, _fold(book.title), _fold(book.authors),
+                         _fold(book.series), book.genres)
+                        for book in batch
+                    ],
+                )
+        return len(batch)
@@ -1,33 +1,59 @@
 import zipfile
 import base64
+import hashlib
 from io import BytesIO
 from lxml import etree
 from PIL import Image
 from django.core.files.base import ContentFile
 
 
+COVER_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+# Заглушка обложки: 8x12 пикселей, растягивается браузером с размытием
+PLACEHOLDER_SIZE = (8, 12)
+
+
+def cover_file(data, image_format):
+    """ContentFile с именем по хэшу содержимого - такой URL можно кэшировать навсегда."""
+    extension = COVER_EXTENSIONS.get(image_format, image_format.lower())
+    return ContentFile(data, name=f'{hashlib.sha256(data).hexdigest()[:20]}.{extension}')
+
+
+def cover_placeholder(data):
+    """Data URI крошечной копии обложки для мгновенной отрисовки сетки."""
+    try:
+        image = Image.open(BytesIO(data)).convert('RGB')
+        image = image.resize(PLACEHOLDER_SIZE, Image.Resampling.BOX)
+        output = BytesIO()
+        try:
+            image.save(output, format='WEBP', quality=40)
+            mime = 'image/webp'
+        except (KeyError, OSError):
+            # Pillow без libwebp
+            output = BytesIO()
+            image.save(output, format='PNG', optimize=True)
+            mime = 'image/png'
+        return f'data:{mime};base64,{base64.b64encode(output.getvalue()).decode("ascii")}'
+    except Exception:
+        return ''
+
+
 class FB2Parser:
 
-    def __init__(self, file_path):
+    # Защита от ZIP-бомб и гигантских файлов
+    MAX_UNPACKED_SIZE = 128 * 1024 * 1024
+    MAX_COMPRESSION_RATIO = 100
+
+    MAX_ANNOTATION_LENGTH = 2000
+
+    def __init__(self, file_path, content=None):
         self.file_path = file_path
+        self.content = content
         self.ns = {'fb': 'http://www.gribuser.ru/xml/fictionbook/2.0'}
 
     def parse(self):
         try:
-            with open(self.file_path, 'rb') as f:
-                content = f.read()
-
-            if content[:2] == b'PK':
-                with zipfile.ZipFile(BytesIO(content)) as zf:
-                    fb2_file = None
-                    for name in zf.namelist():
-                        if name.endswith('.fb2'):
-                            fb2_file = name
-                            break
-                    if fb2_file:
-                        content = zf.read(fb2_file)
-
-            tree = etree.fromstring(content)
+            tree = self._load_tree()
 
             title = self._get_title(tree)
             author = self._get_author(tree)
@@ -38,11 +64,77 @@ class FB2Parser:
                 'title': title,
                 'author': author,
                 'cover': cover_data,
+                'cover_placeholder': self._placeholder(cover_data),
                 'text': text
             }
         except Exception as e:
             raise Exception(f"Ошибка при парсинге FB2: {str(e)}")
 
+    def parse_metadata(self, with_cover=False):
+        try:
+            tree = self._load_tree()
+
+            metadata = {
+                'title': self._get_title(tree),
+                'author': self._get_author(tree),
+                'annotation': self._get_annotation(tree),
+            }
+            if with_cover:
+                cover = self._get_cover(tree)
+                metadata['cover'] = cover
+                metadata['cover_placeholder'] = self._placeholder(cover)
+            return metadata
+        except Exception as e:
+            raise Exception(f"Ошибка при парсинге FB2: {str(e)}")
+
+    def _placeholder(self, cover):
+        if cover is None:
+            return ''
+        placeholder = cover_placeholder(cover.read())
+        # Обложку потом читают ещё раз (сохранение, передача из пула разбора)
+        cover.seek(0)
+        return placeholder
+
+    def _read_content(self):
+        if self.content is not None:
+            content = self.content
+        else:
+            with open(self.file_path, 'rb') as f:
+                content = f.read(self.MAX_UNPACKED_SIZE + 1)
+
+        if content[:2] == b'PK':
+            with zipfile.ZipFile(BytesIO(content)) as zf:
+                fb2_file = None
+                for info in zf.infolist():
+                    if info.filename.endswith('.fb2'):
+                        fb2_file = info
+                        break
+                if fb2_file:
+                    content = self._read_member(zf, fb2_file)
+
+        if len(content) > self.MAX_UNPACKED_SIZE:
+            raise Exception("Файл книги слишком большой")
+        return content
+
+    def _read_member(self, zf, info):
+        if info.file_size > self.MAX_UNPACKED_SIZE:
+            raise Exception("Файл книги в архиве слишком большой")
+        if info.file_size > max(info.compress_size, 1) * self.MAX_COMPRESSION_RATIO:
+            raise Exception("Подозрительная степень сжатия архива")
+
+        # Заголовку ZIP верить нельзя - читаем не больше лимита
+        with zf.open(info) as f:
+            content = f.read(self.MAX_UNPACKED_SIZE + 1)
+        if len(content) > self.MAX_UNPACKED_SIZE:
+            raise Exception("Файл книги в архиве слишком большой")
+        return content
+
+    def _load_tree(self):
+        # Без подстановки сущностей и сети: защита от "billion laughs" и XXE;
+        # huge_tree=False оставляет встроенные лимиты libxml2 на глубину и размер узлов
+        parser = etree.XMLParser(resolve_entities=False, no_network=True, huge_tree=False)
+        return etree.fromstring(self._read_content(), parser)
+
     def _get_title(self, tree):
         title_elem = tree.find('.//fb:book-title', self.ns)
         if title_elem is not None and title_elem.text:
@@ -64,6 +156,14 @@ class FB2Parser:
 
         return ' '.join(author_parts) if author_parts else 'Неизвестный автор'
 
+    def _get_annotation(self, tree):
+        annotation = tree.find('.//fb:title-info/fb:annotation', self.ns)
+        if annotation is None:
+            return ''
+        paragraphs = annotation.findall('fb:p', self.ns) or [annotation]
+        text = '\n'.join(' '.join(''.join(p.itertext()).split()) for p in paragraphs)
+        return text.strip()[:self.MAX_ANNOTATION_LENGTH]
+
     def _get_cover(self, tree):
         coverpage = tree.find('.//fb:coverpage/fb:image', self.ns)
         if coverpage is None:
@@ -89,26 +189,34 @@ class FB2Parser:
             output = BytesIO()
             image_format = image.format if image.format else 'JPEG'
             image.save(output, format=image_format)
-            output.seek(0)
 
-            return ContentFile(output.read(), name='cover.jpg')
+            return cover_file(output.getvalue(), image_format)
         except Exception:
             return None
 
+    def parse_sections(self):
+        try:
+            return self._get_sections(self._load_tree())
+        except Exception as e:
+            raise Exception(f"Ошибка при парсинге FB2: {str(e)}")
+
     def _get_text(self, tree):
+        return '\n\n'.join('\n'.join(section) for section in self._get_sections(tree))
+
+    def _get_sections(self, tree):
         body = tree.find('.//fb:body', self.ns)
         if body is None:
-            return ''
+            return []
 
         sections = []
         for section in body.findall('.//fb:section', self.ns):
-            section_text = self._extract_section_text(section)
-            if section_text:
-                sections.append(section_text)
+            paragraphs = self._extract_section_paragraphs(section)
+            if '\n'.join(paragraphs):
+                sections.append(paragraphs)
 
-        return '\n\n'.join(sections)
+        return sections
 
-    def _extract_section_text(self, section):
+    def _extract_section_paragraphs(self, section):
         texts = []
 
         for elem in section.iter():
@@ -117,4 +225,4 @@ class FB2Parser:
                 if elem.text:
                     texts.append(elem.text.strip())
 
-        return '\n'.join(texts)
+        return texts
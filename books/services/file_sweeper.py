@@ -0,0 +1,71 @@
+"""Фоновое удаление файлов удалённых книг.
+
+Запрос удаляет книги из БД одной транзакцией, а файлы, обложки,
+офлайн-пакеты и копии предзагрузки отдаются сюда: после коммита их
+удаляет фоновый поток, диск не держит запрос. Откаченная транзакция
+ничего не удаляет, а файл, на который ещё ссылается другая книга (общие
+обложки в старых данных), остаётся.
+"""
+
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+
+from ..models import Book
+from .prefetch import get_prefetcher
+
+
+class FileSweeper:
+
+    def __init__(self):
+        # Один поток: удаления не конкурируют с запросами за диск
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='file-sweeper')
+
+    def schedule(self, names, book_ids=(), flibusta_ids=()):
+        """Удалит файлы (и пакеты/предзагрузку книг) в фоне после коммита транзакции."""
+        names = sorted({name for name in names if name})
+        book_ids = [str(book_id) for book_id in book_ids]
+        flibusta_ids = sorted({str(book_id) for book_id in flibusta_ids if book_id})
+        if names or book_ids or flibusta_ids:
+            transaction.on_commit(
+                lambda: self._executor.submit(self.sweep, names, book_ids, flibusta_ids)
+            )
+
+    def sweep(self, names, book_ids=(), flibusta_ids=()):
+        try:
+            for book_id in book_ids:
+                shutil.rmtree(os.path.join(settings.OFFLINE_BUNDLE_ROOT, book_id), ignore_errors=True)
+            for book_id in flibusta_ids:
+                get_prefetcher().discard(book_id)
+
+            referenced = set(
+                Book.objects.filter(file__in=names).values_list('file', flat=True)
+            ) | set(
+                Book.objects.filter(cover__in=names).values_list('cover', flat=True)
+            )
+            for name in names:
+                if name in referenced:
+                    continue
+                try:
+                    default_storage.delete(name)
+                except OSError:
+                    pass
+        finally:
+            connection.close()
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def get_file_sweeper():
+    global _sweeper
+    with _sweeper_lock:
+        if _sweeper is None:
+            _sweeper = FileSweeper()
+        return _sweeper
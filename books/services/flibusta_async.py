@@ -0,0 +1,150 @@
+"""Асинхронный клиент Флибусты для async-представлений под ASGI.
+
+Запрос через Tor ждёт десятки секунд; здесь он держит корутину, а не
+поток, поэтому один процесс обслуживает сотни таких запросов. Зеркала,
+цепочки Tor, лимитер и кэш - те же, что у FlibustaService; SQLite и
+разбор страниц уходят в потоки, event loop только ждёт сеть.
+"""
+
+import asyncio
+import os
+import time
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .flibusta_pages import SearchPage, parse_search_page
+from .flibusta_service import FlibustaService
+from .mirror_pool import get_mirror_pool
+from .rate_limit import RateLimited, get_rate_limiter
+
+
+# Клиентов на event loop: по одному на прокси (слот цепочки Tor, зеркало)
+MAX_CLIENTS = 32
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def _client(proxies):
+    """Общий httpx.AsyncClient для прокси: соединения через SOCKS переиспользуются."""
+    # httpx - только в процессах, где действительно идут запросы к Флибусте
+    import httpx
+
+    proxy = proxies['http'] if proxies else None
+    clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.pop(proxy, None)
+    if client is None:
+        client = httpx.AsyncClient(
+            proxy=proxy,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=settings.FLIBUSTA_ASYNC_MAX_CONNECTIONS),
+        )
+        # После смены цепочки старые учётные данные больше не нужны
+        while len(clients) >= MAX_CLIENTS:
+            stale = clients.pop(next(iter(clients)))
+            asyncio.ensure_future(stale.aclose())
+    # Недавно использованные - в конце словаря
+    clients[proxy] = client
+    return client
+
+
+class AsyncFlibustaService:
+
+    def __init__(self, user=None):
+        self.user_id = user.pk if user is not None else None
+        self.mirrors = get_mirror_pool()
+
+    async def _get(self, path, timeout, endpoint, **kwargs):
+        """GET на самое быстрое доступное зеркало, при ошибке - на следующее."""
+        import httpx
+
+        await get_rate_limiter().acquire_async(
+            self.user_id, endpoint, wait=FlibustaService.QUEUE_WAIT.get(endpoint, 0)
+        )
+
+        errors = []
+        for mirror in self.mirrors.candidates():
+            if not mirror.acquire():
+                continue
+
+            with mirror.attempt():
+                started = time.monotonic()
+                try:
+                    with mirror.route() as route:
+                        response = await _client(route.proxies).get(
+                            f"{mirror.url}{path}", timeout=timeout, **kwargs
+                        )
+                        route.record_transfer(len(response.content))
+                        # 4xx - ответ зеркала по существу, а не его неисправность
+                        if response.status_code >= 500:
+                            response.raise_for_status()
+                except httpx.HTTPError as e:
+                    mirror.record_failure()
+                    errors.append(f"{mirror.url}: {e}")
+                    continue
+
+                mirror.record_success(time.monotonic() - started)
+            response.raise_for_status()
+            return response, mirror
+
+        if not errors:
+            raise Exception("все зеркала временно отключены после ошибок")
+        raise Exception("; ".join(errors))
+
+    async def search_page(self, query, page=0):
+        """Одна страница поиска; кэш общий с FlibustaService.search_page."""
+        if not query or not query.strip():
+            return SearchPage(query=query or '', page=page)
+
+        query = query.strip()
+        key = FlibustaService.search_cache_key(query, page)
+        try:
+            return await self._with_fallback(key, lambda: self._search(query, page))
+        except RateLimited:
+            raise
+        except Exception as e:
+            raise Exception(f"Ошибка поиска на Флибусте: {str(e)}")
+
+    async def _search(self, query, page):
+        response, mirror = await self._get(
+            "/booksearch", timeout=30, endpoint='search',
+            params=FlibustaService.search_params(query, page),
+        )
+        return await sync_to_async(parse_search_page, thread_sensitive=False)(
+            response.content, mirror.url, query=query, page=page
+        )
+
+    async def _with_fallback(self, key, fetch):
+        """Запрос; при превышении лимита - сохранённая копия из кэша."""
+        try:
+            result = await fetch()
+        except RateLimited:
+            entry = await cache.aget(key)
+            if entry is None:
+                raise
+            result = entry[1]
+            result.from_cache = True
+            return result
+
+        await cache.aset(key, (time.time(), result), settings.FLIBUSTA_STALE_TTL)
+        return result
+
+    async def download_book(self, book_id, directory=None, endpoint='download'):
+        try:
+            response, _ = await self._get(f"/b/{book_id}/fb2", timeout=60, endpoint=endpoint)
+            temp_path = FlibustaService.book_path(book_id, response.headers, directory)
+            await sync_to_async(_write_file, thread_sensitive=False)(temp_path, response.content)
+            return temp_path
+
+        except RateLimited:
+            raise
+        except Exception as e:
+            raise Exception(f"Ошибка скачивания книги: {str(e)}")
+
+
+def _write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
@@ -0,0 +1,206 @@
+"""Разбор страниц Флибусты: поиск, автор, серия.
+
+Автор, серия и книга определяются по ссылкам /a/, /s/ и /b/, а не по
+тексту строки, поэтому разделители и порядок слов не важны.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+BOOK_HREF = re.compile(r'^/b/(\d+)/?$')
+AUTHOR_HREF = re.compile(r'^/a/(\d+)/?$')
+SERIES_HREF = re.compile(r'^/s/(\d+)/?$')
+COUNT = re.compile(r'\((\d+)')
+
+# lxml загружается при первом разборе (_parse_html), а не при импорте:
+# SearchPage и FlibustaService импортируют и воркеры, которые ничего не разбирают
+HTML_PARSER = None
+SECTION_ITEMS = BOOK_ITEMS = ITEM_LINKS = NEXT_PAGE = PAGE_TITLE = LISTING_LINKS = None
+
+
+def _parse_html(content):
+    global HTML_PARSER, SECTION_ITEMS, BOOK_ITEMS, ITEM_LINKS, NEXT_PAGE, PAGE_TITLE, LISTING_LINKS
+    from lxml import etree, html
+
+    if HTML_PARSER is None:
+        SECTION_ITEMS = etree.XPath(
+            '//h3[starts-with(normalize-space(), $heading)]/following-sibling::ul[1]/li'
+        )
+        BOOK_ITEMS = etree.XPath('//li[a[starts-with(@href, "/b/")]]')
+        ITEM_LINKS = etree.XPath('./a[@href]')
+        NEXT_PAGE = etree.XPath('boolean(//li[contains(@class, "pager-next")]/a)')
+        PAGE_TITLE = etree.XPath('normalize-space(//h1[contains(@class, "title")])')
+        LISTING_LINKS = etree.XPath('//a[starts-with(@href, "/b/") or starts-with(@href, "/s/")]')
+        # Последним: другой поток по нему решает, что запросы уже готовы.
+        # Флибуста отдаёт UTF-8, а без <meta charset> lxml читает байты как latin-1
+        HTML_PARSER = html.HTMLParser(encoding='utf-8')
+    return html.fromstring(content, parser=HTML_PARSER)
+
+
+@dataclass
+class AuthorRef:
+    id: str
+    name: str
+    books_count: Optional[int] = None
+
+
+@dataclass
+class SeriesRef:
+    id: str
+    title: str
+    books_count: Optional[int] = None
+
+
+@dataclass
+class BookResult:
+    id: str
+    title: str
+    url: str
+    authors: List[AuthorRef] = field(default_factory=list)
+    series: Optional[SeriesRef] = None
+
+    @property
+    def author(self):
+        return ', '.join(author.name for author in self.authors) or 'Неизвестный автор'
+
+
+@dataclass
+class SearchPage:
+    query: str
+    page: int = 0
+    books: List[BookResult] = field(default_factory=list)
+    authors: List[AuthorRef] = field(default_factory=list)
+    series: List[SeriesRef] = field(default_factory=list)
+    has_next: bool = False
+    from_cache: bool = False
+
+
+@dataclass
+class AuthorPage:
+    id: str
+    name: str
+    books: List[BookResult] = field(default_factory=list)
+    from_cache: bool = False
+
+
+@dataclass
+class SeriesPage:
+    id: str
+    title: str
+    books: List[BookResult] = field(default_factory=list)
+    from_cache: bool = False
+
+
+def _text(element):
+    return ' '.join(element.text_content().split())
+
+
+def _count(item):
+    match = COUNT.search(item.text_content())
+    return int(match.group(1)) if match else None
+
+
+def _book_from_item(item, base_url, series=None):
+    """Книга из <li>: первая ссылка /b/, все /a/ в той же строке - авторы."""
+    book = None
+    for link in ITEM_LINKS(item):
+        href = link.get('href')
+        if book is None:
+            match = BOOK_HREF.match(href)
+            if match and _text(link):
+                book = BookResult(match.group(1), _text(link), f'{base_url}{href}', series=series)
+            continue
+        match = AUTHOR_HREF.match(href)
+        if match:
+            book.authors.append(AuthorRef(match.group(1), _text(link)))
+            continue
+        match = SERIES_HREF.match(href)
+        if match:
+            book.series = SeriesRef(match.group(1), _text(link))
+    return book
+
+
+def _refs(tree, heading, pattern, factory):
+    refs = []
+    for item in SECTION_ITEMS(tree, heading=heading):
+        for link in ITEM_LINKS(item):
+            match = pattern.match(link.get('href'))
+            if match:
+                refs.append(factory(match.group(1), _text(link), _count(item)))
+                break
+    return refs
+
+
+def parse_search_page(content, base_url, query='', page=0):
+    tree = _parse_html(content)
+
+    items = SECTION_ITEMS(tree, heading='Найденные книги') or BOOK_ITEMS(tree)
+    books = [book for book in (_book_from_item(item, base_url) for item in items) if book]
+
+    return SearchPage(
+        query=query,
+        page=page,
+        books=books,
+        authors=_refs(tree, 'Найденные писатели', AUTHOR_HREF, AuthorRef),
+        series=_refs(tree, 'Найденные серии', SERIES_HREF, SeriesRef),
+        has_next=NEXT_PAGE(tree),
+    )
+
+
+def _listing_books(tree, base_url, series=None):
+    """Книги страницы автора/серии в порядке документа.
+
+    На странице автора ссылка /s/ открывает группу книг серии - она
+    запоминается для всех следующих книг до новой ссылки /s/.
+    """
+    books = []
+    seen = set()
+    for link in LISTING_LINKS(tree):
+        href = link.get('href')
+        match = SERIES_HREF.match(href)
+        if match:
+            series = SeriesRef(match.group(1), _text(link))
+            continue
+        match = BOOK_HREF.match(href)
+        if not match or match.group(1) in seen:
+            continue
+        seen.add(match.group(1))
+        books.append(_book_from_link(link, match.group(1), base_url, series))
+    return books
+
+
+def _book_from_link(link, book_id, base_url, series):
+    """Книга из строки списка: ссылки после /b/ до <br> или следующей книги."""
+    book = BookResult(book_id, _text(link), f'{base_url}/b/{book_id}', series=series)
+    for sibling in link.itersiblings():
+        if sibling.tag == 'br':
+            break
+        if sibling.tag != 'a':
+            continue
+        href = sibling.get('href', '')
+        if BOOK_HREF.match(href) or SERIES_HREF.match(href):
+            break
+        match = AUTHOR_HREF.match(href)
+        if match:
+            book.authors.append(AuthorRef(match.group(1), _text(sibling)))
+    return book
+
+
+def parse_author_page(content, base_url, author_id):
+    tree = _parse_html(content)
+    name = PAGE_TITLE(tree) or 'Неизвестный автор'
+    books = _listing_books(tree, base_url)
+    author = AuthorRef(str(author_id), name)
+    for book in books:
+        if not book.authors:
+            book.authors.append(author)
+    return AuthorPage(str(author_id), name, books)
+
+
+def parse_series_page(content, base_url, series_id):
+    tree = _parse_html(content)
+    title = PAGE_TITLE(tree) or 'Серия'
+    series = SeriesRef(str(series_id), title)
+    return SeriesPage(str(series_id), title, _listing_books(tree, base_url, series=series))
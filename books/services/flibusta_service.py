@@ -1,95 +1,147 @@
-import requests
-from lxml import html
+import hashlib
 import os
+import time
+
 from django.conf import settings
+from django.core.cache import cache
 
+from .flibusta_pages import (
+    SearchPage, parse_author_page, parse_search_page, parse_series_page,
+)
+from .mirror_pool import get_mirror_pool
+from .rate_limit import RateLimited, get_rate_limiter
 
-class FlibustaService:
 
-    def __init__(self):
-        self.flibusta_onion = settings.FLIBUSTA_ONION
-        self.tor_proxy = {
-            'http': f'socks5h://{settings.TOR_PROXY_HOST}:{settings.TOR_PROXY_PORT}',
-            'https': f'socks5h://{settings.TOR_PROXY_HOST}:{settings.TOR_PROXY_PORT}'
-        }
-        self.session = requests.Session()
-        self.session.proxies.update(self.tor_proxy)
+class FlibustaService:
 
-    def search(self, query):
-        if not query or not query.strip():
-            return []
+    # Сколько секунд запрос ждёт своей очереди в лимитере, прежде чем сдаться
+    QUEUE_WAIT = {'search': 5, 'listing': 5, 'download': 20, 'bulk': 120, 'prefetch': 0}
 
-        try:
-            search_url = f"{self.flibusta_onion}/booksearch"
-            params = {'ask': query.strip()}
+    def __init__(self, user=None):
+        # requests импортируется здесь: воркеры, не ходящие на Флибусту, его не грузят
+        import requests
 
-            response = self.session.get(search_url, params=params, timeout=30)
-            response.raise_for_status()
+        self.user_id = user.pk if user is not None else None
+        self.mirrors = get_mirror_pool()
+        self.session = requests.Session()
 
-            tree = html.fromstring(response.content)
+    def _get(self, path, timeout, endpoint, **kwargs):
+        """GET на самое быстрое доступное зеркало, при ошибке - на следующее."""
+        import requests
 
-            results = []
-            book_links = tree.xpath('//ul/li/a[contains(@href, "/b/")]')
+        get_rate_limiter().acquire(self.user_id, endpoint, wait=self.QUEUE_WAIT.get(endpoint, 0))
 
-            for link in book_links[:20]:
-                title_text = link.text_content().strip()
-                href = link.get('href')
+        errors = []
+        for mirror in self.mirrors.candidates():
+            if not mirror.acquire():
+                continue
 
-                if not href or not title_text:
+            with mirror.attempt():
+                started = time.monotonic()
+                try:
+                    with mirror.route() as route:
+                        response = self.session.get(
+                            f"{mirror.url}{path}", proxies=route.proxies, timeout=timeout, **kwargs
+                        )
+                        route.record_transfer(len(response.content))
+                        # 4xx - ответ зеркала по существу, а не его неисправность
+                        if response.status_code >= 500:
+                            response.raise_for_status()
+                except requests.RequestException as e:
+                    mirror.record_failure()
+                    errors.append(f"{mirror.url}: {e}")
                     continue
 
-                book_id = href.split('/b/')[-1].split('/')[0]
-
-                author = 'Неизвестный автор'
-                title = title_text
-
-                parent = link.getparent()
-                if parent is not None:
-                    full_text = parent.text_content().strip()
-
-                    for separator in [' — ', ' - ', ': ', '—', ' – ']:
-                        if separator in full_text:
-                            parts = full_text.split(separator, 1)
-                            potential_author = parts[0].strip()
-                            potential_title = parts[1].strip() if len(parts) > 1 else title_text
+                mirror.record_success(time.monotonic() - started)
+            response.raise_for_status()
+            return response, mirror
 
-                            if len(potential_author) > 0 and len(potential_author) < 100:
-                                author = potential_author
-                                title = potential_title
-                                break
+        if not errors:
+            raise Exception("все зеркала временно отключены после ошибок")
+        raise Exception("; ".join(errors))
 
-                results.append({
-                    'id': book_id,
-                    'title': title,
-                    'author': author,
-                    'url': f"{self.flibusta_onion}{href}"
-                })
+    def search(self, query):
+        return self.search_page(query).books
 
-            return results
+    def search_page(self, query, page=0):
+        """Одна страница поиска: книги, авторы и серии; page считается с нуля."""
+        if not query or not query.strip():
+            return SearchPage(query=query or '', page=page)
 
+        query = query.strip()
+        try:
+            # Поиск всегда идёт в сеть; сохранённая копия - только при превышении лимита
+            return self._with_fallback(
+                self.search_cache_key(query, page), lambda: self._search(query, page)
+            )
+        except RateLimited:
+            raise
         except Exception as e:
             raise Exception(f"Ошибка поиска на Флибусте: {str(e)}")
 
-    def download_book(self, book_id):
-        try:
-            download_url = f"{self.flibusta_onion}/b/{book_id}/fb2"
+    @staticmethod
+    def search_cache_key(query, page):
+        digest = hashlib.sha1(query.lower().encode('utf-8')).hexdigest()
+        return f"flibusta:search:{digest}:{page}"
+
+    @staticmethod
+    def search_params(query, page):
+        params = {'ask': query}
+        if page:
+            params['page'] = page
+        return params
+
+    def _search(self, query, page):
+        response, mirror = self._get(
+            "/booksearch", timeout=30, endpoint='search', params=self.search_params(query, page)
+        )
+        return parse_search_page(response.content, mirror.url, query=query, page=page)
+
+    def author(self, author_id):
+        """Книги автора; страница кэшируется, повторный переход - без запроса в Tor."""
+        return self._listing('author', author_id, parse_author_page)
+
+    def series(self, series_id):
+        return self._listing('series', series_id, parse_series_page)
+
+    def _listing(self, kind, object_id, parse):
+        def fetch():
+            path = f"/{'a' if kind == 'author' else 's'}/{object_id}"
+            response, mirror = self._get(path, timeout=30, endpoint='listing')
+            return parse(response.content, mirror.url, object_id)
 
-            response = self.session.get(download_url, timeout=60)
-            response.raise_for_status()
-
-            if 'application' not in response.headers.get('Content-Type', ''):
-                raise Exception("Некорректный тип контента. Книга может быть недоступна.")
+        try:
+            return self._with_fallback(
+                f"flibusta:{kind}:{object_id}", fetch, fresh_for=settings.FLIBUSTA_LISTING_TTL
+            )
+        except RateLimited:
+            raise
+        except Exception as e:
+            raise Exception(f"Ошибка загрузки страницы Флибусты: {str(e)}")
 
-            filename = f"book_{book_id}.fb2"
+    def _with_fallback(self, key, fetch, fresh_for=0):
+        """Свежая копия из кэша или запрос; при превышении лимита - устаревшая копия."""
+        entry = cache.get(key)
+        if entry is not None and time.time() - entry[0] < fresh_for:
+            return entry[1]
 
-            content_disposition = response.headers.get('Content-Disposition', '')
-            if 'filename=' in content_disposition:
-                try:
-                    filename = content_disposition.split('filename=')[1].strip('"')
-                except:
-                    pass
+        try:
+            result = fetch()
+        except RateLimited:
+            if entry is None:
+                raise
+            result = entry[1]
+            result.from_cache = True
+            return result
+
+        cache.set(key, (time.time(), result), settings.FLIBUSTA_STALE_TTL)
+        return result
+
+    def download_book(self, book_id, directory=None, endpoint='download'):
+        try:
+            response, _ = self._get(f"/b/{book_id}/fb2", timeout=60, endpoint=endpoint)
 
-            temp_path = os.path.join(settings.MEDIA_ROOT, 'books', filename)
+            temp_path = self.book_path(book_id, response.headers, directory)
             os.makedirs(os.path.dirname(temp_path), exist_ok=True)
 
             with open(temp_path, 'wb') as f:
@@ -97,5 +149,24 @@ class FlibustaService:
 
             return temp_path
 
+        except RateLimited:
+            raise
         except Exception as e:
             raise Exception(f"Ошибка скачивания книги: {str(e)}")
+
+    @staticmethod
+    def book_path(book_id, headers, directory=None):
+        """Куда сохранить скачанную книгу (имя - из Content-Disposition)."""
+        if 'application' not in headers.get('Content-Type', ''):
+            raise Exception("Некорректный тип контента. Книга может быть недоступна.")
+
+        filename = f"book_{book_id}.fb2"
+
+        content_disposition = headers.get('Content-Disposition', '')
+        if 'filename=' in content_disposition:
+            try:
+                filename = os.path.basename(content_disposition.split('filename=')[1].strip('"'))
+            except:
+                pass
+
+        return os.path.join(directory or os.path.join(settings.MEDIA_ROOT, 'books'), filename)
@@ -0,0 +1,74 @@
+"""Проверки для /healthz, /readyz и ожидания Tor при старте контейнера."""
+
+import socket
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+# Применённые миграции сами не откатываются: после первой успешной
+# проверки граф миграций больше не загружается
+_migrations_applied = False
+
+
+def tor_handshake(host, port, timeout=2):
+    """SOCKS5-приветствие без авторизации: Tor слушает порт и отвечает."""
+    with socket.create_connection((host, int(port)), timeout=timeout) as sock:
+        sock.sendall(b'\x05\x01\x00')
+        reply = sock.recv(2)
+    if reply != b'\x05\x00':
+        raise Exception(f"неожиданный ответ SOCKS: {reply!r}")
+
+
+def wait_for_tor(timeout=60, interval=0.5):
+    """Опрашивает порт Tor, пока не ответит; False - не дождались."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            tor_handshake(settings.TOR_PROXY_HOST, settings.TOR_PROXY_PORT)
+            return True
+        except Exception:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+
+
+def check_database():
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+
+def check_migrations():
+    global _migrations_applied
+    if _migrations_applied:
+        return
+    executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    if plan:
+        raise Exception(f"не применено миграций: {len(plan)}")
+    _migrations_applied = True
+
+
+def check_tor():
+    tor_handshake(settings.TOR_PROXY_HOST, settings.TOR_PROXY_PORT)
+
+
+CHECKS = {
+    'database': check_database,
+    'migrations': check_migrations,
+    'tor': check_tor,
+}
+
+
+def readiness():
+    """(готов ли сервис, результат каждой проверки)."""
+    results = {}
+    for name, check in CHECKS.items():
+        try:
+            check()
+            results[name] = 'ok'
+        except Exception as e:
+            results[name] = str(e)
+    return all(result == 'ok' for result in results.values()), results
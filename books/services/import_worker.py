@@ -0,0 +1,68 @@
+"""Код процессов-воркеров импорта.
+
+Модуль не импортирует модели: spawn-процесс загружает его до того,
+как init_worker успевает вызвать django.setup(). Воркер только разбирает
+книгу; файлы пишет основной процесс в транзакции пачки.
+"""
+
+import hashlib
+import os
+import zipfile
+
+from .fb2_parser import FB2Parser
+
+
+_known_hashes = frozenset()
+
+
+def init_worker(settings_module, known_hashes):
+    global _known_hashes
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+
+    import django
+    django.setup()
+
+    _known_hashes = known_hashes
+
+
+def _import_one(name, data):
+    file_hash = hashlib.sha256(data).hexdigest()
+    if file_hash in _known_hashes:
+        return {'status': 'skipped', 'source': name, 'hash': file_hash}
+
+    try:
+        metadata = FB2Parser(name, content=data).parse_metadata(with_cover=True)
+    except Exception as e:
+        return {'status': 'failed', 'source': name, 'error': str(e)}
+
+    cover = metadata.get('cover')
+    return {
+        'status': 'imported',
+        'source': name,
+        'hash': file_hash,
+        'title': metadata['title'][:500],
+        'author': metadata['author'][:300],
+        'file': os.path.basename(name),
+        'data': data,
+        'cover': cover.name if cover else None,
+        'cover_data': cover.read() if cover else None,
+        'cover_placeholder': metadata['cover_placeholder'] if cover else '',
+    }
+
+
+def import_task(task):
+    path, members = task
+    if members is None:
+        with open(path, 'rb') as f:
+            return [_import_one(path, f.read())]
+
+    results = []
+    with zipfile.ZipFile(path) as zf:
+        for member in members:
+            try:
+                data = zf.read(member)
+            except (zipfile.BadZipFile, OSError) as e:
+                results.append({'status': 'failed', 'source': f'{path}:{member}', 'error': str(e)})
+                continue
+            results.append(_import_one(member, data))
+    return results
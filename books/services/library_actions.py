@@ -0,0 +1,98 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Book, Bookmark, DeletedRecord
+from .card_cache import CardCache
+from .file_sweeper import get_file_sweeper
+from .model_cache import ModelCache
+
+
+class LibraryActions:
+    """Действия над многими книгами пользователя: один SQL-запрос на действие.
+
+    update() не вызывает post_save, поэтому updated_at (по нему работают
+    синхронизация и кэш карточек) ставится явно, а кэш пользователя
+    сбрасывается после коммита. Удаление тоже обходит сигналы post_delete:
+    отметки DeletedRecord для книг и их закладок пишутся одним bulk_create,
+    строки удаляются без выборки моделей, кэш сбрасывается один раз.
+    """
+
+    ACTIONS = ('delete', 'favorite', 'unfavorite', 'rate')
+
+    def __init__(self, user):
+        self.user = user
+
+    @staticmethod
+    def parse_ids(values):
+        ids = []
+        for value in values:
+            try:
+                book_id = uuid.UUID(str(value))
+            except ValueError:
+                continue
+            if book_id not in ids:
+                ids.append(book_id)
+        return ids
+
+    def _books(self, ids):
+        return Book.objects.filter(user=self.user, id__in=ids)
+
+    def apply(self, action, ids, rating=None):
+        """Число затронутых книг."""
+        if action == 'delete':
+            return self.delete(ids)
+        if action in ('favorite', 'unfavorite'):
+            return self._update(ids, is_favorite=action == 'favorite')
+        if action == 'rate':
+            try:
+                rating = int(rating)
+            except (TypeError, ValueError):
+                rating = None
+            if rating is None or not 1 <= rating <= 5:
+                raise Exception("Рейтинг должен быть от 1 до 5")
+            return self._update(ids, rating=rating)
+        raise Exception(f"Неизвестное действие: {action}")
+
+    def _update(self, ids, **fields):
+        with transaction.atomic():
+            count = self._books(ids).update(updated_at=timezone.now(), **fields)
+            user_id = self.user.id
+            transaction.on_commit(lambda: ModelCache.invalidate('book', user_id))
+        return count
+
+    def delete(self, ids):
+        with transaction.atomic():
+            books = list(
+                self._books(ids).only('id', 'flibusta_id', 'file', 'cover', 'updated_at')
+            )
+            if not books:
+                return 0
+            book_ids = [book.id for book in books]
+            bookmarks = Bookmark.objects.filter(book_id__in=book_ids)
+            user_id = self.user.id
+
+            DeletedRecord.objects.bulk_create(
+                [DeletedRecord(user_id=user_id, model='book', object_id=book_id) for book_id in book_ids]
+                + [
+                    DeletedRecord(user_id=user_id, model='bookmark', object_id=bookmark_id)
+                    for bookmark_id in bookmarks.values_list('id', flat=True)
+                ]
+            )
+            # На Bookmark и Book есть приёмники post_delete, поэтому
+            # QuerySet.delete() выбирал бы и удалял строки по одной
+            bookmarks._raw_delete(bookmarks.db)
+            self._books(book_ids)._raw_delete(Book.objects.db)
+
+            cache.delete_many([CardCache.key(book) for book in books])
+            transaction.on_commit(lambda: ModelCache.invalidate('book', user_id))
+            transaction.on_commit(lambda: ModelCache.invalidate('bookmark', user_id))
+            # Файлы, офлайн-пакеты и предзагрузка - после коммита и в фоне
+            get_file_sweeper().schedule(
+                [name for book in books for name in (book.file.name, book.cover.name)],
+                book_ids=book_ids,
+                flibusta_ids=[book.flibusta_id for book in books],
+            )
+        return len(books)
@@ -0,0 +1,220 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from django.conf import settings
+
+from .tor_circuits import CircuitPool, CircuitRoute
+
+
+logger = logging.getLogger(__name__)
+
+# Вес нового замера в скользящей средней задержки
+EWMA_ALPHA = 0.3
+
+
+class Mirror:
+    """Зеркало Флибусты со своей транспортной цепочкой и автоматом отказов.
+
+    closed - запросы идут; после failure_threshold ошибок подряд - open,
+    запросы сразу пропускаются; по истечении паузы - half_open, одна
+    пробная попытка решает, вернуться в closed или снова в open.
+    """
+
+    def __init__(self, url, proxy=None, circuits=None, failure_threshold=3, cooldown=30,
+                 max_cooldown=300):
+        self.url = url.rstrip('/')
+        self.proxy = proxy
+        self.circuits = circuits
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self._lock = threading.Lock()
+        self.latency = None
+        self.failures = 0
+        self.state = 'closed'
+        self.cooldown = cooldown
+        self.open_until = 0.0
+        self.trial_in_flight = False
+
+    @property
+    def proxies(self):
+        if not self.proxy:
+            return None
+        return {'http': self.proxy, 'https': self.proxy}
+
+    @contextmanager
+    def route(self):
+        """Маршрут для одного запроса: слот пула цепочек Tor или общий прокси."""
+        if self.circuits is not None:
+            with self.circuits.use() as route:
+                yield route
+        else:
+            yield CircuitRoute(self.proxies)
+
+    def acquire(self):
+        """Можно ли сейчас отправить запрос на это зеркало."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() >= self.open_until:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    @contextmanager
+    def attempt(self):
+        """Запрос после acquire(): пробная попытка half_open освобождается при
+        любом исходе - и при ошибке разбора, RateLimited или отмене задачи."""
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.trial_in_flight = False
+
+    def record_success(self, latency):
+        with self._lock:
+            self.latency = latency if self.latency is None else (
+                EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency
+            )
+            self.failures = 0
+            self.state = 'closed'
+            self.cooldown = self.base_cooldown
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open':
+                # Пробная попытка провалилась - ждём дольше
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self._open()
+            elif self.failures >= self.failure_threshold:
+                self._open()
+            self.trial_in_flight = False
+
+    def _open(self):
+        self.state = 'open'
+        self.open_until = time.monotonic() + self.cooldown
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'url': self.url,
+                'state': self.state,
+                'latency_ms': None if self.latency is None else round(self.latency * 1000),
+                'failures': self.failures,
+            }
+
+
+class MirrorPool:
+
+    def __init__(self, mirrors, circuits=None, probe_interval=60, probe_timeout=15):
+        self.mirrors = mirrors
+        self.circuits = circuits
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self._probe_thread = None
+        self._lock = threading.Lock()
+
+    def candidates(self):
+        """Зеркала от быстрого к медленному; незамеренные - в порядке настройки.
+
+        Перед запросом вызывающий проверяет mirror.acquire(): так пробная
+        попытка half_open достаётся только тому, кто действительно пойдёт.
+        """
+        self._ensure_probing()
+        ordered = sorted(
+            enumerate(self.mirrors),
+            key=lambda item: (item[1].latency is None, item[1].latency or 0, item[0]),
+        )
+        return [mirror for _, mirror in ordered]
+
+    def _ensure_probing(self):
+        if not self.probe_interval or len(self.mirrors) < 2:
+            return
+        with self._lock:
+            if self._probe_thread is None:
+                self._probe_thread = threading.Thread(target=self._probe_loop, daemon=True)
+                self._probe_thread.start()
+
+    def _probe_loop(self):
+        while True:
+            for mirror in self.mirrors:
+                # Открытое зеркало проверяем только когда истекла пауза
+                if mirror.state == 'closed' or mirror.acquire():
+                    try:
+                        self.probe(mirror)
+                    except Exception:
+                        # Поток проверок один на процесс - его нельзя терять
+                        logger.exception('Ошибка проверки зеркала %s', mirror.url)
+            time.sleep(self.probe_interval)
+
+    def probe(self, mirror):
+        import requests
+
+        with mirror.attempt():
+            started = time.monotonic()
+            try:
+                with mirror.route() as route:
+                    response = requests.get(
+                        f'{mirror.url}/', proxies=route.proxies, timeout=self.probe_timeout
+                    )
+                    route.record_transfer(len(response.content))
+                    if response.status_code >= 500:
+                        raise requests.HTTPError(f'HTTP {response.status_code}')
+            except requests.RequestException:
+                mirror.record_failure()
+                return False
+            mirror.record_success(time.monotonic() - started)
+            return True
+
+    def status(self):
+        return {
+            'mirrors': [mirror.snapshot() for mirror in self.mirrors],
+            'circuits': self.circuits.stats() if self.circuits else [],
+        }
+
+
+def _is_onion(url):
+    return (urlparse(url).hostname or '').endswith('.onion')
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_mirror_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            tor_proxy = f'socks5h://{settings.TOR_PROXY_HOST}:{settings.TOR_PROXY_PORT}'
+            circuits = None
+            if settings.TOR_CIRCUITS:
+                circuits = CircuitPool(
+                    settings.TOR_PROXY_HOST,
+                    settings.TOR_PROXY_PORT,
+                    size=settings.TOR_CIRCUITS,
+                )
+
+            mirrors = []
+            for url in settings.FLIBUSTA_MIRRORS:
+                # .onion доступны только через Tor, остальные - напрямую или через свой прокси
+                onion = _is_onion(url)
+                mirrors.append(Mirror(
+                    url,
+                    proxy=tor_proxy if onion else settings.FLIBUSTA_CLEARNET_PROXY or None,
+                    circuits=circuits if onion else None,
+                    failure_threshold=settings.FLIBUSTA_FAILURE_THRESHOLD,
+                    cooldown=settings.FLIBUSTA_BREAKER_COOLDOWN,
+                ))
+
+            _pool = MirrorPool(
+                mirrors, circuits=circuits, probe_interval=settings.FLIBUSTA_PROBE_INTERVAL
+            )
+        return _pool
@@ -0,0 +1,62 @@
+import time
+
+from django.core.cache import cache
+
+
+DEFAULT_TIMEOUT = 60 * 60 * 24
+
+
+class ModelCache:
+    """Кэш данных пользователя, производных от его моделей.
+
+    Ключ содержит поколение пространства имён пользователя. Сохранение
+    или удаление Book, Bookmark, DailyReadingStats (books/signals.py)
+    меняет поколение зависимых пространств - один set вместо поиска
+    всех ключей; старые записи больше не читаются и уходят по LRU.
+    """
+
+    # Пространство имён -> модели, изменение которых его сбрасывает
+    DEPENDENCIES = {
+        'library': {'book'},
+        'profile': {'book', 'dailyreadingstats'},
+        'bookmarks': {'bookmark'},
+    }
+
+    def __init__(self, namespace, user_id):
+        if namespace not in self.DEPENDENCIES:
+            raise ValueError(f'Неизвестное пространство кэша: {namespace}')
+        self.namespace = namespace
+        self.user_id = user_id
+
+    @staticmethod
+    def generation_key(namespace, user_id):
+        return f'cache-generation:{namespace}:{user_id}'
+
+    def _generation(self):
+        key = self.generation_key(self.namespace, self.user_id)
+        generation = cache.get(key)
+        if generation is None:
+            # Поколение вытеснено или ещё не создано - новое не совпадёт со старыми
+            cache.add(key, time.time_ns(), timeout=None)
+            generation = cache.get(key)
+        return generation
+
+    def get_or_set(self, name, compute, timeout=DEFAULT_TIMEOUT):
+        key = f'{self.namespace}:{self.user_id}:{self._generation()}:{name}'
+        value = cache.get(key)
+        if value is None:
+            value = compute()
+            cache.set(key, value, timeout)
+        return value
+
+    @classmethod
+    def invalidate(cls, model_name, user_id):
+        """Сбрасывает пространства пользователя, зависящие от модели."""
+        cache.set_many(
+            {
+                cls.generation_key(namespace, user_id): time.time_ns()
+                for namespace, models in cls.DEPENDENCIES.items()
+                if model_name in models
+            },
+            timeout=None,
+        )
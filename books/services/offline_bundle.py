@@ -0,0 +1,111 @@
+import base64
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from django.conf import settings
+from django.utils.html import escape
+
+from .reading_service import CHUNK_PARAGRAPHS, ReadingService
+
+
+# Меняется вместе со структурой JSON - старые пакеты станут недействительны
+BUNDLE_FORMAT = 2
+
+
+class OfflineBundleService:
+    """Офлайн-пакет книги: разделы в HTML, оглавление, обложка, метаданные.
+
+    Пакет - сжатый gzip JSON, собирается один раз на версию книги и
+    хранится на диске вне MEDIA_ROOT, чтобы Caddy не раздавал его всем.
+    """
+
+    def __init__(self):
+        self.root = settings.OFFLINE_BUNDLE_ROOT
+
+    @staticmethod
+    def version(book):
+        stat = os.stat(book.file.path)
+        source = json.dumps([
+            BUNDLE_FORMAT,
+            book.file.name,
+            book.file_hash or f'{stat.st_size}:{int(stat.st_mtime)}',
+            book.title,
+            book.author,
+            book.cover.name if book.cover else '',
+        ])
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]
+
+    def get(self, book):
+        """Возвращает (версия, хэш содержимого, gzip-байты)."""
+        try:
+            version = self.version(book)
+            path = os.path.join(self.root, str(book.id), f'{version}.json.gz')
+
+            if not os.path.exists(path):
+                self._write(path, self._build(book, version))
+
+            with open(path, 'rb') as f:
+                payload = f.read()
+            return version, hashlib.sha256(payload).hexdigest(), payload
+        except Exception as e:
+            raise Exception(f"Ошибка подготовки офлайн-пакета: {str(e)}")
+
+    def _write(self, path, data):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Старые версии этой книги больше не нужны
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+
+        payload = gzip.compress(
+            json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+            compresslevel=9,
+            mtime=0,
+        )
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(temp_path, path)
+
+    def _build(self, book, version):
+        layout = ReadingService.get_layout(book)
+
+        sections = []
+        toc = []
+        for index, paragraphs in enumerate(layout.sections):
+            base = layout.offsets[index]
+            sections.append(''.join(
+                f'<p data-loc="{index}.{number}" data-gp="{base + number}">'
+                f'{escape(text) or "&nbsp;"}</p>'
+                for number, text in enumerate(paragraphs)
+            ))
+            title = next((text for text in paragraphs if text), '')
+            toc.append({
+                'section': index,
+                'title': title[:200],
+                'loc': f'{index}.0.0',
+                'paragraphs': len(paragraphs),
+            })
+
+        cover = None
+        if book.cover:
+            # Обложки хранятся в исходном формате (PNG, GIF, WEBP)
+            content_type = mimetypes.guess_type(book.cover.name)[0] or 'image/jpeg'
+            with book.cover.open('rb') as f:
+                cover = f'data:{content_type};base64,' + base64.b64encode(f.read()).decode('ascii')
+
+        return {
+            'format': BUNDLE_FORMAT,
+            'id': str(book.id),
+            'version': version,
+            'title': book.title,
+            'author': book.author,
+            'cover': cover,
+            'total_paragraphs': layout.total,
+            'chunk_paragraphs': CHUNK_PARAGRAPHS,
+            'toc': toc,
+            'sections': sections,
+        }
@@ -0,0 +1,234 @@
+"""OPDS-каталог библиотеки пользователя для читалок без HTMX (e-ink).
+
+Ленты - все книги, избранное и недавно прочитанные - в OPDS 1.2 (Atom)
+и OPDS 2.0 (JSON). Страницы строятся по ключу (keyset): курсор - значение
+поля сортировки и id последней книги, поэтому дальняя страница стоит как
+первая. Из Book читаются только поля, нужные записи ленты; ETag и
+Last-Modified считаются одним агрегатом, и частый опрос клиента
+синхронизации обходится ответом 304 без выборки книг.
+"""
+
+import json
+import mimetypes
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Count, Max, Q
+from django.urls import reverse
+
+from ..models import Book, DeletedRecord
+
+
+ATOM_NAVIGATION = 'application/atom+xml;profile=opds-catalog;kind=navigation'
+ATOM_ACQUISITION = 'application/atom+xml;profile=opds-catalog;kind=acquisition'
+OPDS_JSON = 'application/opds+json'
+
+ACQUISITION_REL = 'http://opds-spec.org/acquisition'
+IMAGE_REL = 'http://opds-spec.org/image'
+THUMBNAIL_REL = 'http://opds-spec.org/image/thumbnail'
+
+# Лента -> заголовок и поле сортировки (по убыванию, затем id)
+FEEDS = {
+    'all': ('Все книги', 'created_at'),
+    'favorites': ('Избранное', 'created_at'),
+    'recent': ('Недавно прочитанные', 'last_read'),
+}
+
+ENTRY_FIELDS = ('id', 'title', 'author', 'cover', 'file', 'created_at', 'updated_at', 'last_read')
+
+FILE_TYPES = (
+    ('.fb2.zip', 'application/x-zip-compressed-fb2'),
+    ('.fb2', 'application/x-fictionbook+xml'),
+    ('.epub', 'application/epub+zip'),
+    ('.zip', 'application/zip'),
+)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def file_type(name):
+    """(расширение, MIME-тип) файла книги."""
+    lower = name.lower()
+    for extension, mime_type in FILE_TYPES:
+        if lower.endswith(extension):
+            return extension, mime_type
+    return '', 'application/octet-stream'
+
+
+class OPDSService:
+
+    def __init__(self, user, absolute_url, page_size=50):
+        self.user = user
+        # request.build_absolute_uri: читалки плохо понимают относительные ссылки
+        self.absolute_url = absolute_url
+        self.page_size = page_size
+
+    def state(self):
+        """(версия, время последнего изменения) библиотеки для ETag и Last-Modified."""
+        books = Book.objects.filter(user=self.user).aggregate(
+            count=Count('id'), updated=Max('updated_at'), read=Max('last_read')
+        )
+        deleted = DeletedRecord.objects.filter(user_id=self.user.id, model='book').aggregate(
+            at=Max('deleted_at')
+        )['at']
+
+        # last_read сохраняется без updated_at - учитываем отдельно
+        moments = [books['updated'], books['read'], deleted]
+        version = ':'.join(
+            [str(books['count'])] + [moment.isoformat() if moment else '-' for moment in moments]
+        )
+        known = [moment for moment in moments if moment]
+        return version, max(known) if known else None
+
+    @staticmethod
+    def make_cursor(moment, book_id):
+        return f'{(moment - EPOCH) // timedelta(microseconds=1)}-{book_id.hex}'
+
+    @staticmethod
+    def parse_cursor(cursor):
+        try:
+            micros, book_id = cursor.split('-', 1)
+            return EPOCH + timedelta(microseconds=int(micros)), uuid.UUID(book_id)
+        except (AttributeError, ValueError, OverflowError):
+            return None
+
+    def page(self, feed, cursor=None):
+        """(книги страницы, курсор следующей или None)."""
+        field = FEEDS[feed][1]
+        books = Book.objects.filter(user=self.user).only(*ENTRY_FIELDS)
+        if feed == 'favorites':
+            books = books.filter(is_favorite=True)
+        elif feed == 'recent':
+            books = books.filter(last_read__isnull=False)
+
+        position = self.parse_cursor(cursor)
+        if position is not None:
+            moment, book_id = position
+            books = books.filter(
+                Q(**{f'{field}__lt': moment}) | Q(**{field: moment, 'id__lt': book_id})
+            )
+
+        books = list(books.order_by(f'-{field}', '-id')[:self.page_size + 1])
+        if len(books) <= self.page_size:
+            return books, None
+        books = books[:self.page_size]
+        return books, self.make_cursor(getattr(books[-1], field), books[-1].id)
+
+    # Ссылки
+
+    def _feed_url(self, version, feed=None, cursor=None):
+        name = 'books:opds_v2' if version == 2 else 'books:opds'
+        if feed is None:
+            return self.absolute_url(reverse(name))
+        url = reverse(f'{name}_feed', args=[feed])
+        return self.absolute_url(f'{url}?after={cursor}' if cursor else url)
+
+    def _file_url(self, book):
+        return self.absolute_url(reverse('books:opds_book_file', args=[book.id]))
+
+    def _cover(self, book):
+        if not book.cover:
+            return None
+        return self.absolute_url(book.cover.url), mimetypes.guess_type(book.cover.name)[0] or 'image/jpeg'
+
+    # OPDS 1.2
+
+    def _atom_root(self, feed_id, title, updated):
+        root = ET.Element('feed', {
+            'xmlns': 'http://www.w3.org/2005/Atom',
+            'xmlns:opds': 'http://opds-spec.org/2010/catalog',
+            'xmlns:dc': 'http://purl.org/dc/terms/',
+        })
+        ET.SubElement(root, 'id').text = feed_id
+        ET.SubElement(root, 'title').text = title
+        ET.SubElement(root, 'updated').text = updated.isoformat()
+        ET.SubElement(ET.SubElement(root, 'author'), 'name').text = 'Lumina Reader'
+        ET.SubElement(root, 'link', {'rel': 'start', 'href': self._feed_url(1), 'type': ATOM_NAVIGATION})
+        return root
+
+    def atom_navigation(self, updated):
+        root = self._atom_root(f'urn:lumina:{self.user.id}', 'Lumina Reader', updated)
+        ET.SubElement(root, 'link', {'rel': 'self', 'href': self._feed_url(1), 'type': ATOM_NAVIGATION})
+        for feed, (title, _) in FEEDS.items():
+            entry = ET.SubElement(root, 'entry')
+            ET.SubElement(entry, 'title').text = title
+            ET.SubElement(entry, 'id').text = f'urn:lumina:{self.user.id}:{feed}'
+            ET.SubElement(entry, 'updated').text = updated.isoformat()
+            ET.SubElement(entry, 'link', {
+                'rel': 'subsection', 'href': self._feed_url(1, feed), 'type': ATOM_ACQUISITION,
+            })
+        return ET.tostring(root, encoding='utf-8', xml_declaration=True)
+
+    def atom_feed(self, feed, books, cursor, next_cursor, updated):
+        root = self._atom_root(f'urn:lumina:{self.user.id}:{feed}', FEEDS[feed][0], updated)
+        ET.SubElement(root, 'link', {
+            'rel': 'self', 'href': self._feed_url(1, feed, cursor), 'type': ATOM_ACQUISITION,
+        })
+        ET.SubElement(root, 'link', {'rel': 'up', 'href': self._feed_url(1), 'type': ATOM_NAVIGATION})
+        if next_cursor:
+            ET.SubElement(root, 'link', {
+                'rel': 'next', 'href': self._feed_url(1, feed, next_cursor), 'type': ATOM_ACQUISITION,
+            })
+
+        for book in books:
+            entry = ET.SubElement(root, 'entry')
+            ET.SubElement(entry, 'title').text = book.title
+            ET.SubElement(entry, 'id').text = f'urn:uuid:{book.id}'
+            ET.SubElement(entry, 'updated').text = book.updated_at.isoformat()
+            ET.SubElement(entry, 'dc:issued').text = book.created_at.date().isoformat()
+            if book.author:
+                ET.SubElement(ET.SubElement(entry, 'author'), 'name').text = book.author
+            cover = self._cover(book)
+            if cover:
+                ET.SubElement(entry, 'link', {'rel': IMAGE_REL, 'href': cover[0], 'type': cover[1]})
+                ET.SubElement(entry, 'link', {'rel': THUMBNAIL_REL, 'href': cover[0], 'type': cover[1]})
+            ET.SubElement(entry, 'link', {
+                'rel': ACQUISITION_REL, 'href': self._file_url(book), 'type': file_type(book.file.name)[1],
+            })
+        return ET.tostring(root, encoding='utf-8', xml_declaration=True)
+
+    # OPDS 2.0
+
+    def json_navigation(self):
+        return json.dumps({
+            'metadata': {'title': 'Lumina Reader'},
+            'links': [{'rel': 'self', 'href': self._feed_url(2), 'type': OPDS_JSON}],
+            'navigation': [
+                {'href': self._feed_url(2, feed), 'title': title, 'type': OPDS_JSON, 'rel': 'subsection'}
+                for feed, (title, _) in FEEDS.items()
+            ],
+        }, ensure_ascii=False).encode('utf-8')
+
+    def json_feed(self, feed, books, cursor, next_cursor):
+        links = [
+            {'rel': 'self', 'href': self._feed_url(2, feed, cursor), 'type': OPDS_JSON},
+            {'rel': 'start', 'href': self._feed_url(2), 'type': OPDS_JSON},
+        ]
+        if next_cursor:
+            links.append({'rel': 'next', 'href': self._feed_url(2, feed, next_cursor), 'type': OPDS_JSON})
+
+        publications = []
+        for book in books:
+            publication = {
+                'metadata': {
+                    '@type': 'http://schema.org/Book',
+                    'identifier': f'urn:uuid:{book.id}',
+                    'title': book.title,
+                    'author': book.author,
+                    'modified': book.updated_at.isoformat(),
+                },
+                'links': [{
+                    'rel': ACQUISITION_REL, 'href': self._file_url(book), 'type': file_type(book.file.name)[1],
+                }],
+            }
+            cover = self._cover(book)
+            if cover:
+                publication['images'] = [{'href': cover[0], 'type': cover[1]}]
+            publications.append(publication)
+
+        return json.dumps({
+            'metadata': {'title': FEEDS[feed][0], 'itemsPerPage': self.page_size},
+            'links': links,
+            'publications': publications,
+        }, ensure_ascii=False).encode('utf-8')
@@ -0,0 +1,152 @@
+"""Пул изолированных процессов для разбора FB2.
+
+Веб-воркер только ждёт ответа: зависший разбор убивается по таймауту,
+а лимит памяти (RLIMIT_AS) не даёт одной книге съесть весь сервер.
+Модуль не импортирует модели - он загружается в spawn-процессах.
+"""
+
+import multiprocessing
+import queue
+import threading
+
+from django.conf import settings
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# FB2Parser (lxml, PIL) импортируется только в процессах пула: веб-воркеру,
+# который лишь ждёт ответа, эти библиотеки не нужны
+
+def _metadata_task(path):
+    from .fb2_parser import FB2Parser
+
+    metadata = FB2Parser(path).parse_metadata(with_cover=True)
+    cover = metadata.pop('cover')
+    # ContentFile по каналу не передаём - только имя и байты
+    metadata['cover'] = (cover.name, cover.read()) if cover else None
+    return metadata
+
+
+def _sections_task(path):
+    from .fb2_parser import FB2Parser
+
+    return FB2Parser(path).parse_sections()
+
+
+TASKS = {
+    'metadata': _metadata_task,
+    'sections': _sections_task,
+}
+
+
+def _worker_main(conn, memory_limit, max_jobs):
+    if resource is not None and memory_limit:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+    for _ in range(max_jobs):
+        try:
+            task, args = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            conn.send(('ok', TASKS[task](*args)))
+        except MemoryError:
+            conn.send(('error', 'Превышен лимит памяти при разборе книги'))
+        except Exception as e:
+            conn.send(('error', str(e)))
+
+
+class _Worker:
+
+    def __init__(self, context, memory_limit, max_jobs):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, memory_limit, max_jobs),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class ParserPool:
+
+    def __init__(self, workers=2, timeout=30, memory_limit_mb=1024, max_jobs=50):
+        self.timeout = timeout
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+        self.max_jobs = max_jobs
+        self._context = multiprocessing.get_context('spawn')
+        # Свободные слоты; None - процесс ещё не запущен или был убит
+        self._slots = queue.Queue()
+        for _ in range(workers):
+            self._slots.put(None)
+
+    def run(self, task, *args):
+        try:
+            worker = self._slots.get(timeout=self.timeout)
+        except queue.Empty:
+            raise Exception("Все процессы разбора книг заняты, попробуйте позже")
+
+        try:
+            if worker is None:
+                worker = _Worker(self._context, self.memory_limit, self.max_jobs)
+
+            worker.conn.send((task, args))
+            if not worker.conn.poll(self.timeout):
+                worker.kill()
+                worker = None
+                raise Exception("Превышено время разбора книги")
+
+            status, payload = worker.conn.recv()
+            worker.jobs += 1
+        except (EOFError, OSError):
+            # Процесс упал (например, убит по лимиту памяти ядром) или не запустился
+            if worker is not None:
+                worker.kill()
+            worker = None
+            raise Exception("Процесс разбора книги аварийно завершился")
+        finally:
+            if worker is not None and worker.jobs >= self.max_jobs:
+                # Процесс сам выходит после max_jobs заданий
+                worker.kill()
+                worker = None
+            self._slots.put(worker)
+
+        if status != 'ok':
+            raise Exception(payload)
+        return payload
+
+    def shutdown(self):
+        while True:
+            try:
+                worker = self._slots.get_nowait()
+            except queue.Empty:
+                return
+            if worker is not None:
+                worker.kill()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_parser_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ParserPool(
+                workers=settings.PARSER_POOL_WORKERS,
+                timeout=settings.PARSER_TIMEOUT,
+                memory_limit_mb=settings.PARSER_MEMORY_LIMIT_MB,
+                max_jobs=settings.PARSER_MAX_JOBS,
+            )
+        return _pool
@@ -0,0 +1,218 @@
+"""Фоновая предзагрузка книг из результатов поиска.
+
+После поиска первые книги скачиваются заранее: аннотация, обложка и
+размер появляются в списке, а импорт берёт уже скачанный файл вместо
+повторной загрузки через Tor. Кэш лежит на диске (общий для воркеров
+gunicorn) и ограничен числом записей и суммарным размером.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .flibusta_service import FlibustaService
+from .parser_pool import get_parser_pool
+from .rate_limit import RateLimited
+
+
+META_NAME = 'meta.json'
+
+# Неудачная предзагрузка не повторяется, пока не истечёт пауза
+FAILED_TTL = 600
+
+
+class Prefetcher:
+
+    def __init__(self, root, workers=2, max_entries=100, max_bytes=500 * 1024 * 1024,
+                 ttl=86400):
+        self.root = str(root)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def _entry_dir(self, book_id):
+        return os.path.join(self.root, str(book_id))
+
+    def _failed_marker(self, book_id):
+        return os.path.join(self.root, f'{book_id}.failed')
+
+    def schedule(self, book_ids):
+        """Ставит книги в очередь; возвращает id, для которых ждать превью."""
+        scheduled = []
+        for book_id in book_ids:
+            book_id = str(book_id)
+            if not book_id.isdigit():
+                continue
+            status = self.status(book_id)
+            if status == 'failed':
+                continue
+            scheduled.append(book_id)
+            if status == 'ready':
+                continue
+            with self._lock:
+                if book_id in self._pending:
+                    continue
+                self._pending.add(book_id)
+            self._executor.submit(self._fetch, book_id)
+        return scheduled
+
+    def status(self, book_id):
+        if os.path.exists(os.path.join(self._entry_dir(book_id), META_NAME)):
+            return 'ready'
+        try:
+            if time.time() - os.path.getmtime(self._failed_marker(book_id)) < FAILED_TTL:
+                return 'failed'
+        except OSError:
+            pass
+        return 'pending'
+
+    def get(self, book_id):
+        """Метаданные в том же виде, что отдаёт пул разбора, плюс file/size/annotation."""
+        directory = self._entry_dir(book_id)
+        try:
+            with open(os.path.join(directory, META_NAME), encoding='utf-8') as f:
+                metadata = json.load(f)
+            cover = None
+            if metadata['cover']:
+                with open(os.path.join(directory, metadata['cover']), 'rb') as f:
+                    cover = (metadata['cover'], f.read())
+            # Обращение продлевает жизнь записи (вытесняются давно не нужные)
+            os.utime(directory)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        metadata['cover'] = cover
+        metadata['file'] = os.path.join(directory, metadata['file'])
+        return metadata
+
+    def discard(self, book_id):
+        """Удаляет скачанную копию книги (книгу удалили из библиотеки)."""
+        shutil.rmtree(self._entry_dir(book_id), ignore_errors=True)
+
+    def _fetch(self, book_id):
+        os.makedirs(self.root, exist_ok=True)
+        temp_dir = os.path.join(self.root, f'.{book_id}-{os.getpid()}-{threading.get_ident()}')
+        try:
+            os.makedirs(temp_dir, exist_ok=True)
+            file_path = FlibustaService().download_book(
+                book_id, directory=temp_dir, endpoint='prefetch'
+            )
+            metadata = get_parser_pool().run('metadata', file_path)
+
+            cover_name = None
+            if metadata.get('cover'):
+                cover_name, cover_data = metadata['cover']
+                with open(os.path.join(temp_dir, cover_name), 'wb') as f:
+                    f.write(cover_data)
+
+            meta = {
+                'title': metadata['title'],
+                'author': metadata['author'],
+                'annotation': metadata.get('annotation', ''),
+                'cover': cover_name,
+                'cover_placeholder': metadata.get('cover_placeholder', ''),
+                'file': os.path.basename(file_path),
+                'size': os.path.getsize(file_path),
+            }
+            with open(os.path.join(temp_dir, META_NAME), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+
+            try:
+                os.rename(temp_dir, self._entry_dir(book_id))
+            except OSError:
+                # Другой воркер успел первым
+                shutil.rmtree(temp_dir, ignore_errors=True)
+        except RateLimited as e:
+            # Лимит - не поломка: пауза только до retry_after, а не на FAILED_TTL
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            self._mark_failed(book_id, pause=e.retry_after)
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            self._mark_failed(book_id)
+        finally:
+            with self._lock:
+                self._pending.discard(book_id)
+            self._evict()
+
+    def _mark_failed(self, book_id, pause=FAILED_TTL):
+        marker = self._failed_marker(book_id)
+        with open(marker, 'w'):
+            pass
+        if pause < FAILED_TTL:
+            # status() считает паузу от mtime: сдвигаем его в прошлое
+            moment = time.time() - FAILED_TTL + pause
+            os.utime(marker, (moment, moment))
+
+    def _evict(self):
+        now = time.time()
+        entries = []
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.root, name)
+            # Запись могла исчезнуть: её вытеснил другой воркер
+            try:
+                mtime = os.path.getmtime(path)
+                if name.endswith('.failed'):
+                    if now - mtime >= FAILED_TTL:
+                        _remove(path)
+                elif name.isdigit():
+                    entries.append((mtime, path, _dir_size(path)))
+            except OSError:
+                continue
+
+        # Сначала самые давние: протухшие по ttl, затем сверх лимитов
+        entries.sort()
+        total = sum(size for _, _, size in entries)
+        count = len(entries)
+        for mtime, path, size in entries:
+            if now - mtime < self.ttl and count <= self.max_entries and total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            count -= 1
+            total -= size
+
+
+def _dir_size(path):
+    total = 0
+    for entry in os.scandir(path):
+        try:
+            total += entry.stat().st_size
+        except OSError:
+            pass
+    return total
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher():
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher(
+                settings.PREFETCH_ROOT,
+                workers=settings.PREFETCH_WORKERS,
+                max_entries=settings.PREFETCH_MAX_ENTRIES,
+                max_bytes=settings.PREFETCH_MAX_MB * 1024 * 1024,
+                ttl=settings.PREFETCH_TTL,
+            )
+        return _prefetcher
@@ -0,0 +1,235 @@
+"""Ограничение исходящих запросов к Флибусте.
+
+Маркерные корзины (token bucket) - общая, на пользователя и на вид
+запроса - хранятся в отдельном файле SQLite, поэтому лимит общий для
+всех воркеров gunicorn. Ожидающие запросы записываются в очередь, и
+освободившийся токен достаётся пользователю, которого обслуживали
+давнее всех (round-robin): один пользователь не забивает канал Tor.
+"""
+
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+
+# Ожидающий, который столько секунд не проверял очередь, брошен (процесс упал)
+STALE_WAITER = 5
+
+
+class RateLimited(Exception):
+
+    def __init__(self, retry_after):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            f"Слишком много запросов к Флибусте, попробуйте через {self.retry_after} сек."
+        )
+
+
+def parse_limits(specs):
+    """'search=1/5' -> {'search': (1.0, 5.0)}: токенов в секунду / размер корзины."""
+    limits = {}
+    for spec in specs:
+        name, _, value = spec.partition('=')
+        rate, _, burst = value.partition('/')
+        limits[name.strip()] = (float(rate), float(burst or 1))
+    return limits
+
+
+class RateLimiter:
+
+    def __init__(self, path, limits, poll_interval=0.1):
+        self.path = str(path)
+        self.limits = limits
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+
+    def _connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(
+                'CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL);'
+                'CREATE TABLE IF NOT EXISTS waiters (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'user_key TEXT, endpoint TEXT, seen REAL);'
+                'CREATE TABLE IF NOT EXISTS served (user_key TEXT PRIMARY KEY, at REAL);'
+            )
+            self._local.db = db
+        return db
+
+    def _keys(self, user_key, endpoint):
+        keys = [('global', 'global'), (endpoint, f'endpoint:{endpoint}')]
+        if user_key != 'system':
+            keys.append(('user', f'user:{user_key}'))
+        return [(name, key) for name, key in keys if name in self.limits]
+
+    def acquire(self, user_id, endpoint, wait=0):
+        """Берёт по токену из всех корзин запроса или бросает RateLimited."""
+        user_key = str(user_id) if user_id else 'system'
+        if not self._keys(user_key, endpoint):
+            return
+
+        deadline = time.monotonic() + wait
+        ticket = self._enqueue(user_key, endpoint)
+        try:
+            while True:
+                retry_after = self._try(ticket, user_key, endpoint)
+                if retry_after is None:
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RateLimited(retry_after)
+                time.sleep(min(max(retry_after, self.poll_interval), remaining, 0.5))
+        finally:
+            self._dequeue(ticket)
+
+    async def acquire_async(self, user_id, endpoint, wait=0):
+        """То же для async-кода: SQLite - в потоке, ожидание - без потока."""
+        user_key = str(user_id) if user_id else 'system'
+        if not self._keys(user_key, endpoint):
+            return
+
+        deadline = time.monotonic() + wait
+        ticket = await sync_to_async(self._enqueue, thread_sensitive=False)(user_key, endpoint)
+        try:
+            while True:
+                retry_after = await sync_to_async(self._try, thread_sensitive=False)(
+                    ticket, user_key, endpoint
+                )
+                if retry_after is None:
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RateLimited(retry_after)
+                await asyncio.sleep(min(max(retry_after, self.poll_interval), remaining, 0.5))
+        finally:
+            await sync_to_async(self._dequeue, thread_sensitive=False)(ticket)
+
+    def _enqueue(self, user_key, endpoint):
+        return self._connection().execute(
+            'INSERT INTO waiters (user_key, endpoint, seen) VALUES (?, ?, ?)',
+            (user_key, endpoint, time.time()),
+        ).lastrowid
+
+    def _dequeue(self, ticket):
+        self._connection().execute('DELETE FROM waiters WHERE id = ?', (ticket,))
+
+    def _tokens(self, db, keys, now):
+        tokens = {}
+        for name, key in keys:
+            rate, burst = self.limits[name]
+            row = db.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens[key] = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+        return tokens
+
+    def _wait_time(self, keys, tokens):
+        wait = 0.0
+        for name, key in keys:
+            if tokens[key] < 1:
+                wait = max(wait, (1 - tokens[key]) / self.limits[name][0])
+        return wait
+
+    def _try(self, ticket, user_key, endpoint):
+        """None - токены выданы; иначе через сколько секунд пробовать снова."""
+        db = self._connection()
+        now = time.time()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            # Отметка «жив»; если запись успели удалить после долгой паузы,
+            # она возвращается на прежнее место в очереди (тот же id)
+            db.execute(
+                'INSERT OR REPLACE INTO waiters (id, user_key, endpoint, seen) VALUES (?, ?, ?, ?)',
+                (ticket, user_key, endpoint, now),
+            )
+            db.execute('DELETE FROM waiters WHERE seen < ?', (now - STALE_WAITER,))
+
+            keys = self._keys(user_key, endpoint)
+            tokens = self._tokens(db, keys, now)
+            wait = self._wait_time(keys, tokens)
+            if wait:
+                # COMMIT, а не ROLLBACK: иначе отметка «жив» пропадёт, и через
+                # STALE_WAITER ожидающего удалят из очереди другие процессы
+                db.execute('COMMIT')
+                return wait
+
+            # Очередь: среди тех, кому хватает своих токенов, вперёд идут
+            # пользователи, обслуженные давнее всех; токены общей корзины
+            # достаются первым в этом порядке
+            available = tokens.get('global', math.inf)
+            if self._position(db, ticket, now) + 1 > available:
+                db.execute('COMMIT')
+                return self.poll_interval
+
+            for _, key in keys:
+                db.execute(
+                    'INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                    (key, tokens[key] - 1, now),
+                )
+            db.execute(
+                'INSERT INTO served (user_key, at) VALUES (?, ?) '
+                'ON CONFLICT(user_key) DO UPDATE SET at = excluded.at',
+                (user_key, now),
+            )
+            db.execute('DELETE FROM waiters WHERE id = ?', (ticket,))
+            db.execute('COMMIT')
+            return None
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def _position(self, db, ticket, now):
+        waiters = db.execute(
+            'SELECT w.id, w.user_key, w.endpoint, COALESCE(s.at, 0) FROM waiters w '
+            'LEFT JOIN served s ON s.user_key = w.user_key ORDER BY w.id'
+        ).fetchall()
+        ready = []
+        seen_users = set()
+        for waiter_id, user_key, endpoint, served_at in waiters:
+            # От каждого пользователя в очереди участвует только самый старый готовый запрос
+            if user_key in seen_users:
+                continue
+            keys = [item for item in self._keys(user_key, endpoint) if item[0] != 'global']
+            if self._wait_time(keys, self._tokens(db, keys, now)):
+                continue
+            seen_users.add(user_key)
+            ready.append((served_at, waiter_id))
+
+        ready.sort()
+        for position, (_, waiter_id) in enumerate(ready):
+            if waiter_id == ticket:
+                return position
+        # Впереди старший запрос того же пользователя
+        return len(ready)
+
+    def status(self):
+        db = self._connection()
+        now = time.time()
+        buckets = {}
+        for key, tokens, updated in db.execute('SELECT key, tokens, updated FROM buckets'):
+            kind, _, name = key.partition(':')
+            rate, burst = self.limits.get('user' if kind == 'user' else name or kind, (0, tokens))
+            buckets[key] = round(min(burst, tokens + (now - updated) * rate), 2)
+        waiting = db.execute('SELECT COUNT(*) FROM waiters').fetchone()[0]
+        return {'waiting': waiting, 'buckets': buckets}
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(
+                settings.FLIBUSTA_RATE_LIMIT_DB, parse_limits(settings.FLIBUSTA_RATE_LIMITS)
+            )
+        return _limiter
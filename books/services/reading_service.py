@@ -1,5 +1,116 @@
+import os
+import re
+from functools import lru_cache
+from itertools import accumulate
+
 from ..models import Book
-from .fb2_parser import FB2Parser
+from .parser_pool import get_parser_pool
+
+
+# Абзацев в одном фрагменте читалки
+CHUNK_PARAGRAPHS = 150
+
+LOCATION_PATTERN = re.compile(r'^(\d{1,6})\.(\d{1,7})(?:\.(\d{1,7}))?$')
+
+
+@lru_cache(maxsize=8)
+def _parse_sections(path, mtime):
+    return tuple(tuple(section) for section in get_parser_pool().run('sections', path))
+
+
+class BookLayout:
+    """Разбивка текста на разделы и абзацы для адресации позиции чтения.
+
+    Позиция - строка "раздел.абзац.символ"; она не зависит от размера
+    шрифта и вёрстки, в отличие от процента прокрутки.
+    """
+
+    def __init__(self, sections):
+        self.sections = sections
+        self.offsets = list(accumulate([0] + [len(section) for section in sections]))
+        self.total = self.offsets[-1]
+
+    @staticmethod
+    def parse_location(value):
+        match = LOCATION_PATTERN.match(value or '')
+        if not match:
+            return None
+        section, paragraph, char = match.groups()
+        return int(section), int(paragraph), int(char or 0)
+
+    @staticmethod
+    def format_location(section, paragraph, char=0):
+        return f'{section}.{paragraph}.{char}'
+
+    def clamp(self, section, paragraph, char=0):
+        if not self.sections:
+            return 0, 0, 0
+        section = min(max(section, 0), len(self.sections) - 1)
+        paragraph = min(max(paragraph, 0), len(self.sections[section]) - 1)
+        char = min(max(char, 0), len(self.sections[section][paragraph]))
+        return section, paragraph, char
+
+    def global_index(self, section, paragraph):
+        return self.offsets[section] + paragraph
+
+    def percent(self, section, paragraph):
+        if not self.total:
+            return 0
+        return min(100, round(self.global_index(section, paragraph) * 100 / self.total))
+
+    def locate(self, percent):
+        """Переводит старый процент прокрутки в позицию (для книг без неё)."""
+        if not self.total:
+            return 0, 0, 0
+        target = min(self.total - 1, max(0, int(self.total * float(percent) / 100)))
+        for section in range(len(self.sections)):
+            if target < self.offsets[section + 1]:
+                return section, target - self.offsets[section], 0
+        return self.clamp(len(self.sections) - 1, 0)
+
+    def chunk(self, section, paragraph, char=0):
+        section, paragraph, char = self.clamp(section, paragraph, char)
+        if not self.sections:
+            return {
+                'section': 0, 'start': 0, 'paragraphs': [], 'prev': None,
+                'next': None, 'target': self.format_location(0, 0),
+            }
+
+        paragraphs = self.sections[section]
+        start = paragraph // CHUNK_PARAGRAPHS * CHUNK_PARAGRAPHS
+        end = min(start + CHUNK_PARAGRAPHS, len(paragraphs))
+
+        prev_location = None
+        if start > 0:
+            prev_location = self.format_location(section, start - CHUNK_PARAGRAPHS)
+        elif section > 0:
+            last = len(self.sections[section - 1]) - 1
+            prev_location = self.format_location(
+                section - 1, last // CHUNK_PARAGRAPHS * CHUNK_PARAGRAPHS
+            )
+
+        next_location = None
+        if end < len(paragraphs):
+            next_location = self.format_location(section, end)
+        elif section + 1 < len(self.sections):
+            next_location = self.format_location(section + 1, 0)
+
+        base = self.offsets[section]
+        return {
+            'section': section,
+            'start': start,
+            'paragraphs': [
+                {
+                    'index': index,
+                    'global_index': base + index,
+                    'text': paragraphs[index],
+                }
+                for index in range(start, end)
+            ],
+            'prev': prev_location,
+            'next': next_location,
+            'target': self.format_location(section, paragraph, char),
+        }
 
 
 class ReadingService:
@@ -8,21 +119,41 @@ class ReadingService:
     def get_book_text(book_id):
         try:
             book = Book.objects.get(id=book_id)
-            parser = FB2Parser(book.file.path)
-            data = parser.parse()
-            return data.get('text', '')
+            sections = ReadingService.get_layout(book).sections
+            return '\n\n'.join('\n'.join(section) for section in sections)
         except Book.DoesNotExist:
             raise Exception("Книга не найдена")
         except Exception as e:
             raise Exception(f"Ошибка при чтении книги: {str(e)}")
 
     @staticmethod
-    def update_progress(book_id, progress):
+    def get_layout(book):
+        try:
+            path = book.file.path
+            # mtime в ключе кэша: заменённый файл будет перечитан
+            return BookLayout(_parse_sections(path, os.path.getmtime(path)))
+        except Exception as e:
+            raise Exception(f"Ошибка при чтении книги: {str(e)}")
+
+    @staticmethod
+    def get_chunk(book, location=None, percent=None):
+        layout = ReadingService.get_layout(book)
+        position = BookLayout.parse_location(location)
+        if position is None:
+            position = layout.locate(percent if percent is not None else book.reading_progress)
+        return layout, layout.chunk(*position)
+
+    @staticmethod
+    def update_progress(book_id, progress, location=None):
         try:
             book = Book.objects.get(id=book_id)
             progress_value = max(0, min(100, int(progress)))
             book.reading_progress = progress_value
-            book.save(update_fields=['reading_progress'])
+            update_fields = ['reading_progress', 'updated_at']
+            if location is not None and BookLayout.parse_location(location):
+                book.reading_location = location
+                update_fields.append('reading_location')
+            book.save(update_fields=update_fields)
             return True
         except Book.DoesNotExist:
             raise Exception("Книга не найдена")
@@ -37,6 +168,7 @@ class ReadingService:
             book = Book.objects.get(id=book_id)
             return {
                 'progress': book.reading_progress,
+                'location': book.reading_location,
                 'title': book.title,
                 'author': book.author
             }
@@ -0,0 +1,314 @@
+"""Кэш Django в файле SQLite, общий для всех воркеров gunicorn.
+
+В отличие от LocMem он один на все процессы и переживает перезапуск
+воркера по max_requests; в отличие от FileBasedCache вытесняет давно
+не читанные записи (LRU) и ограничен не только числом записей, но и
+размером. Число записей и байт ведут триггеры, поэтому проверка
+лимитов после записи - одно чтение строки, а не обход каталога.
+
+Попадания и промахи считаются по пространствам имён - началу ключа
+до первого изменяемого сегмента ('flibusta:search', 'book-card',
+'profile') - и раз в METRICS_FLUSH_INTERVAL секунд складываются в ту же
+базу: manage.py cache_stats показывает их по всем воркерам.
+"""
+
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+# Время последнего чтения обновляется не чаще, чем раз в столько секунд:
+# для LRU этого хватает, а частое чтение не превращается в запись
+TOUCH_INTERVAL = 60
+METRICS_FLUSH_INTERVAL = 10
+
+# Больше параметров в одном запросе SQLite может не принять
+BATCH = 500
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache_entry ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, '
+    'accessed REAL NOT NULL, size INTEGER NOT NULL);'
+    'CREATE INDEX IF NOT EXISTS cache_entry_accessed ON cache_entry (accessed);'
+    'CREATE INDEX IF NOT EXISTS cache_entry_expires ON cache_entry (expires);'
+    'CREATE TABLE IF NOT EXISTS cache_totals ('
+    'id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL, bytes INTEGER NOT NULL);'
+    'INSERT OR IGNORE INTO cache_totals VALUES (0, 0, 0);'
+    'CREATE TRIGGER IF NOT EXISTS cache_entry_insert AFTER INSERT ON cache_entry BEGIN '
+    'UPDATE cache_totals SET entries = entries + 1, bytes = bytes + new.size; END;'
+    'CREATE TRIGGER IF NOT EXISTS cache_entry_update AFTER UPDATE OF size ON cache_entry BEGIN '
+    'UPDATE cache_totals SET bytes = bytes + new.size - old.size; END;'
+    'CREATE TRIGGER IF NOT EXISTS cache_entry_delete AFTER DELETE ON cache_entry BEGIN '
+    'UPDATE cache_totals SET entries = entries - 1, bytes = bytes - old.size; END;'
+    'CREATE TABLE IF NOT EXISTS cache_metric ('
+    'namespace TEXT PRIMARY KEY, hits INTEGER NOT NULL, misses INTEGER NOT NULL);'
+)
+
+UPSERT = (
+    'INSERT INTO cache_entry (key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?) '
+    'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+    'accessed = excluded.accessed, size = excluded.size'
+)
+
+# Один-два ведущих сегмента из букв: 'flibusta:search:<sha1>:0' -> 'flibusta:search',
+# 'book-card:2:<uuid>:<версия>' -> 'book-card'
+NAMESPACE = re.compile(r'[a-z_-]+(?::[a-z_-]+)?(?=:|$)')
+
+# Соединения - на поток и процесс; экземпляры бэкенда Django создаёт
+# на каждый поток и async-контекст, поэтому соединения живут отдельно
+_local = threading.local()
+
+_metrics = Counter()
+_metrics_lock = threading.Lock()
+_metrics_flushed = {}
+
+
+def namespace(key):
+    match = NAMESPACE.match(key)
+    return match.group(0) if match else 'other'
+
+
+class SQLiteCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = str(location)
+        options = params.get('OPTIONS', {})
+        self._max_size = int(options.get('MAX_SIZE', 256 * 1024 * 1024))
+
+    def _connection(self):
+        connections = getattr(_local, 'connections', None)
+        if connections is None or _local.pid != os.getpid():
+            # После fork соединения родителя использовать нельзя
+            connections = _local.connections = {}
+            _local.pid = os.getpid()
+
+        db = connections.get(self.path)
+        if db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.executescript(SCHEMA)
+            connections[self.path] = db
+        return db
+
+    # Чтение
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        names = {self.make_and_validate_key(key, version=version): key for key in keys}
+
+        db = self._connection()
+        now = time.time()
+        rows = []
+        stored = list(names)
+        for start in range(0, len(stored), BATCH):
+            batch = stored[start:start + BATCH]
+            rows += db.execute(
+                f'SELECT key, value, expires, accessed FROM cache_entry '
+                f'WHERE key IN ({", ".join("?" * len(batch))})',
+                batch,
+            ).fetchall()
+
+        found = {}
+        expired = []
+        stale = []
+        for stored_key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                expired.append(stored_key)
+                continue
+            found[names[stored_key]] = pickle.loads(value)
+            if now - accessed > TOUCH_INTERVAL:
+                stale.append(stored_key)
+
+        if expired:
+            self._delete_stored(db, expired)
+        if stale:
+            db.executemany(
+                'UPDATE cache_entry SET accessed = ? WHERE key = ?',
+                [(now, stored_key) for stored_key in stale],
+            )
+        self._record(keys, found)
+        return found
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'SELECT 1 FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    # Запись
+
+    def _row(self, key, value, timeout, version):
+        key = self.make_and_validate_key(key, version=version)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return key, value, self.get_backend_timeout(timeout), time.time(), len(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        rows = [self._row(key, value, timeout, version) for key, value in data.items()]
+        if not rows:
+            return []
+        # Запись больше всего кэша вытеснила бы всё остальное
+        oversized = [row[0] for row in rows if row[4] > self._max_size]
+        rows = [row for row in rows if row[4] <= self._max_size]
+
+        db = self._connection()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            if oversized:
+                self._delete_stored(db, oversized)
+            db.executemany(UPSERT, rows)
+            self._cull(db)
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        row = self._row(key, value, timeout, version)
+        if row[4] > self._max_size:
+            return False
+
+        db = self._connection()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            # Занятый ключ перезаписывается, только если запись устарела
+            added = db.execute(
+                UPSERT + ' WHERE cache_entry.expires IS NOT NULL AND cache_entry.expires <= ?',
+                row + (row[3],),
+            ).rowcount > 0
+            if added:
+                self._cull(db)
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        return self._connection().execute(
+            'UPDATE cache_entry SET expires = ?, accessed = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now),
+        ).rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._delete_stored(self._connection(), [key]) > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        self._delete_stored(self._connection(), keys)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache_entry')
+
+    def close(self, **kwargs):
+        # Вызывается в конце каждого запроса; соединение остаётся открытым
+        self._flush_metrics()
+
+    def _delete_stored(self, db, keys):
+        deleted = 0
+        for start in range(0, len(keys), BATCH):
+            batch = keys[start:start + BATCH]
+            deleted += db.execute(
+                f'DELETE FROM cache_entry WHERE key IN ({", ".join("?" * len(batch))})', batch
+            ).rowcount
+        return deleted
+
+    def _cull(self, db):
+        """Вытесняет записи сверх MAX_ENTRIES/MAX_SIZE: сначала истёкшие, затем LRU."""
+        entries, size = db.execute('SELECT entries, bytes FROM cache_totals').fetchone()
+        if entries <= self._max_entries and size <= self._max_size:
+            return
+
+        db.execute('DELETE FROM cache_entry WHERE expires <= ?', (time.time(),))
+        if self._cull_frequency == 0:
+            db.execute('DELETE FROM cache_entry')
+            return
+        while True:
+            entries, size = db.execute('SELECT entries, bytes FROM cache_totals').fetchone()
+            if not entries or (entries <= self._max_entries and size <= self._max_size):
+                return
+            db.execute(
+                'DELETE FROM cache_entry WHERE rowid IN '
+                '(SELECT rowid FROM cache_entry ORDER BY accessed LIMIT ?)',
+                (max(1, entries // self._cull_frequency),),
+            )
+
+    # Метрики
+
+    def _record(self, keys, found):
+        with _metrics_lock:
+            for key in keys:
+                _metrics[(self.path, namespace(key), key in found)] += 1
+        if time.monotonic() - _metrics_flushed.get(self.path, 0) > METRICS_FLUSH_INTERVAL:
+            self._flush_metrics()
+
+    def _flush_metrics(self):
+        with _metrics_lock:
+            _metrics_flushed[self.path] = time.monotonic()
+            pending = {}
+            for (path, name, hit), count in list(_metrics.items()):
+                if path == self.path:
+                    hits, misses = pending.get(name, (0, 0))
+                    pending[name] = (hits + count, misses) if hit else (hits, misses + count)
+                    del _metrics[(path, name, hit)]
+        if not pending:
+            return
+
+        self._connection().executemany(
+            'INSERT INTO cache_metric (namespace, hits, misses) VALUES (?, ?, ?) '
+            'ON CONFLICT (namespace) DO UPDATE SET '
+            'hits = hits + excluded.hits, misses = misses + excluded.misses',
+            [(name, hits, misses) for name, (hits, misses) in pending.items()],
+        )
+
+    def stats(self):
+        """{пространство имён: записи, байты, попадания, промахи} по всем воркерам."""
+        self._flush_metrics()
+        db = self._connection()
+        result = {}
+
+        def entry(name):
+            return result.setdefault(name, {'entries': 0, 'bytes': 0, 'hits': 0, 'misses': 0})
+
+        now = time.time()
+        for key, size in db.execute(
+            'SELECT key, size FROM cache_entry WHERE expires IS NULL OR expires > ?', (now,)
+        ):
+            # Хранимый ключ - 'префикс:версия:ключ'
+            stats = entry(namespace(key.split(':', 2)[-1]))
+            stats['entries'] += 1
+            stats['bytes'] += size
+        for name, hits, misses in db.execute('SELECT namespace, hits, misses FROM cache_metric'):
+            stats = entry(name)
+            stats['hits'] += hits
+            stats['misses'] += misses
+        return result
+
+    def reset_stats(self):
+        with _metrics_lock:
+            for item in [item for item in _metrics if item[0] == self.path]:
+                del _metrics[item]
+        self._connection().execute('DELETE FROM cache_metric')
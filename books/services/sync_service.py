@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from ..models import Book, Bookmark, DeletedRecord
+
+
+# Запись, сохранённая до начала запроса, но закоммиченная после выборки,
+# иначе была бы потеряна; повтор изменений в следующей дельте безвреден
+TOKEN_OVERLAP = timedelta(seconds=2)
+
+# Старше этого токена дельта не строится - клиент получает полный список
+TOKEN_MAX_AGE = timedelta(days=30)
+
+# Как часто чистить отметки об удалении старше TOKEN_MAX_AGE
+PRUNE_INTERVAL = timedelta(days=1)
+
+
+class SyncService:
+
+    def __init__(self, user):
+        self.user = user
+
+    @staticmethod
+    def make_token(moment):
+        return str(int(moment.timestamp() * 1_000_000))
+
+    @staticmethod
+    def parse_token(token):
+        try:
+            return datetime.fromtimestamp(int(token) / 1_000_000, tz=dt_timezone.utc)
+        except (TypeError, ValueError, OverflowError, OSError):
+            return None
+
+    def current_token(self):
+        return self.make_token(timezone.now() - TOKEN_OVERLAP)
+
+    @staticmethod
+    def prune_deleted():
+        """Удаляет отметки, которые уже не попадут ни в одну дельту; не чаще PRUNE_INTERVAL."""
+        if not cache.add('sync-prune-deleted', True, int(PRUNE_INTERVAL.total_seconds())):
+            return 0
+        return DeletedRecord.objects.filter(
+            deleted_at__lt=timezone.now() - TOKEN_MAX_AGE
+        ).delete()[0]
+
+    def changes(self, token):
+        """Изменения с момента токена; reset=True - нужна полная перерисовка."""
+        token_issued = timezone.now() - TOKEN_OVERLAP
+        since = self.parse_token(token)
+
+        if since is None or since < timezone.now() - TOKEN_MAX_AGE:
+            return {'token': self.make_token(token_issued), 'reset': True}
+
+        books = list(
+            Book.objects.filter(user=self.user, updated_at__gte=since).order_by('-created_at')
+        )
+        bookmarks = list(
+            Bookmark.objects.filter(user=self.user, updated_at__gte=since)
+            .order_by('created_at')
+        )
+
+        deleted = {'book': [], 'bookmark': []}
+        for model, object_id in DeletedRecord.objects.filter(
+            user_id=self.user.id, deleted_at__gte=since
+        ).values_list('model', 'object_id'):
+            deleted.setdefault(model, []).append(object_id)
+
+        return {
+            'token': self.make_token(token_issued),
+            'reset': False,
+            'new_books': [book for book in books if book.created_at >= since],
+            'updated_books': [book for book in books if book.created_at < since],
+            'bookmarks': bookmarks,
+            'deleted_books': deleted['book'],
+            'deleted_bookmarks': deleted['bookmark'],
+        }
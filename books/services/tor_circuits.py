@@ -0,0 +1,159 @@
+import secrets
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+
+
+# Вес нового замера в скользящих средних слота
+EWMA_ALPHA = 0.3
+
+# Скорость меряем только на заметных ответах: страница поиска почти
+# целиком состоит из задержки цепочки, а не из передачи данных
+THROUGHPUT_MIN_BYTES = 64 * 1024
+
+
+class CircuitSlot:
+    """Слот пула: свои логин/пароль SOCKS - своя цепочка Tor (IsolateSOCKSAuth)."""
+
+    def __init__(self, index):
+        self.index = index
+        self.generation = 0
+        self.retired = 0
+        self._new_credentials()
+
+    def _new_credentials(self):
+        self.username = f'lumina-{self.index}-{secrets.token_hex(4)}'
+        self.password = secrets.token_hex(4)
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.throughput = None
+        self.latency = None
+
+    def retire(self):
+        # Новые учётные данные - Tor строит для слота новую цепочку
+        self.generation += 1
+        self.retired += 1
+        self._new_credentials()
+
+    def proxy(self, host, port):
+        return f'socks5h://{quote(self.username)}:{quote(self.password)}@{host}:{port}'
+
+    def record(self, transferred, elapsed):
+        self.requests += 1
+        self.bytes += transferred
+        self.seconds += elapsed
+        if transferred < THROUGHPUT_MIN_BYTES:
+            self.latency = elapsed if self.latency is None else (
+                EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * self.latency
+            )
+        else:
+            rate = transferred / max(elapsed, 1e-6)
+            self.throughput = rate if self.throughput is None else (
+                EWMA_ALPHA * rate + (1 - EWMA_ALPHA) * self.throughput
+            )
+
+    def snapshot(self):
+        return {
+            'slot': self.index,
+            'generation': self.generation,
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'failures': self.failures,
+            'bytes': self.bytes,
+            'throughput_kbps': None if self.throughput is None else round(self.throughput / 1024, 1),
+            'latency_ms': None if self.latency is None else round(self.latency * 1000),
+            'retired': self.retired,
+        }
+
+
+class CircuitRoute:
+    """То, что получает вызывающий код на время одного запроса."""
+
+    def __init__(self, proxies):
+        self.proxies = proxies
+        self.transferred = 0
+
+    def record_transfer(self, size):
+        self.transferred += size
+
+
+class CircuitPool:
+    """Пул изолированных цепочек Tor.
+
+    Запрос уходит в наименее загруженный слот (при равенстве - в самый
+    быстрый), поэтому долгая загрузка книги не тормозит поиск других
+    пользователей. Слот, заметно медленнее остальных или с ошибками
+    подряд, получает новые учётные данные, то есть новую цепочку.
+    """
+
+    def __init__(self, host, port, size=4, min_samples=3, slow_factor=0.3, max_failures=2):
+        self.host = host
+        self.port = port
+        self.min_samples = min_samples
+        self.slow_factor = slow_factor
+        self.max_failures = max_failures
+        self.slots = [CircuitSlot(index) for index in range(size)]
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        with self._lock:
+            # Сначала набираем статистику по каждому слоту, потом - самый быстрый
+            slot = min(
+                self.slots,
+                key=lambda s: (s.in_flight, s.requests >= self.min_samples, -(s.throughput or 0)),
+            )
+            slot.in_flight += 1
+            return slot, slot.generation, slot.proxy(self.host, self.port)
+
+    @contextmanager
+    def use(self):
+        slot, generation, proxy = self._acquire()
+        route = CircuitRoute({'http': proxy, 'https': proxy})
+        started = time.monotonic()
+        try:
+            yield route
+        except BaseException:
+            with self._lock:
+                self._release(slot, generation)
+                if slot.generation == generation:
+                    slot.failures += 1
+                    if slot.failures >= self.max_failures:
+                        slot.retire()
+            raise
+        else:
+            with self._lock:
+                self._release(slot, generation)
+                if slot.generation == generation:
+                    slot.failures = 0
+                    slot.record(route.transferred, time.monotonic() - started)
+                    self._retire_if_slow(slot)
+
+    def _release(self, slot, generation):
+        # После смены цепочки счётчик уже обнулён вместе со статистикой
+        if slot.generation == generation:
+            slot.in_flight -= 1
+
+    def _retire_if_slow(self, slot):
+        if slot.requests < self.min_samples:
+            return
+        peers = [s for s in self.slots if s is not slot and s.requests >= self.min_samples]
+
+        latencies = [s.latency for s in peers if s.latency is not None]
+        if latencies and slot.latency is not None \
+                and slot.latency * self.slow_factor > statistics.median(latencies):
+            slot.retire()
+            return
+
+        rates = [s.throughput for s in peers if s.throughput is not None]
+        if rates and slot.throughput is not None \
+                and slot.throughput < self.slow_factor * statistics.median(rates):
+            slot.retire()
+
+    def stats(self):
+        with self._lock:
+            return [slot.snapshot() for slot in self.slots]
@@ -0,0 +1,34 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Book, Bookmark, DailyReadingStats, DeletedRecord
+from .services.card_cache import CardCache
+from .services.model_cache import ModelCache
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Bookmark)
+def record_deletion(sender, instance, **kwargs):
+    # Синхрондау клиенттері жойылған жазбаны осы белгі арқылы біледі
+    DeletedRecord.objects.create(
+        user_id=instance.user_id,
+        model=sender._meta.model_name,
+        object_id=instance.pk,
+    )
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Bookmark)
+@receiver(post_save, sender=DailyReadingStats)
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Bookmark)
+@receiver(post_delete, sender=DailyReadingStats)
+def invalidate_cache(sender, instance, **kwargs):
+    model_name, user_id = sender._meta.model_name, instance.user_id
+    # Коммиттен кейін: әйтпесе басқа воркер ескі деректі қайта кэштеп үлгереді
+    transaction.on_commit(lambda: ModelCache.invalidate(model_name, user_id))
+    if sender is Book and 'created' not in kwargs:
+        # Өшірілген кітаптың карточкасы енді ешқашан сұралмайды
+        cache.delete(CardCache.key(instance))
@@ -0,0 +1,12 @@
+from django import template
+
+from ..services.card_cache import CardCache
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def book_cards(books):
+    """Карточки книг из кэша фрагментов (один get_many на всю сетку)"""
+    return CardCache.render(books)
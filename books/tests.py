@@ -0,0 +1,41 @@
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .services import rate_limit
+from .services.rate_limit import RateLimiter
+
+
+class RateLimiterWaiterTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'ratelimit.sqlite3')
+
+    @mock.patch.object(rate_limit, 'STALE_WAITER', 0.2)
+    def test_waiter_outlives_stale_interval(self):
+        limits = {'global': (0.001, 1)}
+        first = RateLimiter(self.path, limits)
+        first.acquire(1, 'search')
+
+        # Токенов нет: ожидающий опрашивает очередь дольше STALE_WAITER
+        ticket = first._enqueue('1', 'search')
+        started = time.time()
+        while time.time() - started < 0.6:
+            self.assertIsNotNone(first._try(ticket, '1', 'search'))
+            time.sleep(0.05)
+
+        # Другой процесс чистит брошенных ожидающих - живой остаётся в очереди
+        other = RateLimiter(self.path, limits)
+        other_ticket = other._enqueue('2', 'search')
+        self.assertIsNotNone(other._try(other_ticket, '2', 'search'))
+
+        seen = first._connection().execute(
+            'SELECT seen FROM waiters WHERE id = ?', (ticket,)
+        ).fetchone()
+        self.assertIsNotNone(seen)
+        self.assertGreater(seen[0], started + 0.4)
@@ -7,17 +7,56 @@ urlpatterns = [
     path("", views.library_view, name="library"),
     path("last-read/", views.last_read_view, name="last_read"),
     path("book/<uuid:book_id>/", views.book_detail_view, name="book_detail"),
+    path("book/<uuid:book_id>/chunk/", views.book_chunk_view, name="book_chunk"),
     path(
         "book/<uuid:book_id>/progress/",
         views.update_progress_view,
         name="update_progress",
     ),
     path("search/", views.search_view, name="search"),
+    path(
+        "flibusta/author/<int:author_id>/",
+        views.flibusta_author_view,
+        name="flibusta_author",
+    ),
+    path(
+        "flibusta/series/<int:series_id>/",
+        views.flibusta_series_view,
+        name="flibusta_series",
+    ),
+    path(
+        "flibusta/preview/<int:book_id>/",
+        views.flibusta_preview_view,
+        name="flibusta_preview",
+    ),
+    path(
+        "flibusta/preview/<int:book_id>/cover/",
+        views.flibusta_preview_cover_view,
+        name="flibusta_preview_cover",
+    ),
     path("download/", views.download_book_view, name="download"),
+    path("download/bulk/", views.bulk_download_view, name="bulk_download"),
+    path(
+        "download/bulk/<str:job_id>/",
+        views.bulk_download_status_view,
+        name="bulk_download_status",
+    ),
     path("book/<uuid:book_id>/delete/", views.delete_book_view, name="delete_book"),
+    path("books/bulk/", views.bulk_action_view, name="bulk_action"),
+    path("sync/", views.sync_view, name="sync"),
     path("offline/", views.offline_view, name="offline"),
+    path("offline/manifest/", views.offline_manifest_view, name="offline_manifest"),
+    path("book/<uuid:book_id>/bundle/", views.book_bundle_view, name="book_bundle"),
+    path("opds/", views.opds_view, name="opds"),
+    path("opds/v2/", views.opds_view, {"version": 2}, name="opds_v2"),
+    path("opds/v2/<slug:feed>/", views.opds_view, {"version": 2}, name="opds_v2_feed"),
+    path("opds/book/<uuid:book_id>/file/", views.opds_book_file_view, name="opds_book_file"),
+    path("opds/<slug:feed>/", views.opds_view, name="opds_feed"),
+    path("sw.js", views.service_worker_view, name="service_worker"),
     path("sitemap.xml", views.sitemap_view, name="sitemap"),
     path("robots.txt", views.robots_view, name="robots"),
+    path("healthz", views.healthz_view, name="healthz"),
+    path("readyz", views.readyz_view, name="readyz"),
     path("login/", views.login_view, name="login"),
     path("register/", views.register_view, name="register"),
     path("logout/", views.logout_view, name="logout"),
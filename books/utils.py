@@ -1,2 +1,13 @@
+import hashlib
+
+
 def is_htmx(request):
     return request.headers.get('HX-Request') == 'true'
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
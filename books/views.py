@@ -1,19 +1,82 @@
+import base64
+import gzip
+import hashlib
+import json
 import os
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.template.loader import render_to_string
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.html import escape
+from django.utils.http import http_date, parse_etags
+from django.utils.safestring import mark_safe
 from django.views.decorators.http import require_http_methods
 from django.core.files import File
-from django.db.models import Q
+from django.core.files.base import ContentFile
+from django.db.models import Q, Sum
 from django.contrib import messages
 from django.utils import timezone
 from .models import Book, SearchHistory, Bookmark, DailyReadingStats
 from .services.flibusta_service import FlibustaService
-from .services.fb2_parser import FB2Parser
-from .services.reading_service import ReadingService
-from django.contrib.auth import login, logout, authenticate
+from .services.flibusta_async import AsyncFlibustaService
+from .services.flibusta_pages import SearchPage
+from .services.health import readiness
+from .services.parser_pool import get_parser_pool
+from .services.prefetch import get_prefetcher
+from .services.rate_limit import RateLimited
+from .services.reading_service import BookLayout, ReadingService
+from .services.catalog_service import CatalogService
+from .services.bulk_download import BulkDownload
+from .services.offline_bundle import OfflineBundleService
+from .services.model_cache import ModelCache
+from .services.library_actions import LibraryActions
+from .services.sync_service import SyncService
+from .services.opds_service import ATOM_ACQUISITION, ATOM_NAVIGATION, FEEDS, OPDS_JSON, OPDSService, file_type
+from django.contrib.auth import get_user_model, login, logout, authenticate
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from django.contrib.auth.decorators import login_required
-from .utils import is_htmx
+from .utils import is_htmx, file_sha256
+
+
+CATALOG_PAGE_SIZE = 50
+
+# Ағынмен жіберілетін оқу бетінде мәтін тұратын орын
+READER_TEXT_MARKER = "<!--reader-text-->"
+
+
+def _search_catalog(query, page=0):
+    # Локальный каталог из INPX отвечает без Tor; None - каталога нет, нужна сеть
+    if not CatalogService.is_available():
+        return None
+    results = CatalogService().search(
+        query, limit=CATALOG_PAGE_SIZE, offset=page * CATALOG_PAGE_SIZE
+    )
+    return SearchPage(
+        query=query, page=page, books=results,
+        has_next=len(results) == CATALOG_PAGE_SIZE,
+    )
+
+
+def _search_flibusta(query, user, page=0):
+    catalog_page = _search_catalog(query, page)
+    if catalog_page is not None:
+        return catalog_page
+    return FlibustaService(user).search_page(query, page=page)
+
+
+async def _asearch_flibusta(query, user, page=0):
+    catalog_page = await sync_to_async(_search_catalog)(query, page)
+    if catalog_page is not None:
+        return catalog_page
+    return await AsyncFlibustaService(user).search_page(query, page=page)
 
 
 @require_http_methods(["GET"])
@@ -22,9 +85,17 @@ def library_view(request):
     if not request.user.is_authenticated:
         return render(request, "books/landing.html")
 
+    query = request.GET.get("q", "").strip()
+
+    # Клиент хранит сетку книг: при возврате отдаём только изменения
+    sync_token = request.headers.get("X-Sync-Token")
+    if is_htmx(request) and sync_token and not query:
+        changes = SyncService(request.user).changes(sync_token)
+        if not changes["reset"]:
+            return _library_delta_response(request, changes)
+
     # Логика библиотеки для авторизованных
     books = Book.objects.filter(user=request.user)
-    query = request.GET.get("q", "").strip()
     flibusta_results = []
     flibusta_error = None
 
@@ -40,14 +111,16 @@ def library_view(request):
                 item.delete()
 
         try:
-            service = FlibustaService()
-            flibusta_results = service.search(query)
+            flibusta_results = _search_flibusta(query, request.user).books
         except Exception as e:
             flibusta_error = str(e)
 
     # Іздеу тарихын алу
     search_history = SearchHistory.objects.filter(user=request.user)[:5]
-    favorites_count = Book.objects.filter(user=request.user, is_favorite=True).count()
+    favorites_count = ModelCache("library", request.user.id).get_or_set(
+        "favorites-count",
+        lambda: Book.objects.filter(user=request.user, is_favorite=True).count(),
+    )
 
     context = {
         "books": books,
@@ -57,6 +130,7 @@ def library_view(request):
         "is_htmx": is_htmx(request),
         "search_history": search_history,
         "favorites_count": favorites_count,
+        "sync_token": SyncService(request.user).current_token(),
     }
 
     if is_htmx(request):
@@ -67,6 +141,71 @@ def library_view(request):
     return render(request, "books/library.html", context)
 
 
+def _library_delta_response(request, changes):
+    response = render(request, "books/partials/library_sync.html", changes)
+    # Сетка уже восстановлена на клиенте - применяются только OOB-фрагменты
+    response["HX-Reswap"] = "none"
+    response["X-Library-Delta"] = "1"
+    return response
+
+
+@require_http_methods(["GET"])
+@login_required
+def sync_view(request):
+    """Кітаптар, прогресс және бетбелгілер: токеннен кейінгі өзгерістер"""
+    # Ескі белгілер енді ешбір дельтаға кірмейді: кесте шексіз өспесін
+    SyncService.prune_deleted()
+    changes = SyncService(request.user).changes(request.GET.get("since"))
+
+    if is_htmx(request) and not changes["reset"]:
+        return _library_delta_response(request, changes)
+
+    if changes["reset"]:
+        books = Book.objects.filter(user=request.user)
+        bookmarks = Bookmark.objects.filter(user=request.user)
+        deleted = {"books": [], "bookmarks": []}
+    else:
+        books = changes["new_books"] + changes["updated_books"]
+        bookmarks = changes["bookmarks"]
+        deleted = {
+            "books": [str(pk) for pk in changes["deleted_books"]],
+            "bookmarks": [str(pk) for pk in changes["deleted_bookmarks"]],
+        }
+
+    return JsonResponse(
+        {
+            "token": changes["token"],
+            "reset": changes["reset"],
+            "books": [
+                {
+                    "id": str(book.id),
+                    "title": book.title,
+                    "author": book.author,
+                    "cover": book.cover.url if book.cover else None,
+                    "reading_progress": book.reading_progress,
+                    "reading_location": book.reading_location,
+                    "is_favorite": book.is_favorite,
+                    "rating": book.rating,
+                    "updated_at": book.updated_at.isoformat(),
+                }
+                for book in books
+            ],
+            "bookmarks": [
+                {
+                    "id": str(bookmark.id),
+                    "book": str(bookmark.book_id),
+                    "title": bookmark.title,
+                    "scroll_position": bookmark.scroll_position,
+                    "location": bookmark.location,
+                    "updated_at": bookmark.updated_at.isoformat(),
+                }
+                for bookmark in bookmarks
+            ],
+            "deleted": deleted,
+        }
+    )
+
+
 @require_http_methods(["GET"])
 def book_detail_view(request, book_id):
     # Проверяем, что книга принадлежит текущему пользователю
@@ -74,9 +213,21 @@ def book_detail_view(request, book_id):
     book.last_read = timezone.now()
     book.save(update_fields=["last_read"])
 
+    context = {
+        "book": book,
+        "bookmarks": ModelCache("bookmarks", request.user.id).get_or_set(
+            str(book.id), lambda: list(book.bookmarks.all())
+        ),
+        "is_htmx": is_htmx(request),
+    }
+    if not is_htmx(request) and settings.READER_STREAMING:
+        return _reader_stream_response(request, book, context)
+
     try:
-        text = ReadingService.get_book_text(book_id)
-        context = {"book": book, "text": text, "is_htmx": is_htmx(request)}
+        layout, chunk = ReadingService.get_chunk(book, book.reading_location)
+        context.update(
+            chunk=chunk, location=chunk["target"], total_paragraphs=layout.total
+        )
 
         if is_htmx(request):
             return render(request, "books/partials/reader_content.html", context)
@@ -90,25 +241,108 @@ def book_detail_view(request, book_id):
         return render(request, "books/error.html", {"error": str(e)})
 
 
+def _reader_stream_response(request, book, context):
+    """Оқу беті ағынмен: қабық бірден, мәтін кітап талданғаннан кейін.
+
+    Қабық (head, басқару элементтері, бетбелгілер) осы жерде рендерленеді -
+    CSRF cookie жауап тақырыптарына үлгереді. Бірінші байт пен алғашқы
+    сурет кітап көлеміне тәуелді емес: ұзақ талдау қабық жіберілген соң.
+    """
+    page = render_to_string(
+        "books/reader.html",
+        {**context, "reader_stream": mark_safe(READER_TEXT_MARKER)},
+        request,
+    )
+    shell, tail = page.split(READER_TEXT_MARKER)
+
+    def stream():
+        yield shell
+        try:
+            layout, chunk = ReadingService.get_chunk(book, book.reading_location)
+            yield render_to_string(
+                "books/partials/reader_text.html",
+                {
+                    "book": book,
+                    "chunk": chunk,
+                    "location": chunk["target"],
+                    "total_paragraphs": layout.total,
+                },
+            )
+        except Exception as e:
+            # Күй коды жіберіліп қойған - қатені мәтін орнында көрсетеміз
+            yield (
+                '<div id="reader-text" class="font-serif">'
+                f'<div class="error text-red-400">{escape(str(e))}</div></div>'
+            )
+        yield tail
+
+    content = stream()
+    if isinstance(request, ASGIRequest):
+        # Синхронды итераторды ASGI алдымен толық жинап алады - ағын болмайды
+        content = _aiterate(content)
+    return StreamingHttpResponse(content, content_type="text/html; charset=utf-8")
+
+
+async def _aiterate(iterator):
+    """Синхронды генератордың әр қадамы ағында, бөлігі клиентке бірден."""
+    step = sync_to_async(next)
+    done = object()
+    while (part := await step(iterator, done)) is not done:
+        yield part
+
+
+@require_http_methods(["GET"])
+@login_required
+def book_chunk_view(request, book_id):
+    """Позицияны қамтитын мәтін фрагменті (бетбелгі мен жалғастыру үшін)"""
+    book = get_object_or_404(Book, id=book_id, user=request.user)
+    percent = request.GET.get("percent")
+
+    try:
+        _, chunk = ReadingService.get_chunk(
+            book,
+            request.GET.get("loc"),
+            float(percent) if percent else None,
+        )
+    except Exception as e:
+        return HttpResponse(f'<div class="error text-red-400">{str(e)}</div>', status=400)
+
+    direction = request.GET.get("dir")
+    return render(
+        request,
+        "books/partials/reader_chunk.html",
+        {
+            "book": book,
+            "chunk": chunk,
+            "show_prev": direction != "next",
+            "show_next": direction != "prev",
+        },
+    )
+
+
 @require_http_methods(["POST"])
 def update_progress_view(request, book_id):
     try:
         progress = request.POST.get("progress", 0)
-        ReadingService.update_progress(book_id, progress)
+        location = request.POST.get("location")
+        ReadingService.update_progress(book_id, progress, location)
         return HttpResponse(status=204)
     except Exception as e:
         return HttpResponse(f"Error: {str(e)}", status=400)
 
 
 @require_http_methods(["GET"])
-def search_view(request):
+async def search_view(request):
+    """Флибустадан іздеу: Tor-ды күту ағынды ұстамайды (ASGI)."""
     query = request.GET.get("q", "").strip()
+    arender = sync_to_async(render)
 
     if not query:
-        return render(request, "books/partials/flibusta_results.html", {"results": []})
+        return await arender(request, "books/partials/flibusta_results.html", {"results": []})
 
-    if not request.user.is_authenticated:
-        return render(
+    user = await request.auser()
+    if not user.is_authenticated:
+        return await arender(
             request,
             "books/partials/flibusta_results.html",
             {
@@ -118,22 +352,135 @@ def search_view(request):
         )
 
     try:
-        service = FlibustaService()
-        results = service.search(query)
+        page = max(int(request.GET.get("page", 0)), 0)
+    except ValueError:
+        page = 0
+
+    try:
+        result_page = await _asearch_flibusta(query, user, page)
+    except Exception as e:
+        return await arender(
+            request,
+            "books/partials/flibusta_results.html",
+            {"results": [], "error": str(e)},
+        )
+
+    # Первые книги скачиваются в фоне: превью подгружается по мере готовности
+    prefetch_ids = []
+    if not page and settings.PREFETCH_TOP_N:
+        top = result_page.books[:settings.PREFETCH_TOP_N]
+        # Каталог отдаёт словари, сеть - BookResult
+        prefetch_ids = await sync_to_async(get_prefetcher().schedule, thread_sensitive=False)(
+            [result["id"] if isinstance(result, dict) else result.id for result in top]
+        )
+
+    context = {
+        "results": result_page.books,
+        "authors": result_page.authors,
+        "series": result_page.series,
+        "query": query,
+        "next_page": page + 1 if result_page.has_next else None,
+        "prefetch_ids": prefetch_ids,
+        "from_cache": result_page.from_cache,
+    }
+    # Следующие страницы дописываются в конец уже показанного списка
+    if page:
+        return await arender(request, "books/partials/flibusta_result_items.html", context)
+    return await arender(request, "books/partials/flibusta_results.html", context)
+
+
+@login_required
+@require_http_methods(["GET"])
+def flibusta_author_view(request, author_id):
+    """Автордың Флибустадағы кітаптары (кэштен)."""
+    try:
+        author = FlibustaService(request.user).author(author_id)
+    except Exception as e:
         return render(
-            request, "books/partials/flibusta_results.html", {"results": results}
+            request,
+            "books/partials/flibusta_results.html",
+            {"results": [], "error": str(e)},
         )
+    return render(
+        request,
+        "books/partials/flibusta_results.html",
+        {"results": author.books, "heading": author.name, "from_cache": author.from_cache},
+    )
+
+
+@login_required
+@require_http_methods(["GET"])
+def flibusta_series_view(request, series_id):
+    """Сериядағы кітаптар (кэштен)."""
+    try:
+        series = FlibustaService(request.user).series(series_id)
     except Exception as e:
         return render(
             request,
             "books/partials/flibusta_results.html",
             {"results": [], "error": str(e)},
         )
+    return render(
+        request,
+        "books/partials/flibusta_results.html",
+        {"results": series.books, "heading": series.title, "from_cache": series.from_cache},
+    )
+
+
+# Сколько раз превью переспрашивает сервер (раз в секунду), прежде чем сдаться
+PREVIEW_ATTEMPTS = 60
+
+
+@login_required
+@require_http_methods(["GET"])
+def flibusta_preview_view(request, book_id):
+    """Алдын ала жүктелген кітаптың мұқабасы, көлемі және аннотациясы."""
+    prefetcher = get_prefetcher()
+    status = prefetcher.status(book_id)
+    if status == "ready":
+        entry = prefetcher.get(book_id)
+        if entry:
+            return render(
+                request,
+                "books/partials/flibusta_preview.html",
+                {"book_id": book_id, "entry": entry},
+            )
+
+    try:
+        attempt = int(request.GET.get("attempt", 1))
+    except ValueError:
+        attempt = PREVIEW_ATTEMPTS
+    if status == "failed" or attempt >= PREVIEW_ATTEMPTS:
+        return HttpResponse("")
+
+    return render(
+        request,
+        "books/partials/flibusta_preview.html",
+        {"book_id": book_id, "attempt": attempt + 1},
+    )
+
+
+@login_required
+@require_http_methods(["GET"])
+def flibusta_preview_cover_view(request, book_id):
+    """Алдын ала жүктелген мұқаба."""
+    entry = get_prefetcher().get(book_id)
+    if not entry or not entry["cover"]:
+        return HttpResponse(status=404)
+
+    cover_name, cover_data = entry["cover"]
+    extension = os.path.splitext(cover_name)[1].lstrip(".").replace("jpg", "jpeg")
+    response = HttpResponse(cover_data, content_type=f"image/{extension}")
+    # Имя обложки - хэш содержимого, для этой книги оно не меняется
+    response["Cache-Control"] = "private, max-age=86400"
+    return response
 
 
 @require_http_methods(["POST"])
-def download_book_view(request):
-    if not request.user.is_authenticated:
+async def download_book_view(request):
+    """Флибустадан кітапты жүктеу: желі - async, ORM мен талдау - ағында."""
+    user = await request.auser()
+    if not user.is_authenticated:
         return HttpResponse(
             '<div class="error">Скачивание с Флибусты доступно только для авторизованных пользователей</div>',
             status=403,
@@ -147,46 +494,109 @@ def download_book_view(request):
         return HttpResponse('<div class="error">Не указан ID книги</div>', status=400)
 
     try:
-        service = FlibustaService()
-        file_path = service.download_book(book_id)
+        # Книга могла быть уже скачана предзагрузкой после поиска
+        prefetched = await sync_to_async(get_prefetcher().get, thread_sensitive=False)(book_id)
+        if prefetched:
+            book_data = prefetched
+            file_path = prefetched["file"]
+        else:
+            file_path = await AsyncFlibustaService(user).download_book(book_id)
+            # Разбор в отдельном процессе: плохой файл не повесит веб-воркер
+            book_data = await sync_to_async(get_parser_pool().run, thread_sensitive=False)(
+                "metadata", file_path
+            )
 
-        parser = FB2Parser(file_path)
-        book_data = parser.parse()
+        return await sync_to_async(_save_downloaded_book)(
+            request, user, book_id, file_path, book_data,
+            title=title, author=author, keep_file=bool(prefetched),
+        )
 
-        book = Book()
-        book.user = request.user  # Привязываем книгу к текущему пользователю
-        book.title = book_data.get("title", title)
-        book.author = book_data.get("author", author)
-        book.flibusta_id = book_id
+    except RateLimited as e:
+        response = HttpResponse(f'<div class="error">{str(e)}</div>', status=429)
+        response["Retry-After"] = str(e.retry_after)
+        return response
+    except Exception as e:
+        return HttpResponse(f'<div class="error">Ошибка: {str(e)}</div>', status=400)
 
-        with open(file_path, "rb") as f:
-            book.file.save(os.path.basename(file_path), File(f), save=False)
 
-        if book_data.get("cover"):
-            book.cover = book_data["cover"]
+def _save_downloaded_book(request, user, book_id, file_path, book_data, title, author, keep_file):
+    book = Book()
+    book.user = user  # Привязываем книгу к текущему пользователю
+    book.title = book_data.get("title", title)
+    book.author = book_data.get("author", author)
+    book.flibusta_id = book_id
+    book.file_hash = file_sha256(file_path)
 
-        book.save()
+    with open(file_path, "rb") as f:
+        book.file.save(os.path.basename(file_path), File(f), save=False)
 
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    if book_data.get("cover"):
+        cover_name, cover_data = book_data["cover"]
+        book.cover = ContentFile(cover_data, name=cover_name)
+        book.cover_placeholder = book_data["cover_placeholder"]
 
-        if is_htmx(request):
-            messages.success(request, f'Книга "{book.title}" успешно скачана')
-
-            books = Book.objects.filter(user=request.user)
-            context = {
-                "books": books,
-                "query": "",
-                "flibusta_results": [],
-                "flibusta_error": None,
-                "is_htmx": True,
-            }
-            return render(request, "books/partials/library_content.html", context)
+    book.save()
 
-        return HttpResponse("OK")
+    # Файл предзагрузки остаётся в её кэше (его чистит вытеснение)
+    if not keep_file and os.path.exists(file_path):
+        os.remove(file_path)
 
-    except Exception as e:
-        return HttpResponse(f'<div class="error">Ошибка: {str(e)}</div>', status=400)
+    if is_htmx(request):
+        messages.success(request, f'Книга "{book.title}" успешно скачана')
+
+        # Результаты поиска остаются на месте, сетка (если она открыта)
+        # получает все изменения от своего токена, включая новую карточку.
+        # Без токена - только карточка, но токен всё равно сдвигается
+        changes = SyncService(user).changes(request.headers.get("X-Sync-Token"))
+        if changes["reset"]:
+            changes = {"new_books": [book], "token": changes["token"]}
+        return _library_delta_response(request, {**changes, "show_message": True})
+
+    return HttpResponse("OK")
+
+
+@login_required
+@require_http_methods(["POST"])
+def bulk_download_view(request):
+    """Бірнеше кітапты фонда жүктеу."""
+    book_ids = []
+    for book_id in request.POST.getlist("book_ids"):
+        if book_id.isdigit() and book_id not in book_ids:
+            book_ids.append(book_id)
+
+    if not book_ids:
+        return HttpResponse('<div class="error">Не выбрано ни одной книги</div>', status=400)
+    if len(book_ids) > settings.BULK_IMPORT_MAX_IDS:
+        return HttpResponse(
+            f'<div class="error">За один раз можно скачать не больше {settings.BULK_IMPORT_MAX_IDS} книг</div>',
+            status=400,
+        )
+
+    job = BulkDownload(request.user, book_ids)
+    job.start()
+    return render(request, "books/partials/bulk_download.html", {"job": job.state})
+
+
+@login_required
+@require_http_methods(["GET"])
+def bulk_download_status_view(request, job_id):
+    """Пакеттік жүктеудің әр кітап бойынша барысы."""
+    job = BulkDownload.load(job_id)
+    if job is None or job["user_id"] != request.user.pk:
+        return HttpResponse("")
+
+    context = {"job": job}
+    if job["finished"]:
+        # Сетка библиотеки получает изменения от своего токена (новые карточки
+        # в их числе); без токена - только новые карточки и свежий токен
+        changes = SyncService(request.user).changes(request.headers.get("X-Sync-Token"))
+        if changes["reset"]:
+            changes = {
+                "new_books": Book.objects.filter(id__in=job["created"], user=request.user),
+                "token": changes["token"],
+            }
+        context.update(changes)
+    return render(request, "books/partials/bulk_download.html", context)
 
 
 @require_http_methods(["DELETE", "POST"])
@@ -194,16 +604,8 @@ def delete_book_view(request, book_id):
     try:
         # Только владелец может удалить книгу
         book = get_object_or_404(Book, id=book_id, user=request.user)
-
-        if book.file:
-            if os.path.exists(book.file.path):
-                os.remove(book.file.path)
-
-        if book.cover:
-            if os.path.exists(book.cover.path):
-                os.remove(book.cover.path)
-
-        book.delete()
+        # Файл и обложку удалит фоновый поток после коммита
+        LibraryActions(request.user).delete([book.id])
 
         if is_htmx(request):
             messages.success(request, "Книга удалена")
@@ -214,6 +616,45 @@ def delete_book_view(request, book_id):
         return HttpResponse(f'<div class="error">{str(e)}</div>', status=400)
 
 
+@login_required
+@require_http_methods(["POST"])
+def bulk_action_view(request):
+    """Бірнеше кітапқа бір әрекет: өшіру, таңдаулы, рейтинг."""
+    action = request.POST.get("action")
+    book_ids = LibraryActions.parse_ids(request.POST.getlist("book_ids"))
+
+    if action not in LibraryActions.ACTIONS:
+        return HttpResponse('<div class="error">Неизвестное действие</div>', status=400)
+    if not book_ids:
+        return HttpResponse('<div class="error">Не выбрано ни одной книги</div>', status=400)
+    if len(book_ids) > settings.BULK_ACTION_MAX_IDS:
+        return HttpResponse(
+            f'<div class="error">За один раз можно изменить не больше {settings.BULK_ACTION_MAX_IDS} книг</div>',
+            status=400,
+        )
+
+    try:
+        count = LibraryActions(request.user).apply(action, book_ids, request.POST.get("rating"))
+    except Exception as e:
+        return HttpResponse(f'<div class="error">{str(e)}</div>', status=400)
+
+    # Кітапхана торы клиентте: өзгерістер дельта ретінде қайтарылады
+    since = request.POST.get("since")
+    if is_htmx(request) and since:
+        changes = SyncService(request.user).changes(since)
+        if not changes["reset"]:
+            messages.success(request, f"Изменено книг: {count}")
+            return _library_delta_response(request, {**changes, "show_message": True})
+
+    return JsonResponse(
+        {
+            "action": action,
+            "count": count,
+            "token": SyncService(request.user).current_token(),
+        }
+    )
+
+
 @require_http_methods(["GET"])
 def last_read_view(request):
     if not request.user.is_authenticated:
@@ -279,12 +720,208 @@ Sitemap: {request.scheme}://{request.get_host()}/sitemap.xml
     return HttpResponse(robots_txt, content_type="text/plain")
 
 
+@require_http_methods(["GET", "HEAD"])
+def healthz_view(request):
+    """Процесс тірі: дерекқорға да, Tor-ға да жүгінбейді."""
+    response = HttpResponse("ok", content_type="text/plain")
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+@require_http_methods(["GET", "HEAD"])
+def readyz_view(request):
+    """Сұрауларға дайын: дерекқор, миграциялар және Tor SOCKS."""
+    ready, checks = readiness()
+    response = JsonResponse(
+        {"status": "ok" if ready else "unavailable", "checks": checks},
+        status=200 if ready else 503,
+    )
+    response["Cache-Control"] = "no-store"
+    return response
+
+
 @require_http_methods(["GET"])
 def offline_view(request):
     """Страница для offline режима PWA"""
     return render(request, "books/offline.html")
 
 
+@require_http_methods(["GET"])
+def service_worker_view(request):
+    """Service Worker түбірден беріледі, әйтпесе оның scope-ы тек /static/"""
+    with open(finders.find("sw.js"), encoding="utf-8") as f:
+        script = f.read()
+
+    # Статиканың хэшті атаулары манифесттен алынады
+    precache_urls = [reverse("books:library"), reverse("books:offline")] + [
+        staticfiles_storage.url(name) for name in settings.SW_PRECACHE_STATIC
+    ]
+    version = hashlib.sha256(
+        (script + "\n".join(precache_urls)).encode("utf-8")
+    ).hexdigest()[:12]
+    script = script.replace("__CACHE_VERSION__", version).replace(
+        "__PRECACHE_URLS__", json.dumps(precache_urls, indent=2)
+    )
+
+    response = HttpResponse(script, content_type="application/javascript")
+    response["Cache-Control"] = "no-cache"
+    response["Service-Worker-Allowed"] = "/"
+    return response
+
+
+@require_http_methods(["GET"])
+def offline_manifest_view(request):
+    """Офлайн-пакеттер тізімі: SW тек нұсқасы өзгергендерін жүктейді"""
+    if not request.user.is_authenticated:
+        return JsonResponse({"books": []}, status=403)
+
+    books = []
+    for book in Book.objects.filter(user=request.user).order_by("id"):
+        try:
+            version = OfflineBundleService.version(book)
+        except OSError:
+            # Файлы жоқ кітап офлайн оқуға жарамайды
+            continue
+        url = reverse("books:book_bundle", args=[book.id])
+        books.append({"id": str(book.id), "version": version, "url": f"{url}?v={version}"})
+
+    etag = '"%s"' % hashlib.sha256(json.dumps(books).encode()).hexdigest()[:32]
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponse(status=304)
+    else:
+        response = JsonResponse({"books": books})
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@require_http_methods(["GET"])
+@login_required
+def book_bundle_view(request, book_id):
+    """Кітаптың офлайн-пакеті: бөлімдер, мазмұн, мұқаба бір gzip JSON-да"""
+    book = get_object_or_404(Book, id=book_id, user=request.user)
+
+    try:
+        version, content_hash, payload = OfflineBundleService().get(book)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    etag = f'"{content_hash}"'
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponse(status=304)
+    elif "gzip" in request.headers.get("Accept-Encoding", ""):
+        response = HttpResponse(payload, content_type="application/json")
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(gzip.decompress(payload), content_type="application/json")
+
+    response["ETag"] = etag
+    response["X-Bundle-Version"] = version
+    response["Vary"] = "Accept-Encoding"
+    if request.GET.get("v") == version:
+        # Версионированный URL никогда не меняет содержимое
+        response["Cache-Control"] = "private, max-age=31536000, immutable"
+    else:
+        response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def _opds_user(request):
+    """Сессия немесе HTTP Basic: оқу құрылғылары мен OPDS клиенттері cookie сақтамайды"""
+    if request.user.is_authenticated:
+        return request.user
+
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "basic" or not credentials:
+        return None
+
+    # Клиент каталогты жиі сұрайды: PBKDF2 тексерісі әр сұраныста емес, TTL сайын.
+    # Кілтте парольдің өзі емес, оның HMAC-ы; пароль ауысса, жазба жарамсыз
+    key = "opds-auth:" + salted_hmac("opds-auth", credentials).hexdigest()
+    remembered = cache.get(key)
+    if remembered:
+        user = get_user_model().objects.filter(id=remembered[0], is_active=True).first()
+        if user and constant_time_compare(remembered[1], salted_hmac("opds-auth", user.password).hexdigest()):
+            return user
+
+    try:
+        username, _, password = base64.b64decode(credentials).decode("utf-8").partition(":")
+    except ValueError:
+        return None
+    user = authenticate(request, username=username, password=password)
+    if user is not None:
+        cache.set(key, (user.id, salted_hmac("opds-auth", user.password).hexdigest()), settings.OPDS_AUTH_TTL)
+    return user
+
+
+def _opds_unauthorized():
+    response = HttpResponse("Требуется вход", status=401, content_type="text/plain; charset=utf-8")
+    response["WWW-Authenticate"] = 'Basic realm="Lumina Reader", charset="UTF-8"'
+    return response
+
+
+@require_http_methods(["GET"])
+def opds_view(request, feed=None, version=1):
+    """Кітапхананың OPDS каталогы: түбір (бөлімдер) немесе бөлімнің бір беті"""
+    if feed is not None and feed not in FEEDS:
+        raise Http404
+    user = _opds_user(request)
+    if user is None:
+        return _opds_unauthorized()
+
+    service = OPDSService(user, request.build_absolute_uri, settings.OPDS_PAGE_SIZE)
+    cursor = request.GET.get("after") if feed else None
+
+    # Валидаторлар бір агрегаттан: өзгеріс болмаса, кітаптар таңдалмай 304 қайтады
+    state, updated = service.state()
+    etag = '"%s"' % hashlib.sha256(
+        f"{version}:{feed}:{cursor}:{settings.OPDS_PAGE_SIZE}:{state}".encode()
+    ).hexdigest()[:32]
+    last_modified = int(updated.timestamp()) if updated else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        updated = updated or timezone.now()
+        if feed is None:
+            if version == 2:
+                response = HttpResponse(service.json_navigation(), content_type=OPDS_JSON)
+            else:
+                response = HttpResponse(service.atom_navigation(updated), content_type=ATOM_NAVIGATION)
+        else:
+            books, next_cursor = service.page(feed, cursor)
+            if version == 2:
+                content = service.json_feed(feed, books, cursor, next_cursor)
+                response = HttpResponse(content, content_type=OPDS_JSON)
+            else:
+                content = service.atom_feed(feed, books, cursor, next_cursor, updated)
+                response = HttpResponse(content, content_type=ATOM_ACQUISITION)
+
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = "private, no-cache"
+    response["Vary"] = "Authorization, Cookie"
+    return response
+
+
+@require_http_methods(["GET"])
+def opds_book_file_view(request, book_id):
+    """OPDS acquisition сілтемесі: кітап файлы тек иесіне"""
+    user = _opds_user(request)
+    if user is None:
+        return _opds_unauthorized()
+
+    book = get_object_or_404(Book.objects.only("id", "title", "file"), id=book_id, user=user)
+    extension, content_type = file_type(book.file.name)
+    try:
+        handle = book.file.open("rb")
+    except (OSError, ValueError):
+        raise Http404
+    return FileResponse(
+        handle, as_attachment=True, filename=f"{book.title}{extension}", content_type=content_type
+    )
+
+
 @require_http_methods(["GET", "POST"])
 def login_view(request):
     if request.user.is_authenticated:
@@ -338,7 +975,7 @@ def toggle_favorite_view(request, book_id):
     """Кітапты таңдаулыларға қосу/алу"""
     book = get_object_or_404(Book, id=book_id, user=request.user)
     book.is_favorite = not book.is_favorite
-    book.save(update_fields=["is_favorite"])
+    book.save(update_fields=["is_favorite", "updated_at"])
 
     if is_htmx(request):
         return render(request, "books/partials/favorite_button.html", {"book": book})
@@ -357,7 +994,7 @@ def set_rating_view(request, book_id):
         rating = int(rating)
         if 1 <= rating <= 5:
             book.rating = rating
-            book.save(update_fields=["rating"])
+            book.save(update_fields=["rating", "updated_at"])
 
     if is_htmx(request):
         return render(request, "books/partials/rating_stars.html", {"book": book})
@@ -420,6 +1057,7 @@ def add_bookmark_view(request, book_id):
     book = get_object_or_404(Book, id=book_id, user=request.user)
     title = request.POST.get("title", f"Бетбелгі {timezone.now().strftime('%H:%M')}")
     scroll_position = request.POST.get("scroll_position")
+    location = request.POST.get("location", "")
 
     if scroll_position:
         Bookmark.objects.create(
@@ -427,6 +1065,7 @@ def add_bookmark_view(request, book_id):
             book=book,
             title=title,
             scroll_position=float(scroll_position),
+            location=location if BookLayout.parse_location(location) else "",
         )
 
     bookmarks = Bookmark.objects.filter(book=book)
@@ -479,19 +1118,22 @@ def profile_view(request):
         user=request.user, date=today
     )
 
-    # Жалпы статистика
-    total_seconds = 0
-    all_stats = DailyReadingStats.objects.filter(user=request.user)
-    for stat in all_stats:
-        total_seconds += stat.seconds_read
+    # Жалпы статистика (кітап не оқу уақыты өзгергенде кэш тазаланады)
+    def totals():
+        total_seconds = DailyReadingStats.objects.filter(user=request.user).aggregate(
+            total=Sum("seconds_read")
+        )["total"] or 0
+        return {
+            "total_hours": total_seconds // 3600,
+            "total_books": Book.objects.filter(user=request.user).count(),
+            "read_books": Book.objects.filter(
+                user=request.user, reading_progress=100
+            ).count(),
+        }
 
     context = {
         "today_minutes": today_stats.seconds_read // 60,
-        "total_hours": total_seconds // 3600,
-        "total_books": Book.objects.filter(user=request.user).count(),
-        "read_books": Book.objects.filter(
-            user=request.user, reading_progress=100
-        ).count(),
+        **ModelCache("profile", request.user.id).get_or_set("totals", totals),
     }
 
     return render(request, "books/profile.html", context)
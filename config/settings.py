@@ -50,7 +50,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "books.middleware.AsyncWhiteNoiseMiddleware",
+    "books.middleware.AdmissionControlMiddleware",
     "csp.middleware.CSPMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -129,14 +130,129 @@ STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 
+# collectstatic даёт имена с хэшем содержимого (staticfiles.json) и рядом
+# .br/.gz с максимальным сжатием - их отдаёт Caddy (precompressed br gzip)
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+    },
+}
+
+# Статика, которую Service Worker кэширует при установке (URL - из манифеста)
+SW_PRECACHE_STATIC = [
+    "css/output.css",
+    "js/htmx.min.js",
+    "js/alpine.min.js",
+    "favicon.svg",
+    "manifest.json",
+]
+
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Общий для всех воркеров gunicorn кэш в SQLite (карточки книг, поиск,
+# статистика): вытеснение LRU по числу записей и размеру, метрики по
+# пространствам имён - manage.py cache_stats
+CACHES = {
+    "default": {
+        "BACKEND": "books.services.sqlite_cache.SQLiteCache",
+        "LOCATION": BASE_DIR / config("CACHE_DB", default="data/cache.sqlite3"),
+        "OPTIONS": {
+            "MAX_ENTRIES": config("CACHE_MAX_ENTRIES", default=20000, cast=int),
+            "MAX_SIZE": config("CACHE_MAX_MB", default=256, cast=int) * 1024 * 1024,
+        },
+    }
+}
+
+# Разбор FB2 в изолированных процессах: таймаут, лимит памяти, перезапуск
+PARSER_POOL_WORKERS = config("PARSER_POOL_WORKERS", default=2, cast=int)
+PARSER_TIMEOUT = config("PARSER_TIMEOUT", default=30, cast=int)
+PARSER_MEMORY_LIMIT_MB = config("PARSER_MEMORY_LIMIT_MB", default=1024, cast=int)
+PARSER_MAX_JOBS = config("PARSER_MAX_JOBS", default=50, cast=int)
+
+# Читалка отдаётся потоком: оболочка страницы - сразу, текст - после разбора книги
+READER_STREAMING = config("READER_STREAMING", default=True, cast=bool)
+
+# Офлайн-пакеты книг (вне MEDIA_ROOT - их не должен раздавать Caddy)
+OFFLINE_BUNDLE_ROOT = BASE_DIR / config("OFFLINE_BUNDLE_DIR", default="data/bundles")
+
+# Фоновая предзагрузка первых результатов поиска (файл, обложка, аннотация)
+PREFETCH_ROOT = BASE_DIR / config("PREFETCH_DIR", default="data/prefetch")
+PREFETCH_TOP_N = config("PREFETCH_TOP_N", default=5, cast=int)
+PREFETCH_WORKERS = config("PREFETCH_WORKERS", default=2, cast=int)
+PREFETCH_MAX_ENTRIES = config("PREFETCH_MAX_ENTRIES", default=100, cast=int)
+PREFETCH_MAX_MB = config("PREFETCH_MAX_MB", default=500, cast=int)
+PREFETCH_TTL = config("PREFETCH_TTL", default=86400, cast=int)
+
+# Файлы-замки межпроцессных лимитов (общие для всех воркеров gunicorn)
+LOCK_ROOT = BASE_DIR / config("LOCK_DIR", default="data/locks")
+
+# Пакетное скачивание: одновременных загрузок на сервер и на пользователя,
+# книг в одной пачке (один bulk_create) и ID в одном запросе
+BULK_IMPORT_GLOBAL_LIMIT = config("BULK_IMPORT_GLOBAL_LIMIT", default=4, cast=int)
+BULK_IMPORT_USER_LIMIT = config("BULK_IMPORT_USER_LIMIT", default=2, cast=int)
+BULK_IMPORT_BATCH_SIZE = config("BULK_IMPORT_BATCH_SIZE", default=10, cast=int)
+BULK_IMPORT_MAX_IDS = config("BULK_IMPORT_MAX_IDS", default=50, cast=int)
+
+# Пакетные действия над библиотекой (удаление, избранное, рейтинг) за один запрос
+BULK_ACTION_MAX_IDS = config("BULK_ACTION_MAX_IDS", default=500, cast=int)
+
+# OPDS-каталог для читалок: книг на странице и сколько помнить вход по Basic-авторизации
+OPDS_PAGE_SIZE = config("OPDS_PAGE_SIZE", default=50, cast=int)
+OPDS_AUTH_TTL = config("OPDS_AUTH_TTL", default=600, cast=int)
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 FLIBUSTA_ONION = config("FLIBUSTA_ONION", default="http://flibustahezeous3.onion")
 TOR_PROXY_HOST = config("TOR_PROXY_HOST", default="127.0.0.1")
 TOR_PROXY_PORT = config("TOR_PROXY_PORT", default="9050")
+# Изолированные цепочки Tor (свои логин/пароль SOCKS на слот), 0 - одна общая
+TOR_CIRCUITS = config("TOR_CIRCUITS", default=4, cast=int)
+
+# Зеркала через запятую: .onion идут через Tor, остальные - напрямую
+# или через FLIBUSTA_CLEARNET_PROXY; выбирается самое быстрое живое
+FLIBUSTA_MIRRORS = config("FLIBUSTA_MIRRORS", default=FLIBUSTA_ONION, cast=Csv())
+FLIBUSTA_CLEARNET_PROXY = config("FLIBUSTA_CLEARNET_PROXY", default="")
+FLIBUSTA_PROBE_INTERVAL = config("FLIBUSTA_PROBE_INTERVAL", default=60, cast=int)
+FLIBUSTA_FAILURE_THRESHOLD = config("FLIBUSTA_FAILURE_THRESHOLD", default=3, cast=int)
+FLIBUSTA_BREAKER_COOLDOWN = config("FLIBUSTA_BREAKER_COOLDOWN", default=30, cast=int)
+# Сколько секунд хранить в кэше страницы авторов и серий
+FLIBUSTA_LISTING_TTL = config("FLIBUSTA_LISTING_TTL", default=6 * 3600, cast=int)
+# Устаревшие копии поиска и страниц показываются, когда исчерпан лимит запросов
+FLIBUSTA_STALE_TTL = config("FLIBUSTA_STALE_TTL", default=7 * 86400, cast=int)
+
+# Лимиты запросов к Флибусте, общие для всех воркеров: имя=токенов_в_секунду/запас.
+# global - на весь сервер, user - на пользователя, остальные - на вид запроса
+FLIBUSTA_RATE_LIMITS = config(
+    "FLIBUSTA_RATE_LIMITS",
+    default="global=2/10,user=0.5/6,search=1/5,listing=1/5,download=0.5/5,bulk=0.5/4,prefetch=0.3/3",
+    cast=Csv(),
+)
+FLIBUSTA_RATE_LIMIT_DB = BASE_DIR / config("FLIBUSTA_RATE_LIMIT_DB", default="data/ratelimit.sqlite3")
+# Соединений на один прокси у асинхронного клиента (async-представления под ASGI)
+FLIBUSTA_ASYNC_MAX_CONNECTIONS = config("FLIBUSTA_ASYNC_MAX_CONNECTIONS", default=500, cast=int)
+
+# Лимиты одновременных запросов на процесс gunicorn (см. gunicorn.conf.py):
+# медленные маршруты (Tor) - не больше ADMISSION_SLOW_LIMIT потоков, лишние
+# сразу получают 503; быстрые ждут свободного места до ADMISSION_FAST_WAIT сек.
+ADMISSION_CONTROL = config("ADMISSION_CONTROL", default=True, cast=bool)
+ADMISSION_SLOW_LIMIT = config("ADMISSION_SLOW_LIMIT", default=3, cast=int)
+ADMISSION_ASYNC_SLOW_LIMIT = config("ADMISSION_ASYNC_SLOW_LIMIT", default=300, cast=int)
+ADMISSION_FAST_LIMIT = config("ADMISSION_FAST_LIMIT", default=8, cast=int)
+ADMISSION_FAST_WAIT = config("ADMISSION_FAST_WAIT", default=5, cast=float)
+ADMISSION_RETRY_AFTER = config("ADMISSION_RETRY_AFTER", default=5, cast=int)
+ADMISSION_SLOW_ROUTES = [
+    "books:search",
+    "books:download",
+    "books:bulk_download",
+    "books:flibusta_author",
+    "books:flibusta_series",
+]
+# Проверки здоровья отвечают даже когда все лимиты заняты
+ADMISSION_EXEMPT_ROUTES = ["books:healthz", "books:readyz"]
 
 CSP_DEFAULT_SRC = ("'self'",)
 CSP_SCRIPT_SRC = (
@@ -5,30 +5,26 @@ echo "Starting Tor service..."
 tor -f /etc/tor/torrc &
 TOR_PID=$!
 
-echo "Waiting for Tor to establish connection..."
-sleep 10
-
-if ! kill -0 $TOR_PID 2>/dev/null; then
-    echo "ERROR: Tor failed to start"
-    exit 1
-fi
-
-echo "Tor is running (PID: $TOR_PID)"
-
+# Миграции выполняются, пока Tor поднимается
 echo "Running Django migrations..."
 python manage.py migrate --noinput
 
-echo "Collecting static files..."
-python manage.py collectstatic --noinput
+echo "Waiting for Tor SOCKS port..."
+if ! python manage.py wait_for_tor --timeout 30; then
+    if ! kill -0 $TOR_PID 2>/dev/null; then
+        echo "ERROR: Tor failed to start"
+        exit 1
+    fi
+    # Библиотека работает и без Tor; /readyz покажет, что его нет
+    echo "WARNING: Tor is not answering yet, starting anyway"
+fi
+
+# Статика собрана при сборке образа; в общий с Caddy том копируется,
+# только если образ новее того, что уже лежит в томе
+if [ -d /app/static-export ] && ! cmp -s staticfiles/.build-id /app/static-export/.build-id; then
+    echo "Exporting static files..."
+    cp -R staticfiles/. /app/static-export/
+fi
 
 echo "Starting Gunicorn..."
-exec gunicorn config.wsgi:application \
-    --bind 0.0.0.0:8000 \
-    --workers 4 \
-    --worker-class sync \
-    --max-requests 1000 \
-    --max-requests-jitter 50 \
-    --timeout 120 \
-    --access-logfile - \
-    --error-logfile - \
-    --log-level info
+exec gunicorn -c gunicorn.conf.py
@@ -0,0 +1,53 @@
+# Конфигурация gunicorn.
+#
+# По умолчанию - ASGI (uvicorn): поиск и скачивание с Флибусты - async-
+# представления, ожидание Tor держит корутину, а не поток, и один воркер
+# обслуживает сотни таких запросов. Синхронные представления Django
+# выполняет в потоках.
+#
+# GUNICORN_WORKER_CLASS=gthread - прежний WSGI-режим: каждый воркер
+# обслуживает запросы потоками, а AdmissionControlMiddleware не даёт
+# медленным маршрутам занять больше ADMISSION_SLOW_LIMIT потоков.
+
+import gc
+import os
+
+bind = "0.0.0.0:8000"
+workers = int(os.environ.get("GUNICORN_WORKERS", 4))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "uvicorn_worker.UvicornWorker")
+
+if worker_class == "gthread":
+    wsgi_app = "config.wsgi:application"
+    threads = int(os.environ.get("GUNICORN_THREADS", 8))
+else:
+    wsgi_app = "config.asgi:application"
+
+# Приложение загружается в мастере до fork: воркеры делят страницы памяти
+# (copy-on-write) вместо того, чтобы каждый импортировал Django заново.
+# Тяжёлые библиотеки (requests, httpx, lxml, PIL) грузятся лениво - их
+# отсутствие при загрузке проверяет manage.py check_import_budget
+preload_app = True
+
+max_requests = 1000
+max_requests_jitter = 50
+# Скачивание через Tor может идти до минуты
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+loglevel = "info"
+
+
+def when_ready(server):
+    # Маршруты и представления Django грузит при первом запросе - загружаем
+    # их здесь, в мастере, чтобы и они попали в общие страницы
+    from django.db import connections
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+    connections.close_all()
+    # Объекты, созданные до fork, сборщик мусора больше не трогает: иначе
+    # обход счётчиков ссылок копирует общие страницы в каждый воркер
+    gc.freeze()
@@ -1,16 +1,13 @@
-const CACHE_VERSION = 'v1.0.0';
+// CACHE_VERSION и PRECACHE_URLS подставляет service_worker_view из манифеста
+// статики: новые хэши файлов - новая версия кэша
+const CACHE_VERSION = '__CACHE_VERSION__';
 const CACHE_NAME = `lumina-reader-${CACHE_VERSION}`;
+// Офлайн-пакеты книг живут отдельно и не сбрасываются при смене версии SW
+const BUNDLE_CACHE = 'lumina-bundles';
+const BUNDLE_MANIFEST_URL = '/offline/manifest/';
 
-// Файлы для предварительного кэширования (статика)
-const PRECACHE_URLS = [
-  '/',
-  '/static/css/output.css',
-  '/static/js/htmx.min.js',
-  '/static/js/alpine.min.js',
-  '/static/favicon.svg',
-  '/static/manifest.json',
-  '/offline/',
-];
+// Файлы для предварительного кэширования (страницы и статика с хэшем в имени)
+const PRECACHE_URLS = __PRECACHE_URLS__;
 
 // Паттерны для динамического кэширования
 const CACHE_PATTERNS = {
@@ -22,8 +19,8 @@ const CACHE_PATTERNS = {
   dynamic: /\/(book|search|last-read)/,
   // Обложки книг - Cache First
   covers: /\/media\/covers\//,
-  // Файлы книг - Cache First (для offline чтения)
-  books: /\/media\/books\//,
+  // Фрагменты текста - при отсутствии сети собираются из офлайн-пакета
+  chunk: /^\/book\/([0-9a-f-]+)\/chunk\/$/,
 };
 
 // Установка Service Worker
@@ -97,12 +94,17 @@ async function handleFetch(request, url) {
     if (
       CACHE_PATTERNS.static.test(url.pathname) ||
       CACHE_PATTERNS.images.test(url.pathname) ||
-      CACHE_PATTERNS.covers.test(url.pathname) ||
-      CACHE_PATTERNS.books.test(url.pathname)
+      CACHE_PATTERNS.covers.test(url.pathname)
     ) {
       return await cacheFirst(request);
     }
 
+    // Фрагмент книги - сеть, без сети - из офлайн-пакета
+    const chunkMatch = url.pathname.match(CACHE_PATTERNS.chunk);
+    if (chunkMatch) {
+      return await chunkFromNetworkOrBundle(request, url, chunkMatch[1]);
+    }
+
     // Динамический контент - Network First
     if (CACHE_PATTERNS.dynamic.test(url.pathname)) {
       return await networkFirst(request);
@@ -224,6 +226,10 @@ self.addEventListener('message', (event) => {
     });
   }
 
+  if (event.data && event.data.type === 'SYNC_BUNDLES') {
+    event.waitUntil(syncBundles());
+  }
+
   if (event.data && event.data.type === 'CLEAR_CACHE') {
     // Очистка всего кэша
     caches.keys().then(names => {
@@ -253,7 +259,102 @@ self.addEventListener('periodicsync', (event) => {
 
 async function updateLibrary() {
   console.log('[SW] Updating library in background...');
-  // Обновляем библиотеку в фоне
+  await syncBundles();
+}
+
+// Синхронизация офлайн-пакетов по манифесту: скачиваются только книги,
+// у которых изменилась версия, пакеты удалённых книг стираются
+let bundleSync = null;
+
+function syncBundles() {
+  if (!bundleSync) {
+    bundleSync = doSyncBundles()
+      .catch((error) => console.log('[SW] Bundle sync failed:', error))
+      .finally(() => { bundleSync = null; });
+  }
+  return bundleSync;
+}
+
+async function doSyncBundles() {
+  const response = await fetch(BUNDLE_MANIFEST_URL, { credentials: 'same-origin' });
+  if (!response.ok) {
+    return;
+  }
+  const manifest = await response.json();
+  const cache = await caches.open(BUNDLE_CACHE);
+  const wanted = new Set();
+
+  for (const item of manifest.books) {
+    const key = bundleKey(item.id);
+    wanted.add(key);
+
+    const cached = await cache.match(key);
+    if (cached && cached.headers.get('X-Bundle-Version') === item.version) {
+      continue;
+    }
+
+    const bundle = await fetch(item.url, { credentials: 'same-origin' });
+    if (bundle.ok) {
+      await cache.put(key, bundle);
+      console.log('[SW] Bundle updated:', item.id);
+    }
+  }
+
+  for (const request of await cache.keys()) {
+    if (!wanted.has(new URL(request.url).pathname)) {
+      await cache.delete(request);
+    }
+  }
+}
+
+function bundleKey(bookId) {
+  return `/book/${bookId}/bundle/`;
+}
+
+async function chunkFromNetworkOrBundle(request, url, bookId) {
+  try {
+    return await fetch(request);
+  } catch (error) {
+    const cached = await caches.open(BUNDLE_CACHE).then((cache) => cache.match(bundleKey(bookId)));
+    if (!cached) {
+      throw error;
+    }
+    const html = renderBundleChunk(await cached.json(), url);
+    return new Response(html, {
+      headers: { 'Content-Type': 'text/html; charset=utf-8' },
+    });
+  }
+}
+
+// Без сети отдаём раздел целиком, с той же разметкой, что и reader_chunk.html
+function renderBundleChunk(bundle, url) {
+  const loc = url.searchParams.get('loc') || '0.0.0';
+  const direction = url.searchParams.get('dir');
+  const last = bundle.sections.length - 1;
+  const parts = loc.split('.').map((part) => parseInt(part, 10) || 0);
+  const section = Math.min(Math.max(parts[0], 0), last);
+  const paragraph = Math.min(Math.max(parts[1] || 0, 0), Math.max(bundle.toc[section].paragraphs - 1, 0));
+  const target = `${section}.${paragraph}.${parts[2] || 0}`;
+  const chunkUrl = url.pathname;
+
+  let html = '';
+  if (direction !== 'next' && section > 0) {
+    const prev = `${section - 1}.${Math.max(bundle.toc[section - 1].paragraphs - 1, 0)}.0`;
+    html += sentinel(chunkUrl, prev, 'prev');
+  }
+  html += `<div class="reader-chunk${section > 0 ? ' mt-4' : ''}" data-target="${target}">`;
+  html += bundle.sections[section];
+  html += '</div>';
+  if (direction !== 'prev' && section < last) {
+    html += sentinel(chunkUrl, `${section + 1}.0.0`, 'next');
+  }
+  return html;
+}
+
+function sentinel(chunkUrl, loc, direction) {
+  return `<div hx-get="${chunkUrl}?loc=${loc}&dir=${direction}" ` +
+    'hx-trigger="intersect once root:#content-scroll-area" ' +
+    'hx-swap="outerHTML" class="h-8"></div>';
 }
 
 // Push уведомления (для будущих фич)